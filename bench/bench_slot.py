@@ -0,0 +1,238 @@
+"""Offline benchmarks for slot.py's hot paths.
+
+Each population size runs in its own child process and scratch directory:
+the child writes data/slots.json (and a matching message ledger) for N
+synthetic slots, imports slot.py there, attaches bench/fakediscord.py in
+place of the Discord API and drives
+
+  search_catch_up   indexing every slot channel's recent history at startup
+  on_message        plain owner message in a slot channel
+  on_message_ping   owner message with an @here (tracker + self destruct)
+  find              =find answered from the search index
+  find_deep         =find --deep scanning live channel history
+  daily_ping_reset  the midnight reset across every slot
+  recovery          RecoveryModal.on_submit claiming a slot by key
+  expire_slot       the scheduler's expiry handler for one slot
+
+reporting ops/sec, p50/p99 latency and fake API calls per operation (calls
+made by background work the operation queued, such as outbox deliveries
+and debounced tracker edits, are drained and counted with it).
+
+    python bench/bench_slot.py                      # 100, 1000 and 10000 slots
+    python bench/bench_slot.py --sizes 100 1000 --latency-ms 40
+    python bench/bench_slot.py --storage sqlite --json > bench_output.txt
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+DEFAULT_SIZES = (100, 1000, 10000)
+# Per-slot operations run at most this many times per size
+MAX_OPS = 1000
+
+
+class Phase:
+    def __init__(self, name, fake):
+        self.name = name
+        self.fake = fake
+        self.latencies = []
+        self.before = fake.calls.copy()
+        self.started = time.perf_counter()
+
+    async def time(self, coro):
+        start = time.perf_counter()
+        await coro
+        self.latencies.append(time.perf_counter() - start)
+
+    def result(self):
+        elapsed = time.perf_counter() - self.started
+        calls = self.fake.calls - self.before
+        ops = len(self.latencies) or 1
+        ordered = sorted(self.latencies) or [0.0]
+        return {
+            "op": self.name,
+            "count": len(self.latencies),
+            "ops_per_sec": len(self.latencies) / elapsed if elapsed else 0.0,
+            "p50_ms": statistics.median(ordered) * 1000,
+            "p99_ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1000,
+            "api_calls": sum(calls.values()),
+            "api_calls_per_op": sum(calls.values()) / ops,
+            "routes": dict(calls.most_common()),
+        }
+
+
+def write_population(size, fake):
+    """Seed the scratch data directory the way a long-running install would look."""
+    os.makedirs("data", exist_ok=True)
+    with open("data/slots.json", "w") as f:
+        json.dump(fake.slots, f)
+    ledger = {"ids": {}, "complete": []}
+    for slot in fake.slots.values():
+        channel_id = slot["channel_id"]
+        ledger["ids"][str(channel_id)] = sorted(fake.messages[channel_id])
+        ledger["complete"].append(channel_id)
+    with open("data/message_ledger.json", "w") as f:
+        json.dump(ledger, f)
+
+
+async def settle(slot, fake):
+    """Wait for background work queued by the last phase to reach the fake API."""
+    while slot.trackers._pending:
+        await asyncio.gather(*slot.trackers._pending.values(), return_exceptions=True)
+    slot.admin_log.drain()
+    while slot.outbox.pending or slot.admin_log.buffer:
+        await asyncio.sleep(0.01)
+        slot.admin_log.drain()
+    slot.search_index.flush()
+
+
+async def run_child(size, latency):
+    from fakediscord import FakeContext, FakeDiscord, FakeInteraction
+
+    config_path = os.path.join(os.getcwd(), "config.json")
+    with open(config_path) as f:
+        config = json.load(f)
+    op_count = min(size, MAX_OPS)
+    fake = FakeDiscord(config, size, spare_members=op_count, latency=latency)
+    write_population(size, fake)
+
+    sys.path.insert(0, REPO_DIR)
+    import slot
+
+    guild = await fake.attach(slot.bot)
+    slot.dm_limiter = slot.RateLimiter(1e9, 1e9)
+    slot.outbox.start()
+
+    results = []
+    owners = [(uid, guild.get_member(int(uid)), guild.get_channel(data["channel_id"])) for uid, data in list(slot.store.slots.items())]
+    sample = owners[:op_count]
+    admin = guild.get_member(fake.bot_id)
+    admin_channel = guild.get_channel(config["ADMIN_LOG_CHANNEL"])
+
+    async def phase(name, runs):
+        p = Phase(name, fake)
+        for run in runs:
+            await p.time(run())
+        await settle(slot, fake)
+        results.append(p.result())
+
+    # What on_ready does after a restart, before any live traffic
+    channels = [channel for _, _, channel in owners]
+    await phase("search_catch_up", [lambda: slot.search_index.catch_up(channels)])
+
+    await phase("on_message", [
+        (lambda m=member, c=channel: slot.on_message(fake.user_message(c, m, "selling fresh stock, dm me")))
+        for _, member, channel in sample])
+    await phase("on_message_ping", [
+        (lambda m=member, c=channel: slot.on_message(fake.user_message(c, m, "@here restock live")))
+        for _, member, channel in sample])
+
+    find = slot.find.callback
+    ctx = FakeContext(slot.bot, admin_channel, admin)
+    index_keywords = [f"item {i}-" if i % 2 else f"cheap {i % 7}" for i in range(min(op_count, 200))]
+    await phase("find", [(lambda k=k: find(ctx, keyword=k)) for k in index_keywords])
+    await phase("find_deep", [(lambda k=k: find(ctx, keyword=f"--deep {k}")) for k in ("restock live", "no such phrase", "item 1-")])
+
+    await phase("daily_ping_reset", [slot.daily_ping_reset.coro for _ in range(1 if size >= 10000 else 3)])
+
+    claimers = [guild.get_member(member_id) for member_id in fake.spare_member_ids]
+
+    def recover(uid, claimer):
+        modal = slot.RecoveryModal()
+        modal.recovery_key._value = slot.store.recovery_key(uid)
+        return modal.on_submit(FakeInteraction(fake, claimer))
+
+    await phase("recovery", [(lambda u=uid, c=claimer: recover(u, c)) for (uid, _, _), claimer in zip(sample, claimers)])
+
+    now = int(time.time())
+    expiring = list(slot.store.slots)[:op_count]
+    slot.store.update_many({uid: {"end_ts": now - 60} for uid in expiring})
+    await phase("expire_slot", [(lambda u=uid: slot.expire_slot(u)) for uid in expiring])
+
+    slot.store.flush()
+    return {"size": size, "latency_ms": latency * 1000, "storage": slot.STORAGE_MODE, "results": results}
+
+
+def use_storage(mode):
+    """Point the scratch config.json at a storage backend before slot.py reads it."""
+    with open("config.json") as f:
+        config = json.load(f)
+    config["STORAGE_MODE"] = mode
+    with open("config.json", "w") as f:
+        json.dump(config, f)
+
+
+def child_main(args):
+    use_storage(args.storage)
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    report = loop.run_until_complete(run_child(args.size, args.latency_ms / 1000))
+    print("BENCH_RESULT " + json.dumps(report))
+    # Leftover delete_after and scheduler timers belong to the fake session
+    os._exit(0)
+
+
+def spawn(script, size, child_args):
+    """Run `script --child --size N ...` in a scratch directory and return its BENCH_RESULT."""
+    scratch = tempfile.mkdtemp(prefix=f"slotbench-{size}-")
+    try:
+        shutil.copy(os.path.join(REPO_DIR, "config.json"), scratch)
+        cmd = [sys.executable, os.path.abspath(script), "--child", "--size", str(size), *child_args]
+        proc = subprocess.run(cmd, cwd=scratch, capture_output=True, text=True)
+        for line in proc.stdout.splitlines():
+            if line.startswith("BENCH_RESULT "):
+                return json.loads(line[len("BENCH_RESULT "):])
+        sys.stderr.write(proc.stdout[-4000:] + proc.stderr[-4000:])
+        raise SystemExit(f"{os.path.basename(script)} at {size} slots failed (exit {proc.returncode})")
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+def run_size(size, args):
+    return spawn(__file__, size, ["--storage", args.storage, "--latency-ms", str(args.latency_ms)])
+
+
+def print_table(report):
+    print(f"\n== {report['size']} slots • storage={report['storage']} • api latency={report['latency_ms']:.0f}ms ==")
+    print(f"{'operation':<18}{'ops':>6}{'ops/s':>11}{'p50 ms':>10}{'p99 ms':>10}{'calls/op':>10}  top routes")
+    for r in report["results"]:
+        routes = ", ".join(f"{route} x{n}" for route, n in list(r["routes"].items())[:3])
+        print(f"{r['op']:<18}{r['count']:>6}{r['ops_per_sec']:>11.1f}{r['p50_ms']:>10.2f}{r['p99_ms']:>10.2f}"
+              f"{r['api_calls_per_op']:>10.2f}  {routes}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES))
+    parser.add_argument("--storage", choices=("json", "journal", "sqlite"), default="json")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="simulated round trip per API call")
+    parser.add_argument("--json", action="store_true", help="print raw results as JSON instead of tables")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--size", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        return child_main(args)
+
+    reports = [run_size(size, args) for size in args.sizes]
+    if args.json:
+        print(json.dumps(reports, indent=2))
+    else:
+        for report in reports:
+            print_table(report)
+
+
+if __name__ == "__main__":
+    main()
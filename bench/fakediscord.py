@@ -0,0 +1,350 @@
+"""In-process stand-in for Discord, for benchmarking slot.py offline.
+
+FakeDiscord builds a synthetic guild (configured roles and categories, one
+text channel and owning member per slot, some members without a slot) and
+loads it into a real discord.py Bot's connection state, so slot.py works
+with genuine Guild/TextChannel/Member/Message objects. Every REST call goes
+through bot.http.request, which is replaced by FakeDiscord.request: it
+counts calls per route ("POST /channels/{channel_id}/messages"), optionally
+waits a fixed latency, and answers from an in-memory model of channels,
+messages, users and members. Edits that Discord would echo over the gateway
+(channel and member updates) are applied to the cache the same way.
+
+Routes without a handler are still counted and answer None.
+"""
+
+import collections
+import datetime
+import re
+
+import discord
+
+
+class FakeResponse:
+    def __init__(self, status, reason):
+        self.status = status
+        self.reason = reason
+
+
+def not_found(what):
+    return discord.NotFound(FakeResponse(404, "Not Found"), {"code": 10000, "message": f"Unknown {what}"})
+
+
+class FakeDiscord:
+    def __init__(self, config, slot_count, spare_members=0, messages_per_channel=5, latency=0.0, clock=None):
+        self.config = config
+        self.slot_count = slot_count
+        self.latency = latency
+        self.clock = clock or (lambda: datetime.datetime.now(datetime.timezone.utc))
+        self.calls = collections.Counter()
+        self.guild_id = 900000000000000000
+        self.bot_id = 900000000000000001
+        self.state = None
+        self._seq = 0
+
+        self.users = {}
+        self.members = {}
+        self.channels = {}
+        self.dm_channels = {}
+        self.messages = collections.defaultdict(dict)
+        self.slots = {}
+
+        self._routes = [(re.compile("^" + re.sub(r"\\\{(\w+)\\\}", r"(?P<\1>[^/]+)", re.escape(key.split(" ", 1)[1])) + "$"),
+                         key, handler) for key, handler in self._handlers().items()]
+        self._build(slot_count, spare_members, messages_per_channel)
+
+    # --- synthetic population ---
+    def snowflake(self):
+        self._seq += 1
+        return discord.utils.time_snowflake(self.clock()) + self._seq % (1 << 22)
+
+    def _user(self, user_id, name, bot=False):
+        user = {"id": str(user_id), "username": name, "discriminator": "0", "global_name": None, "avatar": None, "bot": bot}
+        self.users[user_id] = user
+        return user
+
+    def _member(self, user_id, name, roles=(), bot=False):
+        member = {"user": self._user(user_id, name, bot), "roles": [str(r) for r in roles], "joined_at": "2024-01-01T00:00:00+00:00",
+                  "deaf": False, "mute": False, "flags": 0}
+        self.members[user_id] = member
+        return member
+
+    def _channel(self, channel_id, name, channel_type=0, parent_id=None, overwrites=()):
+        channel = {"id": str(channel_id), "type": channel_type, "guild_id": str(self.guild_id), "name": name, "position": len(self.channels),
+                   "parent_id": str(parent_id) if parent_id else None, "permission_overwrites": list(overwrites), "nsfw": False,
+                   "topic": None, "rate_limit_per_user": 0, "last_message_id": None}
+        self.channels[channel_id] = channel
+        return channel
+
+    def _build(self, slot_count, spare_members, messages_per_channel):
+        config = self.config
+        role_ids = {config[key] for key in ("STANDARD_ROLE_ID", "ELITE_ROLE_ID", "EVERYONE_ROLE_ID", "MEMBER_ROLE_ID",
+                                            "STAFF_ROLE_ID", "ACCESS_ROLE_ID", "ON_HOLD_ROLE_ID") if config.get(key)}
+        self.admin_role_id = self.guild_id + 1
+        self.roles = [{"id": str(self.guild_id), "name": "@everyone", "permissions": str(discord.Permissions.general().value),
+                       "position": 0, "color": 0, "hoist": False, "managed": False, "mentionable": False}]
+        self.roles += [{"id": str(role_id), "name": f"role-{i}", "permissions": "0", "position": i + 1, "color": 0,
+                        "hoist": False, "managed": False, "mentionable": True} for i, role_id in enumerate(sorted(role_ids))]
+        self.roles.append({"id": str(self.admin_role_id), "name": "admin", "permissions": str(discord.Permissions(administrator=True).value),
+                           "position": len(self.roles), "color": 0, "hoist": False, "managed": False, "mentionable": False})
+
+        self._member(self.bot_id, "slotbot", roles=[self.admin_role_id], bot=True)
+        for key in ("CATEGORY_1_ID", "CATEGORY_2_ID", "REVOKED_SLOT_CATEGORY_ID"):
+            self._channel(config[key], key.lower(), channel_type=4)
+        for key in ("ADMIN_LOG_CHANNEL", "PING_RESET_CHANNEL"):
+            self._channel(config[key], key.lower())
+
+        now = int(self.clock().timestamp())
+        for i in range(slot_count):
+            plan = "elite" if i % 4 == 0 else "standard"
+            owner_id = 100000000000000000 + i
+            channel_id = 200000000000000000 + i
+            plan_role = config["ELITE_ROLE_ID"] if plan == "elite" else config["STANDARD_ROLE_ID"]
+            self._member(owner_id, f"owner{i}", roles=[plan_role, config["ACCESS_ROLE_ID"]])
+            category = config["CATEGORY_1_ID"] if plan == "elite" else config["CATEGORY_2_ID"]
+            self._channel(channel_id, f"slot-{i}", parent_id=category)
+            welcome = self._message(channel_id, self.bot_id, embeds=[{"title": "**Slot created**"}])
+            tracker = self._message(channel_id, self.bot_id, embeds=[{"title": "Ping usage"}])
+            for n in range(messages_per_channel):
+                self._message(channel_id, owner_id, content=f"selling item {i}-{n} cheap, dm for prices")
+            self.slots[str(owner_id)] = {
+                "recovery_key": f"KEY{i:08d}",
+                "channel_id": channel_id,
+                "start_ts": now - 86400,
+                "end_ts": now + 30 * 86400 + i,
+                "plan": plan,
+                "everyone_used": 0,
+                "here_used": 0,
+                "held": False,
+                "welcome_msg_id": int(welcome["id"]),
+                "sticky_msg_id": int(tracker["id"]),
+            }
+        self.spare_member_ids = []
+        for i in range(spare_members):
+            member_id = 300000000000000000 + i
+            self._member(member_id, f"member{i}")
+            self.spare_member_ids.append(member_id)
+
+    def _message(self, channel_id, author_id, content="", embeds=(), reference=None):
+        message_id = self.snowflake()
+        message = {"id": str(message_id), "channel_id": str(channel_id), "author": self.users[author_id], "content": content,
+                   "timestamp": discord.utils.snowflake_time(message_id).isoformat(), "edited_timestamp": None, "tts": False,
+                   "mention_everyone": "@everyone" in content or "@here" in content, "mentions": [], "mention_roles": [],
+                   "attachments": [], "embeds": list(embeds), "components": [], "pinned": False, "type": 0}
+        if channel_id in self.channels:
+            message["guild_id"] = str(self.guild_id)
+            self.channels[channel_id]["last_message_id"] = str(message_id)
+        if reference:
+            message["message_reference"] = reference
+        self.messages[channel_id][message_id] = message
+        return message
+
+    def user_message(self, channel, author, content):
+        """A real discord.Message as if `author` had just posted `content` in `channel`."""
+        data = self._message(channel.id, author.id, content=content)
+        data["member"] = {k: v for k, v in self.members[author.id].items() if k != "user"}
+        channel.last_message_id = int(data["id"])
+        return self.state.create_message(channel=channel, data=data)
+
+    # --- wiring into discord.py ---
+    async def attach(self, bot):
+        """Load the guild into bot's state and route its HTTP through this fake."""
+        await bot._async_setup_hook()
+        self.state = state = bot._connection
+        state.user = discord.ClientUser(state=state, data=self.users[self.bot_id])
+        state._users[self.bot_id] = state.user
+        state._add_guild_from_data({
+            "id": str(self.guild_id), "name": "Benchmark Guild", "owner_id": str(self.bot_id), "roles": self.roles,
+            "channels": list(self.channels.values()), "members": list(self.members.values()),
+            "member_count": len(self.members), "emojis": [], "stickers": [], "features": [], "threads": [],
+            "stage_instances": [], "guild_scheduled_events": [], "presences": [], "voice_states": [],
+        })
+        # Swap the transport underneath any instrumentation wrappers (request.__wrapped__)
+        owner, attr = bot.http, "request"
+        while hasattr(getattr(owner, attr), "__wrapped__"):
+            owner, attr = getattr(owner, attr), "__wrapped__"
+        setattr(owner, attr, self.request)
+        self.guild = bot.get_guild(self.guild_id)
+        return self.guild
+
+    # --- fake REST API ---
+    async def request(self, route, *, files=None, form=None, **kwargs):
+        self.calls[route.key] += 1
+        if self.latency:
+            await asyncio_sleep(self.latency)
+        path = route.url[len(route.BASE):]
+        for pattern, key, handler in self._routes:
+            if key == route.key:
+                match = pattern.match(path)
+                if match:
+                    ids = {name: int(value) if value.isdigit() else value for name, value in match.groupdict().items()}
+                    return handler(json=kwargs.get("json"), params=kwargs.get("params"), **ids)
+        return None
+
+    def _handlers(self):
+        return {
+            "POST /channels/{channel_id}/messages": self._create_message,
+            "GET /channels/{channel_id}/messages": self._logs_from,
+            "GET /channels/{channel_id}/messages/{message_id}": self._get_message,
+            "PATCH /channels/{channel_id}/messages/{message_id}": self._edit_message,
+            "DELETE /channels/{channel_id}/messages/{message_id}": self._delete_message,
+            "POST /channels/{channel_id}/messages/bulk-delete": self._bulk_delete,
+            "PATCH /channels/{channel_id}": self._edit_channel,
+            "POST /guilds/{guild_id}/channels": self._create_channel,
+            "GET /users/{user_id}": self._get_user,
+            "POST /users/@me/channels": self._open_dm,
+            "PATCH /guilds/{guild_id}/members/{user_id}": self._edit_member,
+            "PUT /guilds/{guild_id}/members/{user_id}/roles/{role_id}": self._add_role,
+            "DELETE /guilds/{guild_id}/members/{user_id}/roles/{role_id}": self._remove_role,
+        }
+
+    def _channel_messages(self, channel_id):
+        if channel_id not in self.channels and channel_id not in self.dm_channels:
+            raise not_found("Channel")
+        return self.messages[channel_id]
+
+    def _create_message(self, channel_id, json=None, **_):
+        self._channel_messages(channel_id)
+        json = json or {}
+        return self._message(channel_id, self.bot_id, content=json.get("content") or "", embeds=json.get("embeds") or (),
+                             reference=json.get("message_reference"))
+
+    def _logs_from(self, channel_id, params=None, **_):
+        params = params or {}
+        limit = int(params.get("limit", 50))
+        ids = sorted(self._channel_messages(channel_id), reverse=True)
+        if "before" in params:
+            ids = [i for i in ids if i < int(params["before"])]
+        if "after" in params:
+            ids = [i for i in ids if i > int(params["after"])][-limit:]
+        return [self.messages[channel_id][i] for i in ids[:limit]]
+
+    def _get_message(self, channel_id, message_id, **_):
+        message = self._channel_messages(channel_id).get(message_id)
+        if message is None:
+            raise not_found("Message")
+        return message
+
+    def _edit_message(self, channel_id, message_id, json=None, **_):
+        message = self._get_message(channel_id, message_id)
+        message.update({k: v for k, v in (json or {}).items() if k in ("content", "embeds", "components")})
+        return message
+
+    def _delete_message(self, channel_id, message_id, **_):
+        if self._channel_messages(channel_id).pop(message_id, None) is None:
+            raise not_found("Message")
+
+    def _bulk_delete(self, channel_id, json=None, **_):
+        messages = self._channel_messages(channel_id)
+        for message_id in (json or {}).get("messages", ()):
+            messages.pop(int(message_id), None)
+
+    def _edit_channel(self, channel_id, json=None, **_):
+        channel = self.channels.get(channel_id)
+        if channel is None:
+            raise not_found("Channel")
+        for key, value in (json or {}).items():
+            channel[key] = str(value) if key == "parent_id" and value else value
+        # Discord echoes the change over the gateway; keep the cache in step the same way
+        self.state.parse_channel_update(dict(channel))
+        return channel
+
+    def _create_channel(self, guild_id, json=None, **_):
+        json = json or {}
+        channel = self._channel(self.snowflake(), json.get("name", "channel"), json.get("type", 0), json.get("parent_id"),
+                                json.get("permission_overwrites", ()))
+        self.state.parse_channel_create(dict(channel))
+        return channel
+
+    def _get_user(self, user_id, **_):
+        user = self.users.get(user_id)
+        if user is None:
+            raise not_found("User")
+        return user
+
+    def _open_dm(self, json=None, **_):
+        user_id = int(json["recipient_id"])
+        if user_id not in self.dm_channels.values():
+            self.dm_channels[self.snowflake()] = user_id
+        channel_id = next(c for c, u in self.dm_channels.items() if u == user_id)
+        return {"id": str(channel_id), "type": 1, "recipients": [self._get_user(user_id)], "last_message_id": None}
+
+    def _edit_member(self, guild_id, user_id, json=None, **_):
+        member = self.members.get(user_id)
+        if member is None:
+            raise not_found("Member")
+        if json and "roles" in json:
+            member["roles"] = [str(r) for r in json["roles"]]
+        self.state.parse_guild_member_update({"guild_id": str(guild_id), **member})
+        return member
+
+    def _add_role(self, guild_id, user_id, role_id, **_):
+        member = self.members[user_id]
+        if str(role_id) not in member["roles"]:
+            member["roles"].append(str(role_id))
+        self.state.parse_guild_member_update({"guild_id": str(guild_id), **member})
+
+    def _remove_role(self, guild_id, user_id, role_id, **_):
+        member = self.members[user_id]
+        member["roles"] = [r for r in member["roles"] if r != str(role_id)]
+        self.state.parse_guild_member_update({"guild_id": str(guild_id), **member})
+
+
+async def asyncio_sleep(delay):
+    # Looked up at call time so a virtual clock can patch asyncio.sleep
+    import asyncio
+    await asyncio.sleep(delay)
+
+
+class FakeContext:
+    """Just enough of commands.Context to call a command's callback directly."""
+
+    def __init__(self, bot, channel, author):
+        self.bot = bot
+        self.channel = channel
+        self.author = author
+        self.guild = channel.guild
+        self.message = None
+
+    async def send(self, *args, **kwargs):
+        return await self.channel.send(*args, **kwargs)
+
+    async def reply(self, *args, **kwargs):
+        return await self.channel.send(*args, **kwargs)
+
+
+class FakeInteractionResponse:
+    def __init__(self, fake):
+        self.fake = fake
+        self._done = False
+
+    def is_done(self):
+        return self._done
+
+    async def send_message(self, *args, **kwargs):
+        self.fake.calls["POST /interactions/{interaction_id}/{interaction_token}/callback"] += 1
+        self._done = True
+
+    async def send_modal(self, modal):
+        await self.send_message()
+
+    async def defer(self, *args, **kwargs):
+        await self.send_message()
+
+
+class FakeFollowup:
+    def __init__(self, fake):
+        self.fake = fake
+
+    async def send(self, *args, **kwargs):
+        self.fake.calls["POST /webhooks/{webhook_id}/{webhook_token}"] += 1
+
+
+class FakeInteraction:
+    """Just enough of discord.Interaction for modal submit handlers."""
+
+    def __init__(self, fake, user):
+        self.user = user
+        self.guild = user.guild
+        self.response = FakeInteractionResponse(fake)
+        self.followup = FakeFollowup(fake)
@@ -0,0 +1,311 @@
+"""Replay weeks of slot lifecycle against the fake Discord in seconds.
+
+The child process runs slot.py on a VirtualClockLoop (bench/virtualclock.py),
+so the deadline scheduler's expiry and warning handlers, the Amsterdam
+midnight daily_ping_reset, outbox retries and every debounce timer fire on a
+clock that skips idle time. Slots get end dates spread over the first weeks,
+and owners post through the fake gateway (bot.dispatch) as a Poisson stream,
+a share of them with @everyone/@here while the plan still allows it.
+
+Reported for the simulated period:
+  - Discord API calls per route per simulated hour
+  - peak depth of the outbox, admin-log buffer, self-destruct queue,
+    scheduler heap and concurrent API requests
+  - storage bytes written per hour (write() volume from /proc/self/io,
+    so Linux only; n/a elsewhere)
+
+    python bench/simulate.py                        # 1000 slots, 30 days
+    python bench/simulate.py --sizes 100 1000 10000 --days 7 --storage sqlite
+    python bench/simulate.py --json > bench_output.txt
+"""
+
+import argparse
+import asyncio
+import collections
+import datetime
+import io
+import json
+import os
+import random
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from bench_slot import spawn, use_storage, write_population  # noqa: E402
+from fakediscord import FakeDiscord  # noqa: E402
+from virtualclock import VirtualClockLoop, install_clock  # noqa: E402
+
+HOUR = 3600
+DAY = 24 * HOUR
+
+
+def bytes_written():
+    try:
+        with open("/proc/self/io") as f:
+            for line in f:
+                if line.startswith("wchar:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+class RingLog(io.TextIOBase):
+    """Keeps the last lines slot.py prints instead of writing them out."""
+
+    def __init__(self, size=200):
+        self.lines = collections.deque(maxlen=size)
+
+    def write(self, text):
+        self.lines.append(text)
+        return len(text)
+
+
+class Recorder:
+    """Buckets API calls and events per simulated hour and tracks queue peaks."""
+
+    def __init__(self, clock, slot):
+        self.clock = clock
+        self.slot = slot
+        self.origin = clock.time()
+        self.calls = collections.defaultdict(collections.Counter)
+        self.events = collections.defaultdict(collections.Counter)
+        self.written = {}
+        self.peaks = collections.Counter()
+        self.in_flight = 0
+
+    def hour(self):
+        return int((self.clock.time() - self.origin) // HOUR)
+
+    def event(self, name):
+        self.events[self.hour()][name] += 1
+
+    def sample(self):
+        slot = self.slot
+        depths = {
+            "outbox": len(slot.outbox.pending),
+            "admin_log_buffer": len(slot.admin_log.buffer),
+            "self_destruct": len(slot.ephemeral.pending),
+            "scheduler_heap": len(slot.scheduler._heap),
+            "api_in_flight": self.in_flight,
+        }
+        for name, depth in depths.items():
+            if depth > self.peaks[name]:
+                self.peaks[name] = depth
+
+    def wrap_request(self, request):
+        async def counted(route, **kwargs):
+            self.calls[self.hour()][route.key] += 1
+            self.in_flight += 1
+            self.sample()
+            try:
+                return await request(route, **kwargs)
+            finally:
+                self.in_flight -= 1
+        return counted
+
+    def wrap_handler(self, name, handler):
+        async def counted(*args, **kwargs):
+            self.event(name)
+            return await handler(*args, **kwargs)
+        return counted
+
+    async def meter_storage(self):
+        last = bytes_written()
+        hour = 0
+        while last is not None:
+            await asyncio.sleep(self.origin + (hour + 1) * HOUR - self.clock.time())
+            self.sample()
+            now = bytes_written()
+            self.written[hour] = now - last
+            last = now
+            hour += 1
+
+    def report(self, hours):
+        return [{
+            "hour": h,
+            "calls": sum(self.calls[h].values()),
+            "routes": dict(self.calls[h].most_common()),
+            "bytes_written": self.written.get(h),
+            "events": dict(self.events[h]),
+        } for h in range(hours)]
+
+
+async def owner_traffic(fake, slot, guild, recorder, rng, messages_per_day, ping_share):
+    owners = list(slot.store.slots)
+    per_second = len(owners) * messages_per_day / DAY
+    while owners and per_second:
+        await asyncio.sleep(rng.expovariate(per_second))
+        uid = rng.choice(owners)
+        data = slot.store.get(uid)
+        if data is None or data.get("held"):
+            continue
+        member = guild.get_member(int(uid))
+        channel = guild.get_channel(data["channel_id"])
+        content = "restock live, dm for prices"
+        if rng.random() < ping_share:
+            limits = data.get("custom_limits", slot.PING_LIMITS[data["plan"]])
+            if data["everyone_used"] < limits["everyone"]:
+                content = "@everyone " + content
+            elif data["here_used"] < limits["here"]:
+                content = "@here " + content
+        recorder.event("ping" if "@" in content else "message")
+        slot.bot.dispatch("message", fake.user_message(channel, member, content))
+
+
+async def simulate(size, days, latency, messages_per_day, ping_share, seed):
+    import discord
+    import discord.ext.tasks
+
+    clock = asyncio.get_running_loop()
+    rng = random.Random(seed)
+    with open("config.json") as f:
+        config = json.load(f)
+    fake = FakeDiscord(config, size, messages_per_channel=2, latency=latency, clock=clock.now)
+    start = clock.timestamp()
+    for data in fake.slots.values():
+        data["end_ts"] = int(start + rng.uniform(0.5, 45) * DAY)
+    write_population(size, fake)
+
+    sys.path.insert(0, REPO_DIR)
+    import slot
+
+    time_shim = install_clock(clock, slot, discord.utils, discord.ext.tasks)
+    slot.scheduler.clock = slot.ephemeral.scheduler.clock = time_shim.time
+    guild = await fake.attach(slot.bot)
+
+    recorder = Recorder(clock, slot)
+    slot.bot.http.request = recorder.wrap_request(slot.bot.http.request)
+    for kind, handler in list(slot.scheduler.handlers.items()):
+        slot.scheduler.handlers[kind] = recorder.wrap_handler(kind, handler)
+    slot.reset_ping_counters = recorder.wrap_handler("ping_reset", slot.reset_ping_counters)
+
+    # What on_ready starts
+    channels = [guild.get_channel(data["channel_id"]) for data in slot.store.slots.values()]
+    slot.outbox.start()
+    slot.scheduler.start(list(slot.store.slots))
+    slot.ephemeral.start()
+    slot.ledger.reconcile(channels)
+    asyncio.create_task(slot.search_index.catch_up(channels))
+    slot.daily_ping_reset.start()
+
+    background = [
+        asyncio.create_task(recorder.meter_storage()),
+        asyncio.create_task(owner_traffic(fake, slot, guild, recorder, rng, messages_per_day, ping_share)),
+    ]
+    started = time.perf_counter()
+    await asyncio.sleep(days * DAY)
+    for task in background:
+        task.cancel()
+
+    hours = days * 24
+    per_hour = recorder.report(hours)
+    routes = collections.Counter()
+    events = collections.Counter()
+    for row in per_hour:
+        routes.update(row["routes"])
+        events.update(row["events"])
+    written = [row["bytes_written"] for row in per_hour if row["bytes_written"] is not None]
+    return {
+        "size": size,
+        "days": days,
+        "storage": slot.STORAGE_MODE,
+        "latency_ms": latency * 1000,
+        "start": datetime.datetime.fromtimestamp(start, datetime.timezone.utc).isoformat(),
+        "real_seconds": time.perf_counter() - started,
+        "api_calls": sum(routes.values()),
+        "routes": dict(routes.most_common()),
+        "events": dict(events),
+        "peaks": dict(recorder.peaks),
+        "bytes_written": sum(written) if written else None,
+        "hours": per_hour,
+    }
+
+
+def child_main(args):
+    use_storage(args.storage)
+    log = RingLog()
+    sys.stdout = sys.stderr = log
+    epoch = datetime.datetime.now(datetime.timezone.utc).replace(microsecond=0)
+    loop = VirtualClockLoop(epoch)
+    asyncio.set_event_loop(loop)
+    try:
+        report = loop.run_until_complete(simulate(args.size, args.days, args.latency_ms / 1000,
+                                                  args.messages_per_day, args.ping_share, args.seed))
+    except BaseException:
+        sys.__stderr__.write("".join(log.lines))
+        raise
+    sys.__stdout__.write("BENCH_RESULT " + json.dumps(report) + "\n")
+    sys.__stdout__.flush()
+    os._exit(0)
+
+
+def fmt_bytes(n):
+    if n is None:
+        return "n/a"
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if n < 1024 or unit == "GiB":
+            return f"{n:.0f}{unit}" if unit == "B" else f"{n:.1f}{unit}"
+        n /= 1024
+
+
+def print_report(report):
+    start = datetime.datetime.fromisoformat(report["start"])
+    print(f"\n== {report['size']} slots • {report['days']} days • storage={report['storage']} • "
+          f"api latency={report['latency_ms']:.0f}ms • simulated in {report['real_seconds']:.1f}s ==")
+    events = ", ".join(f"{name} {count}" for name, count in sorted(report["events"].items()))
+    print(f"API calls: {report['api_calls']}  •  storage written: {fmt_bytes(report['bytes_written'])}  •  {events}")
+    print("Peak depth: " + ", ".join(f"{name} {depth}" for name, depth in report["peaks"].items()))
+
+    print(f"\n{'route':<64}{'calls':>9}{'per hour':>10}{'peak hour':>11}")
+    for route, calls in list(report["routes"].items())[:12]:
+        peak = max(row["routes"].get(route, 0) for row in report["hours"])
+        print(f"{route:<64}{calls:>9}{calls / len(report['hours']):>10.1f}{peak:>11}")
+
+    print(f"\n{'day':<12}{'calls':>9}{'busiest hour (UTC)':>22}{'written':>11}  events")
+    for day in range(report["days"]):
+        rows = report["hours"][day * 24:(day + 1) * 24]
+        busiest = max(rows, key=lambda row: row["calls"])
+        label = (start + datetime.timedelta(hours=busiest["hour"])).strftime("%H:00")
+        written = [row["bytes_written"] for row in rows if row["bytes_written"] is not None]
+        day_events = collections.Counter()
+        for row in rows:
+            day_events.update(row["events"])
+        print(f"{(start + datetime.timedelta(days=day)).strftime('%Y-%m-%d'):<12}{sum(row['calls'] for row in rows):>9}"
+              f"{label + ' x' + str(busiest['calls']):>22}{fmt_bytes(sum(written) if written else None):>11}  "
+              + ", ".join(f"{name} {count}" for name, count in sorted(day_events.items())))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000])
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--storage", choices=("json", "journal", "sqlite"), default="json")
+    parser.add_argument("--latency-ms", type=float, default=80.0, help="simulated round trip per API call")
+    parser.add_argument("--messages-per-day", type=float, default=6.0, help="owner posts per slot per day")
+    parser.add_argument("--ping-share", type=float, default=0.25, help="share of posts that try to ping")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", action="store_true", help="print raw results as JSON instead of tables")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--size", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        return child_main(args)
+
+    child_args = ["--days", str(args.days), "--storage", args.storage, "--latency-ms", str(args.latency_ms),
+                  "--messages-per-day", str(args.messages_per_day), "--ping-share", str(args.ping_share),
+                  "--seed", str(args.seed)]
+    reports = [spawn(__file__, size, child_args) for size in args.sizes]
+    if args.json:
+        print(json.dumps(reports, indent=2))
+    else:
+        for report in reports:
+            print_report(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""An asyncio event loop whose clock jumps ahead whenever it would sleep.
+
+VirtualClockLoop behaves like the default selector loop, except that when
+nothing is ready and no worker thread result is awaited (run_in_executor or
+asyncio.wrap_future), it advances its clock to the next timer instead of
+blocking. Timers, asyncio.sleep and
+wait_for therefore cost no wall time, and a month of scheduler deadlines,
+debounce windows and midnight jobs runs in as long as the work itself.
+
+install_clock() points the wall clock of slot.py, discord.utils and
+discord.ext.tasks (time.time, time.monotonic, datetime.now/utcnow) at the
+loop's clock, so everything that reads the date agrees with the timers.
+"""
+
+import asyncio
+import concurrent.futures
+import datetime as real_datetime
+import threading
+import time as real_time
+import types
+
+
+class _VirtualSelector:
+    def __init__(self, selector, loop):
+        self._selector = selector
+        self._loop = loop
+
+    def select(self, timeout=None):
+        loop = self._loop
+        if loop.in_flight:
+            # A worker thread will call back into the loop; wait for it in real time
+            return self._selector.select(timeout if timeout is not None else 1.0)
+        events = self._selector.select(0)
+        if not events and timeout:
+            loop.skipped += timeout
+        return events
+
+    def __getattr__(self, name):
+        return getattr(self._selector, name)
+
+
+class VirtualClockLoop(asyncio.SelectorEventLoop):
+    def __init__(self, epoch):
+        self.skipped = 0.0
+        self.in_flight = 0
+        self._in_flight_lock = threading.Lock()
+        super().__init__()
+        self._selector = _VirtualSelector(self._selector, self)
+        self._origin = super().time()
+        self.epoch = epoch
+
+    def time(self):
+        return super().time() + self.skipped
+
+    def now(self):
+        """Virtual wall clock as an aware UTC datetime."""
+        return self.epoch + real_datetime.timedelta(seconds=self.time() - self._origin)
+
+    def timestamp(self):
+        return self.epoch.timestamp() + self.time() - self._origin
+
+    def run_in_executor(self, executor, func, *args):
+        future = super().run_in_executor(executor, func, *args)
+        with self._in_flight_lock:
+            self.in_flight += 1
+        future.add_done_callback(self._untrack)
+        return future
+
+    def _untrack(self, _):
+        with self._in_flight_lock:
+            self.in_flight -= 1
+
+    def track(self, future):
+        """Count a concurrent.futures.Future the loop will be woken by when it finishes."""
+        with self._in_flight_lock:
+            self.in_flight += 1
+        future.add_done_callback(self._untrack)
+        return future
+
+
+def install_clock(clock, *modules):
+    """Make `modules` read time from the virtual loop `clock`, and have it wait
+    for worker threads handed to asyncio.wrap_future instead of skipping ahead."""
+    class VirtualDatetime(real_datetime.datetime):
+        @classmethod
+        def now(cls, tz=None):
+            now = clock.now()
+            return now.astimezone(tz) if tz else now.astimezone().replace(tzinfo=None)
+
+        @classmethod
+        def utcnow(cls):
+            return clock.now().replace(tzinfo=None)
+
+    datetime_shim = types.ModuleType("datetime")
+    datetime_shim.__dict__.update(real_datetime.__dict__)
+    datetime_shim.datetime = VirtualDatetime
+
+    time_shim = types.ModuleType("time")
+    time_shim.__dict__.update(real_time.__dict__)
+    time_shim.time = clock.timestamp
+    time_shim.monotonic = clock.time
+
+    for module in modules:
+        if getattr(module, "datetime", None) is real_datetime:
+            module.datetime = datetime_shim
+        if getattr(module, "time", None) is real_time:
+            module.time = time_shim
+
+    wrap_future = asyncio.wrap_future
+
+    def tracked_wrap_future(future, *, loop=None):
+        if isinstance(future, concurrent.futures.Future):
+            clock.track(future)
+        return wrap_future(future, loop=loop)
+    asyncio.wrap_future = tracked_wrap_future
+    return time_shim
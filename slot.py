@@ -6,6 +6,21 @@ import datetime
 import pytz
 import asyncio
 import uuid
+import hmac
+import hashlib
+import time
+import heapq
+import bisect
+import collections
+import concurrent.futures
+import contextlib
+import contextvars
+import functools
+import logging
+import sqlite3
+import sys
+import threading
+import traceback
 
 # Load configuration from config.json
 with open('config.json', 'r') as f:
@@ -30,24 +45,1215 @@ PING_LIMITS = {
 
 PING_RESET_ALERT_CHANNEL = CONFIG["PING_RESET_CHANNEL"]
 ADMIN_LOG_CHANNEL = CONFIG["ADMIN_LOG_CHANNEL"]
+SUGGESTION_CHANNEL_ID = CONFIG["SUGGESTION_CHANNEL_ID"]
 
+SNAPSHOT_FILE = "data/slot_store.json"
+# Pre-snapshot layout, read once to seed SNAPSHOT_FILE and no longer written
 SLOTS_FILE = "data/slots.json"
 REVOKED_FILE = "data/revoked_slots.json"
+JOURNAL_FILE = "data/slots.journal"
+SQLITE_FILE = "data/slots.db"
+RECOVERY_SALT_FILE = "data/recovery.salt"
+# Plaintext recovery keys by salted hash; slot records only carry the hash
+RECOVERY_KEYS_FILE = "data/recovery_keys.json"
 
-# Ensure data folder and files exist
+# "json" rewrites the slot files on change, "journal" appends per-mutation
+# records, "sqlite" keeps slots in an indexed database
+STORAGE_MODE = CONFIG.get("STORAGE_MODE", "json")
+
+# Ensure data folder exists
 os.makedirs("data", exist_ok=True)
-for file in [SLOTS_FILE, REVOKED_FILE]:
-    if not os.path.exists(file):
-        with open(file, "w") as f:
-            json.dump({}, f)
+
+# Per-install secret for hashing recovery keys; the key index never holds plaintext
+if not os.path.exists(RECOVERY_SALT_FILE):
+    with open(RECOVERY_SALT_FILE, "w") as f:
+        f.write(os.urandom(32).hex())
+with open(RECOVERY_SALT_FILE, "r") as f:
+    RECOVERY_SALT = bytes.fromhex(f.read().strip())
+
+def hash_recovery_key(key):
+    return hmac.new(RECOVERY_SALT, key.strip().upper().encode(), hashlib.sha256).hexdigest()
+
+# --- Metrics ---
+# Upper bounds (seconds) of the latency histogram buckets; one more bucket holds the rest
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+METRICS_FILE = CONFIG.get("METRICS_FILE", "data/metrics.prom")
+METRICS_EXPORT_INTERVAL = 15
+
+# The command, event or job the running code works for; tasks it spawns inherit it
+current_flow = contextvars.ContextVar("current_flow", default="background")
+
+
+class Histogram:
+    """Fixed buckets of observed durations, plus their sum and maximum."""
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.sum = 0.0
+        self.max = 0.0
+
+    @property
+    def count(self):
+        return sum(self.counts)
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th observation, capped at the maximum."""
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(LATENCY_BUCKETS + (self.max,), self.counts):
+            seen += n
+            if n and seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+
+class Metrics:
+    """In-process counters for =perf and the Prometheus text file.
+
+    Handlers (commands, gateway events, task loop iterations, scheduler and
+    outbox jobs) get a latency Histogram each, Discord REST calls are counted
+    per route and storage reads/writes per backend with their bytes. Other
+    sections add their own counters or gauges through register(). Storage is
+    counted from writer threads, so those counters take a lock.
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self.handlers = collections.defaultdict(Histogram)
+        self.handler_errors = collections.Counter()
+        self.requests = collections.Counter()
+        self.request_seconds = collections.Counter()
+        self.request_errors = collections.Counter()
+        self.storage_ops = collections.Counter()
+        self.storage_bytes = collections.Counter()
+        self._storage_lock = threading.Lock()
+        self._collectors = {}
+
+    def observe(self, name, seconds, failed=False):
+        self.handlers[name].observe(seconds)
+        if failed:
+            self.handler_errors[name] += 1
+
+    @contextlib.contextmanager
+    def timer(self, name):
+        started = time.monotonic()
+        failed = True
+        token = current_flow.set(name)
+        try:
+            yield
+            failed = False
+        finally:
+            current_flow.reset(token)
+            self.observe(name, time.monotonic() - started, failed)
+
+    def request(self, route, seconds, status=None):
+        self.requests[route] += 1
+        self.request_seconds[route] += seconds
+        if status is not None:
+            self.request_errors[route, status] += 1
+
+    def storage(self, backend, op, nbytes=0):
+        with self._storage_lock:
+            self.storage_ops[backend, op] += 1
+            self.storage_bytes[backend, op] += nbytes
+
+    def register(self, name, kind, help_text, label, collect):
+        """Export collect() -> {label value: number} as `name`; several sections may share a name."""
+        entry = self._collectors.setdefault(name, (kind, help_text, label, []))
+        entry[3].append(collect)
+
+    def prometheus(self):
+        """Everything in the Prometheus text exposition format."""
+        lines = []
+
+        def family(name, kind, help_text):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        def sample(name, labels, value):
+            label_text = ",".join(f'{k}="{_prom_escape(v)}"' for k, v in labels.items())
+            lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+
+        family("slot_handler_seconds", "histogram", "Time spent in commands, events, task loops and background jobs.")
+        for name, hist in sorted(self.handlers.items()):
+            seen = 0
+            for bound, n in zip(LATENCY_BUCKETS, hist.counts):
+                seen += n
+                sample("slot_handler_seconds_bucket", {"handler": name, "le": bound}, seen)
+            sample("slot_handler_seconds_bucket", {"handler": name, "le": "+Inf"}, hist.count)
+            sample("slot_handler_seconds_sum", {"handler": name}, round(hist.sum, 6))
+            sample("slot_handler_seconds_count", {"handler": name}, hist.count)
+        family("slot_handler_errors_total", "counter", "Handler runs that raised.")
+        for name, n in sorted(self.handler_errors.items()):
+            sample("slot_handler_errors_total", {"handler": name}, n)
+
+        family("slot_discord_requests_total", "counter", "Discord REST calls by route.")
+        for route, n in sorted(self.requests.items()):
+            sample("slot_discord_requests_total", {"route": route}, n)
+        family("slot_discord_request_seconds_total", "counter", "Time spent in Discord REST calls by route, rate limit waits included.")
+        for route, seconds in sorted(self.request_seconds.items()):
+            sample("slot_discord_request_seconds_total", {"route": route}, round(seconds, 6))
+        family("slot_discord_request_errors_total", "counter", "Discord REST calls that failed, by route and HTTP status.")
+        for (route, status), n in sorted(self.request_errors.items()):
+            sample("slot_discord_request_errors_total", {"route": route, "status": status}, n)
+
+        with self._storage_lock:
+            ops, nbytes = dict(self.storage_ops), dict(self.storage_bytes)
+        family("slot_storage_operations_total", "counter", "Storage reads and writes by backend.")
+        for (backend, op), n in sorted(ops.items()):
+            sample("slot_storage_operations_total", {"backend": backend, "op": op}, n)
+        family("slot_storage_bytes_total", "counter", "Bytes read and written by backend.")
+        for (backend, op), n in sorted(nbytes.items()):
+            sample("slot_storage_bytes_total", {"backend": backend, "op": op}, n)
+
+        for name, (kind, help_text, label, collectors) in self._collectors.items():
+            family(name, kind, help_text)
+            for collect in collectors:
+                for value_label, value in collect().items():
+                    sample(name, {label: value_label} if label else {}, value)
+        return "\n".join(lines) + "\n"
+
+
+def _prom_escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+metrics = Metrics()
+
+
+def timed(name):
+    """Decorator recording each run of a coroutine function under `name`."""
+    def decorate(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with metrics.timer(name):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def instrument_http(http):
+    """Count and time every REST call by route, e.g. "POST /channels/{channel_id}/messages".
+
+    The transport is called through request.__wrapped__, so it can be swapped
+    underneath without losing the counters.
+    """
+    async def request(route, **kwargs):
+        started = time.monotonic()
+        status = None
+        try:
+            return await request.__wrapped__(route, **kwargs)
+        except discord.HTTPException as e:
+            status = e.status
+            raise
+        finally:
+            metrics.request(route.key, time.monotonic() - started, status)
+
+    request.__wrapped__ = http.request
+    http.request = request
+
+
+def instrument_handlers(bot):
+    """Time every gateway event handler and prefix command the bot runs."""
+    run_event = bot._run_event
+    invoke = bot.invoke
+
+    async def timed_run_event(coro, event_name, *args, **kwargs):
+        await run_event(timed(event_name)(coro), event_name, *args, **kwargs)
+
+    async def timed_invoke(ctx):
+        if ctx.command is None:
+            return await invoke(ctx)
+        name = f"={ctx.command.qualified_name}"
+        started = time.monotonic()
+        token = current_flow.set(name)
+        try:
+            await invoke(ctx)
+        finally:
+            current_flow.reset(token)
+            metrics.observe(name, time.monotonic() - started, ctx.command_failed)
+
+    bot._run_event = timed_run_event
+    bot.invoke = timed_invoke
+
+
+instrument_http(bot.http)
+instrument_handlers(bot)
+
+
+def _write_metrics_file(text):
+    # Not counted as storage: it would measure itself
+    tmp = f"{METRICS_FILE}.tmp"
+    with open(tmp, "w") as f:
+        f.write(text)
+    os.replace(tmp, METRICS_FILE)
+
+
+@tasks.loop(seconds=METRICS_EXPORT_INTERVAL)
+async def export_metrics():
+    await asyncio.get_running_loop().run_in_executor(None, _write_metrics_file, metrics.prometheus())
+
+
+# --- Rate limit telemetry ---
+# Blocking shorter than this on a bucket is just scheduling, not rate limiting
+RATELIMIT_MIN_WAIT = 0.005
+
+# The REST call in progress: {"route": route key}
+_current_request = contextvars.ContextVar("current_request", default=None)
+
+
+class TrackedRatelimit(discord.http.Ratelimit):
+    """discord.py's per-bucket limiter, reporting how long callers are held up by it."""
+
+    __slots__ = ()
+
+    def update(self, response, *, use_clock=False):
+        super().update(response, use_clock=use_clock)
+        ratelimits.seen(self)
+
+    async def acquire(self):
+        started = self._loop.time()
+        try:
+            await super().acquire()
+        finally:
+            ratelimits.waited(self._loop.time() - started)
+
+    async def _refresh(self):
+        # Run by the request that used up the bucket: it sleeps until the reset
+        started = self._loop.time()
+        try:
+            await super()._refresh()
+        finally:
+            ratelimits.waited(self._loop.time() - started)
+
+
+class RateLimitStats:
+    """Where Discord's rate limits cost us, by flow and by route.
+
+    A flow is the command, event or job that made the call (current_flow).
+    Waits are time blocked on an exhausted bucket plus time sleeping out a
+    429's retry_after. For each route the last limit/remaining seen is kept,
+    with the lowest remaining and how often a call used the bucket up.
+    """
+
+    def __init__(self):
+        self.flow_calls = collections.Counter()
+        self.flow_429s = collections.Counter()
+        self.flow_wait = collections.Counter()
+        self.route_429s = collections.Counter()
+        self.route_wait = collections.Counter()
+        self.exhausted = collections.Counter()
+        self.buckets = {}
+        self.global_429s = 0
+
+    def install(self, http):
+        """Hook a discord.py HTTPClient: tracked buckets, per-call bookkeeping and 429 log lines."""
+        def get_ratelimit(key):
+            try:
+                bucket = http._buckets[key]
+            except KeyError:
+                http._buckets[key] = bucket = TrackedRatelimit(http.max_ratelimit_timeout)
+                http._try_clear_expired_ratelimits()
+            return bucket
+
+        async def request(route, **kwargs):
+            self.flow_calls[current_flow.get()] += 1
+            token = _current_request.set({"route": route.key})
+            try:
+                return await request.__wrapped__(route, **kwargs)
+            finally:
+                _current_request.reset(token)
+
+        request.__wrapped__ = http.request
+        http.request = request
+        http.get_ratelimit = get_ratelimit
+        logging.getLogger("discord.http").addHandler(_RateLimitLogHandler())
+
+    def seen(self, bucket):
+        """Rate limit headers just updated `bucket`."""
+        call = _current_request.get()
+        route = call["route"] if call else "unknown"
+        lowest = self.buckets.get(route, (0, 0, bucket.remaining))[2]
+        self.buckets[route] = (bucket.limit, bucket.remaining, min(lowest, bucket.remaining))
+        if bucket.remaining == 0:
+            self.exhausted[route] += 1
+
+    def waited(self, seconds):
+        if seconds < RATELIMIT_MIN_WAIT:
+            return
+        call = _current_request.get()
+        self.flow_wait[current_flow.get()] += seconds
+        self.route_wait[call["route"] if call else "unknown"] += seconds
+
+    def limited(self, retry_after, slept):
+        call = _current_request.get()
+        route = call["route"] if call else "unknown"
+        self.flow_429s[current_flow.get()] += 1
+        self.route_429s[route] += 1
+        if slept:
+            self.flow_wait[current_flow.get()] += retry_after
+            self.route_wait[route] += retry_after
+
+
+class _RateLimitLogHandler(logging.Handler):
+    # discord.py reports 429s only through its log; args are (method, url, retry_after)
+    def __init__(self):
+        super().__init__(logging.WARNING)
+
+    def emit(self, record):
+        if not isinstance(record.msg, str):
+            return
+        if record.msg.startswith("We are being rate limited.") and len(record.args or ()) == 3:
+            ratelimits.limited(float(record.args[2]), slept="Retrying in" in record.msg)
+        elif record.msg.startswith("Global rate limit has been hit."):
+            ratelimits.global_429s += 1
+
+
+ratelimits = RateLimitStats()
+ratelimits.install(bot.http)
+metrics.register("slot_ratelimit_429_total", "counter", "429 responses by the flow that made the call.", "flow",
+                 lambda: dict(ratelimits.flow_429s))
+metrics.register("slot_ratelimit_wait_seconds_total", "counter", "Time held up by rate limits, by flow.", "flow",
+                 lambda: {flow: round(seconds, 3) for flow, seconds in ratelimits.flow_wait.items()})
+metrics.register("slot_ratelimit_exhausted_total", "counter", "Calls that used up their bucket, by route.", "route",
+                 lambda: dict(ratelimits.exhausted))
+metrics.register("slot_ratelimit_remaining", "gauge", "Requests left in the bucket after the last call, by route.", "route",
+                 lambda: {route: remaining for route, (_, remaining, _) in ratelimits.buckets.items()})
+
+
+# --- Event loop watchdog ---
+LOOP_BEAT_INTERVAL = 0.1
+# A heartbeat this late means something ran on the loop without yielding
+LOOP_STALL_THRESHOLD = 0.25
+LOOP_STALL_HISTORY = 20
+LOOP_STALL_STACK_DEPTH = 12
+# Metrics wrappers sit on every handler's stack; the blocking code is elsewhere
+_INSTRUMENTATION_FRAMES = {"wrapper", "timed_run_event", "timed_invoke", "request"}
+
+
+class LoopWatchdog:
+    """Measures event loop lag and catches the code that blocks the loop.
+
+    The loop runs a heartbeat every LOOP_BEAT_INTERVAL; how late each one
+    fires is the lag. A daemon thread watches the heartbeat and, once it is
+    LOOP_STALL_THRESHOLD overdue, snapshots the loop thread's stack while the
+    blocking code is still on it. The next heartbeat logs that stack with the
+    task that was running and how long the stall lasted.
+    """
+
+    def __init__(self):
+        self.lag = Histogram()
+        self.stalls = collections.Counter()
+        self.recent = collections.deque(maxlen=LOOP_STALL_HISTORY)
+        self._loop = None
+        self._loop_thread = None
+        self._due = None
+        self._captured = None
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._schedule()
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+
+    def _schedule(self):
+        self._due = time.monotonic() + LOOP_BEAT_INTERVAL
+        self._loop.call_later(LOOP_BEAT_INTERVAL, self._beat)
+
+    def _beat(self):
+        lag = max(time.monotonic() - self._due, 0.0)
+        self.lag.observe(lag)
+        captured, self._captured = self._captured, None
+        if captured and captured[0] == self._due:
+            _, handler, where, stack = captured
+            self.stalls[handler] += 1
+            self.recent.append((int(time.time()), handler, where, lag))
+            print(f"[Loop Watchdog] {handler} held up the event loop for {lag:.2f}s in {where}:\n{stack}")
+        self._schedule()
+
+    def _watch(self):
+        # Runs on its own thread; only reads the heartbeat and the loop thread's frames
+        reported = None
+        while True:
+            time.sleep(LOOP_BEAT_INTERVAL / 2)
+            due = self._due
+            if due != reported and time.monotonic() - due > LOOP_STALL_THRESHOLD:
+                reported = due
+                frame = sys._current_frames().get(self._loop_thread)
+                if frame is not None:
+                    self._captured = (due, *self._describe(frame))
+
+    def _describe(self, frame):
+        """(handler, where, formatted stack) for the loop thread blocked in `frame`."""
+        stack = traceback.extract_stack(frame)
+        task = asyncio.current_task(self._loop)
+        if task is not None:
+            # discord.py names event tasks "discord.py: on_<event>"; others fall back to their coroutine
+            name = task.get_name()
+            handler = name.removeprefix("discord.py: ") if not name.startswith("Task-") else task.get_coro().__qualname__
+        else:
+            # A plain callback: the first frame after asyncio's Handle._run
+            runs = [i for i, f in enumerate(stack) if f.name == "_run" and f.filename.startswith(os.path.dirname(asyncio.__file__))]
+            handler = stack[runs[-1] + 1].name if runs and runs[-1] + 1 < len(stack) else "callback"
+        ours = [f for f in stack if f.filename == __file__ and f.name not in _INSTRUMENTATION_FRAMES]
+        spot = ours[-1] if ours else stack[-1]
+        where = f"{spot.name} ({os.path.basename(spot.filename)}:{spot.lineno})"
+        return handler, where, "".join(traceback.format_list(stack[-LOOP_STALL_STACK_DEPTH:])).rstrip()
+
+
+watchdog = LoopWatchdog()
+metrics.register("slot_loop_lag_seconds", "gauge", "Event loop heartbeat lag percentiles.", "quantile",
+                 lambda: {"0.5": watchdog.lag.quantile(0.5), "0.99": watchdog.lag.quantile(0.99), "1": watchdog.lag.max})
+metrics.register("slot_loop_stalls_total", "counter", "Times a task blocked the event loop past the stall threshold.", "handler",
+                 lambda: dict(watchdog.stalls))
+
 
 def load_json(file):
     with open(file, "r") as f:
-        return json.load(f)
+        text = f.read()
+    metrics.storage("file", "read", len(text))
+    return json.loads(text)
 
 def save_json(file, data):
+    text = json.dumps(data, separators=(",", ":"))
+    with open(file, "w") as f:
+        f.write(text)
+    metrics.storage("file", "write", len(text))
+
+
+# Seconds to wait after a mutation before writing the slot files back to disk
+STORE_FLUSH_DELAY = 2.0
+
+# Journal mode: appends are cheap, so batch them over a much shorter window
+JOURNAL_FLUSH_DELAY = 0.25
+# Compact the journal into a fresh snapshot once it grows past this size or age
+JOURNAL_COMPACT_BYTES = 256 * 1024
+JOURNAL_COMPACT_INTERVAL = 3600
+
+def _write_text(file, text):
     with open(file, "w") as f:
-        json.dump(data, f, indent=4)
+        f.write(text)
+    metrics.storage("file", "write", len(text))
+
+def _replace_text(file, text, private=False):
+    """Write a file atomically: a crash leaves either the old or the new copy.
+
+    A private file is created readable by the bot's user only.
+    """
+    tmp = f"{file}.tmp"
+    with open(tmp, "w", opener=(lambda path, flags: os.open(path, flags, 0o600)) if private else None) as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, file)
+    metrics.storage("file", "write", len(text))
+
+def _append_text(file, text):
+    """Append whole lines, first cutting off a torn last line left by a crash mid-append."""
+    with open(file, "ab+") as f:
+        end = f.seek(0, os.SEEK_END)
+        if end:
+            f.seek(end - 1)
+            if f.read(1) != b"\n":
+                f.seek(0)
+                f.truncate(f.read().rfind(b"\n") + 1)
+        f.write(text.encode())
+        f.flush()
+        os.fsync(f.fileno())
+    metrics.storage("file", "write", len(text))
+
+
+# Hot lookups are answered from SlotStore's in-memory indexes; these keep queries
+# against the database itself (by channel, key hash, plan or expiry) off table scans
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS slots (
+    uid TEXT PRIMARY KEY,
+    state TEXT NOT NULL,
+    channel_id INTEGER,
+    recovery_key_hash TEXT,
+    plan TEXT,
+    end_ts INTEGER,
+    held INTEGER NOT NULL DEFAULT 0,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS slots_channel_id ON slots (channel_id);
+CREATE INDEX IF NOT EXISTS slots_recovery_key_hash ON slots (recovery_key_hash);
+CREATE INDEX IF NOT EXISTS slots_plan ON slots (state, plan);
+CREATE INDEX IF NOT EXISTS slots_end_ts ON slots (state, end_ts);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+def open_slot_db(db_file):
+    db = sqlite3.connect(db_file, check_same_thread=False)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")
+    db.executescript(SQLITE_SCHEMA)
+    return db
+
+def _slot_row(uid, state, slot):
+    return (uid, state, slot.get("channel_id"), slot.get("recovery_key_hash"), slot.get("plan"),
+            slot.get("end_ts"), int(bool(slot.get("held"))), json.dumps(slot, separators=(",", ":")))
+
+def load_slot_snapshot(snapshot_file, slots_file, revoked_file):
+    """(seq, slots, revoked) from the combined snapshot.
+
+    Before the first snapshot is written this falls back to the old separate
+    slots and revoked files, with seq 0.
+    """
+    if os.path.exists(snapshot_file):
+        snapshot = load_json(snapshot_file)
+        return snapshot["seq"], snapshot["slots"], snapshot["revoked"]
+    slots = load_json(slots_file) if os.path.exists(slots_file) else {}
+    revoked = load_json(revoked_file) if os.path.exists(revoked_file) else {}
+    return 0, slots, revoked
+
+def migrate_json_to_sqlite(db, snapshot_file, slots_file, revoked_file, keys_file, journal_file=None):
+    """One-shot import of the JSON slot data (and any journal) into an empty database.
+
+    Returns the number of slots imported, or None if the database was already migrated.
+    """
+    if db.execute("SELECT value FROM meta WHERE key = 'migrated_from_json'").fetchone():
+        return None
+    # Opening a file-backed store folds any journal into the snapshot and seals plaintext keys
+    legacy = SlotStore(snapshot_file, slots_file, revoked_file, keys_file,
+                       mode="journal" if journal_file else "json", journal_file=journal_file)
+    slots, revoked = legacy.slots, legacy.revoked
+    rows = [_slot_row(uid, "revoked", slot) for uid, slot in revoked.items()]
+    rows += [_slot_row(uid, "active", slot) for uid, slot in slots.items()]
+    with db:
+        db.executemany("INSERT OR REPLACE INTO slots VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        db.execute("INSERT INTO meta VALUES ('migrated_from_json', ?)", (str(int(time.time())),))
+    return len(rows)
+
+
+class SlotStore:
+    """Process-wide view of the active and revoked slots.
+
+    Everything is loaded once at startup and every handler works on the same
+    in-memory dicts. Mutations go through the methods below; each one is a
+    small record applied by _apply(), the same path used to replay a journal.
+
+    Every persisted record carries a sequence number, and the JSON modes
+    keep active and revoked slots in one snapshot file stamped with the
+    last sequence number it contains, so it is always replaced in a
+    single atomic rename. Persistence depends on the mode:
+      - "json" rewrites the snapshot after STORE_FLUSH_DELAY seconds.
+      - "journal" appends the records to JOURNAL_FILE, so a write costs the
+        size of the change, and periodically compacts the journal into a
+        fresh snapshot. Replay skips records the snapshot already holds.
+      - "sqlite" upserts the touched slots into an indexed WAL database. The
+        JSON data is migrated into it the first time it is opened.
+    Writes always happen on a single writer thread, off the event loop.
+    flush() writes anything still pending and must be called on shutdown.
+
+    Recovery keys never reach the slot records: mutations swap a plaintext
+    recovery_key for its salted recovery_key_hash, and the key itself is
+    kept in keys_file, written before the records that refer to it.
+    recovery_key(uid) reads it back for showing it to the owner.
+
+    owner_of_channel() and owner_of_recovery_key() answer from in-memory
+    indexes kept in step by _apply(); the key index is keyed by salted hash.
+    plan_counts() uses the database indexes in sqlite mode and scans memory
+    otherwise; deadlines are the DeadlineScheduler's job.
+    """
+
+    def __init__(self, snapshot_file, slots_file, revoked_file, keys_file, mode="json", journal_file=None, db_file=None,
+                 flush_delay=None):
+        if mode not in ("json", "journal", "sqlite"):
+            raise ValueError(f"Unknown storage mode '{mode}'. Use 'json', 'journal' or 'sqlite'.")
+        self.snapshot_file = snapshot_file
+        self.keys_file = keys_file
+        self.mode = mode
+        self.journal_file = journal_file
+        if flush_delay is None:
+            flush_delay = STORE_FLUSH_DELAY if mode == "json" else JOURNAL_FLUSH_DELAY
+        self.flush_delay = flush_delay
+        self._seq = 0
+        self._dirty = False
+        self._records = []
+        self._journal_bytes = 0
+        self._last_compact = time.monotonic()
+        self._flush_handle = None
+        self._writer = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="slotstore")
+        self._channel_owner = {}
+        self._key_owner = {}
+        self._revoked_key_owner = {}
+        self._keys_dirty = False
+        self._listeners = []
+        self.db = None
+        if mode == "sqlite":
+            self.db = open_slot_db(db_file)
+            imported = migrate_json_to_sqlite(self.db, snapshot_file, slots_file, revoked_file, keys_file, journal_file)
+            if imported is not None:
+                print(f"[Store] Migrated {imported} slots from JSON into {db_file}.")
+            self.slots, self.revoked = {}, {}
+            for uid, state, data in self.db.execute("SELECT uid, state, data FROM slots"):
+                (self.slots if state == "active" else self.revoked)[uid] = json.loads(data)
+                metrics.storage("sqlite", "read", len(data))
+            fold = False
+        else:
+            seeded = not os.path.exists(snapshot_file)
+            self._seq, self.slots, self.revoked = load_slot_snapshot(snapshot_file, slots_file, revoked_file)
+            fold = (mode == "journal" and self._replay()) or seeded
+        # Read after any migration above, which may have just written it
+        self._keys = load_json(keys_file) if os.path.exists(keys_file) else {}
+        # Records written before keys were kept apart still hold them in plaintext
+        sealed = [uid for records in (self.slots, self.revoked) for uid, slot in records.items() if "recovery_key" in slot]
+        for uid in sealed:
+            records = self.slots if uid in self.slots and "recovery_key" in self.slots[uid] else self.revoked
+            records[uid] = self._seal(records[uid])
+        # Replay indexed as it went; start over now that every record carries its final hash
+        for index in (self._channel_owner, self._key_owner, self._revoked_key_owner):
+            index.clear()
+        for uid in set(self.slots) | set(self.revoked):
+            self._index(uid)
+        if fold or sealed:
+            # Fold the journal (or the old files) into a snapshot, or rewrite the sealed rows, before serving
+            self._dirty = True
+            if mode == "sqlite":
+                self._records.extend({"uid": uid} for uid in sealed)
+            self.flush(compact=True)
+
+    # --- reads ---
+    def get(self, uid):
+        return self.slots.get(str(uid))
+
+    def get_revoked(self, uid):
+        return self.revoked.get(str(uid))
+
+    def owner_of_channel(self, channel_id):
+        """Owner uid of the active slot using this channel, or None. Never touches storage."""
+        return self._channel_owner.get(channel_id)
+
+    def owner_of_recovery_key(self, key):
+        """Owner uid of the active slot with this recovery key, or None."""
+        return self._key_owner.get(hash_recovery_key(key))
+
+    def recovery_key(self, uid):
+        """Plaintext recovery key of uid's active slot, for showing it to the owner, or None."""
+        slot = self.slots.get(str(uid))
+        return self._keys.get(slot.get("recovery_key_hash")) if slot else None
+
+    def new_recovery_key(self):
+        """A fresh 8-character key that no active or revoked slot is using."""
+        while True:
+            key = uuid.uuid4().hex[:8].upper()
+            key_hash = hash_recovery_key(key)
+            if key_hash not in self._key_owner and key_hash not in self._revoked_key_owner:
+                return key
+
+    # --- queries ---
+    async def plan_counts(self):
+        """Active slot count per plan."""
+        if self.db:
+            rows = await self._query("SELECT plan, COUNT(*) FROM slots WHERE state = 'active' GROUP BY plan")
+            return dict(rows)
+        counts = {}
+        for slot in self.slots.values():
+            counts[slot.get("plan")] = counts.get(slot.get("plan"), 0) + 1
+        return counts
+
+    async def _query(self, sql, params=()):
+        # Queue pending writes first: the writer runs in order, so the query sees them
+        self._flush_now()
+        future = self._writer.submit(lambda: self.db.execute(sql, params).fetchall())
+        metrics.storage("sqlite", "read")
+        return await asyncio.wrap_future(future)
+
+    # --- mutations ---
+    def put(self, uid, slot):
+        return self._commit({"op": "put", "uid": str(uid), "slot": self._seal(slot)})
+
+    def update(self, uid, **fields):
+        return self._commit({"op": "update", "uid": str(uid), "fields": self._seal(fields)})
+
+    def remove(self, uid):
+        return self._commit({"op": "remove", "uid": str(uid)})
+
+    def transfer(self, old_uid, new_uid):
+        return self._commit({"op": "transfer", "uid": str(old_uid), "to": str(new_uid)})
+
+    def revoke(self, uid):
+        """Move an active slot to the revoked file."""
+        return self._commit({"op": "revoke", "uid": str(uid)})
+
+    def restore(self, uid):
+        """Move a revoked slot back to the active file."""
+        return self._commit({"op": "restore", "uid": str(uid)})
+
+    def put_revoked(self, uid, slot):
+        return self._commit({"op": "put_revoked", "uid": str(uid), "slot": self._seal(slot)})
+
+    def _seal(self, slot):
+        """Copy of slot (or update fields) with recovery_key swapped for recovery_key_hash."""
+        if "recovery_key" not in slot:
+            return slot
+        slot = dict(slot)
+        key = slot.pop("recovery_key")
+        slot["recovery_key_hash"] = hash_recovery_key(key) if key else None
+        if key:
+            self._keys[slot["recovery_key_hash"]] = key
+            self._keys_dirty = True
+        return slot
+
+    def update_many(self, updates):
+        """Apply {uid: fields} in one go; the whole batch lands in a single write."""
+        for uid, fields in updates.items():
+            self.update(uid, **fields)
+
+    def _apply(self, record):
+        """Apply one mutation record; returns the affected slot or None.
+
+        Ops such as revoke and transfer depend on the state they are applied
+        to, so a record must only ever be replayed over the snapshot it
+        followed; see _replay(). The in-memory indexes are dropped for the
+        touched uids first and rebuilt after.
+        """
+        uids = [record["uid"]] + ([record["to"]] if "to" in record else [])
+        for uid in uids:
+            self._unindex(uid)
+        try:
+            return self._apply_op(record)
+        finally:
+            for uid in uids:
+                self._index(uid)
+                for listener in self._listeners:
+                    listener(uid)
+
+    def subscribe(self, listener):
+        """Call listener(uid) after every mutation that touches uid."""
+        self._listeners.append(listener)
+
+    def _index_keys(self, uid):
+        """(index, key) pairs the slots under this uid currently occupy."""
+        pairs = []
+        slot = self.slots.get(uid)
+        if slot is not None:
+            if slot.get("channel_id"):
+                pairs.append((self._channel_owner, slot["channel_id"]))
+            if slot.get("recovery_key_hash"):
+                pairs.append((self._key_owner, slot["recovery_key_hash"]))
+        slot = self.revoked.get(uid)
+        if slot is not None and slot.get("recovery_key_hash"):
+            pairs.append((self._revoked_key_owner, slot["recovery_key_hash"]))
+        return pairs
+
+    def _index(self, uid):
+        for index, key in self._index_keys(uid):
+            index[key] = uid
+
+    def _unindex(self, uid):
+        for index, key in self._index_keys(uid):
+            if index.get(key) == uid:
+                del index[key]
+
+    def _apply_op(self, record):
+        op, uid = record["op"], record["uid"]
+        if op == "put":
+            self.slots[uid] = record["slot"]
+            return record["slot"]
+        if op == "update":
+            slot = self.slots.get(uid)
+            if slot is not None:
+                slot.update(record["fields"])
+            return slot
+        if op == "remove":
+            return self.slots.pop(uid, None)
+        if op == "transfer":
+            if uid not in self.slots:
+                return None
+            slot = self.slots[record["to"]] = self.slots.pop(uid)
+            return slot
+        if op == "revoke":
+            if uid not in self.slots:
+                return None
+            slot = self.revoked[uid] = self.slots.pop(uid)
+            return slot
+        if op == "restore":
+            if uid not in self.revoked:
+                return None
+            slot = self.slots[uid] = self.revoked.pop(uid)
+            return slot
+        if op == "put_revoked":
+            self.revoked[uid] = record["slot"]
+            return record["slot"]
+        raise ValueError(f"Unknown slot record op '{op}'")
+
+    def _commit(self, record):
+        slot = self._apply(record)
+        if slot is None:
+            return None
+        self._seq += 1
+        record["seq"] = self._seq
+        if self.mode == "json":
+            self._dirty = True
+        else:
+            self._records.append(record)
+        self._schedule_flush()
+        return slot
+
+    # --- persistence ---
+    def _replay(self):
+        """Apply the journal records newer than the snapshot.
+
+        Returns True if the journal holds anything, records or a torn line,
+        so the caller folds it into a fresh snapshot and starts it empty.
+        A crash between writing a snapshot and truncating the journal leaves
+        records the snapshot already contains, and those are skipped by
+        sequence number. Journals from before sequence numbers count their
+        lines from 1, which is what the first compaction stamps them with.
+        """
+        if not os.path.exists(self.journal_file) or not os.path.getsize(self.journal_file):
+            return False
+        read = replayed = 0
+        metrics.storage("file", "read", os.path.getsize(self.journal_file))
+        with open(self.journal_file, "r") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A crash mid-append tears the line; anything after it was appended later
+                    print(f"[Store Warning] Ignoring torn journal record after {read} records.")
+                    continue
+                read += 1
+                seq = record.setdefault("seq", read)
+                if seq <= self._seq:
+                    continue
+                self._apply(record)
+                self._seq = seq
+                replayed += 1
+        if read > replayed:
+            print(f"[Store] Skipped {read - replayed} journal records already in the snapshot.")
+        return True
+
+    def _schedule_flush(self):
+        if self._flush_handle is not None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # No event loop (startup/shutdown scripts): write straight away
+            return self.flush()
+        self._flush_handle = loop.call_later(self.flush_delay, self._flush_now)
+
+    def _snapshot(self):
+        # Serialise on the loop thread so the writer never sees a dict mid-mutation
+        return json.dumps({"seq": self._seq, "slots": self.slots, "revoked": self.revoked}, separators=(",", ":"))
+
+    def _db_rows(self):
+        touched = set()
+        for record in self._records:
+            touched.add(record["uid"])
+            if "to" in record:
+                touched.add(record["to"])
+        self._records.clear()
+        upserts, deletes = [], []
+        for uid in touched:
+            if uid in self.slots:
+                upserts.append(_slot_row(uid, "active", self.slots[uid]))
+            elif uid in self.revoked:
+                upserts.append(_slot_row(uid, "revoked", self.revoked[uid]))
+            else:
+                deletes.append((uid,))
+        return upserts, deletes
+
+    def _take_pending(self, compact=False):
+        """Collect the work for one write on the loop thread."""
+        if self.mode == "sqlite":
+            return (self._write_db, *self._db_rows(), compact)
+        if self.mode == "json":
+            snapshot = self._snapshot() if self._dirty else None
+            self._dirty = False
+            return (self._write_files, snapshot, None)
+        journal_text = "".join(json.dumps(r, separators=(",", ":")) + "\n" for r in self._records)
+        self._records.clear()
+        self._journal_bytes += len(journal_text)
+        due = (self._journal_bytes >= JOURNAL_COMPACT_BYTES
+               or time.monotonic() - self._last_compact >= JOURNAL_COMPACT_INTERVAL)
+        if not (compact or due):
+            return (self._write_files, None, journal_text)
+        # The snapshot already holds every record so far; the journal restarts empty
+        self._journal_bytes = 0
+        self._last_compact = time.monotonic()
+        return (self._write_files, self._snapshot(), "")
+
+    def _write_files(self, snapshot, journal_text):
+        if journal_text:
+            _append_text(self.journal_file, journal_text)
+        if snapshot is not None:
+            _replace_text(self.snapshot_file, snapshot)
+            if journal_text is not None:
+                # Until this lands, replay skips the records by sequence number
+                _write_text(self.journal_file, "")
+
+    def _write_db(self, upserts, deletes, checkpoint):
+        with self.db:
+            self.db.executemany("INSERT OR REPLACE INTO slots VALUES (?, ?, ?, ?, ?, ?, ?, ?)", upserts)
+            self.db.executemany("DELETE FROM slots WHERE uid = ?", deletes)
+        metrics.storage("sqlite", "write", sum(len(row[-1]) for row in upserts))
+        if checkpoint:
+            self.db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def _flush_now(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if not (self._dirty or self._records or self._keys_dirty):
+            return None
+        future = self._writer.submit(self._write, self._take_keys(), *self._take_pending())
+        future.add_done_callback(self._report_write_error)
+        return future
+
+    def _take_keys(self):
+        """Keys still referenced by a slot, if any changed; copied for the writer to serialise."""
+        if not self._keys_dirty:
+            return None
+        self._keys_dirty = False
+        self._keys = {key_hash: key for key_hash, key in self._keys.items()
+                      if key_hash in self._key_owner or key_hash in self._revoked_key_owner}
+        return dict(self._keys)
+
+    def _write(self, keys, write, *args):
+        if keys is not None:
+            # Before the records, so none ever refers to a key that was not saved
+            _replace_text(self.keys_file, json.dumps(keys, separators=(",", ":")), private=True)
+        write(*args)
+
+    @staticmethod
+    def _report_write_error(future):
+        if future.exception():
+            print(f"[Store Error] Failed to write slot data: {future.exception()}")
+
+    def flush(self, compact=None):
+        """Write everything pending now, after any write already queued.
+
+        Outside json mode this also compacts (journal) or checkpoints the WAL
+        (sqlite) unless compact=False, so a clean shutdown leaves tidy files.
+        """
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if compact is None:
+            compact = self.mode != "json"
+        self._writer.submit(self._write, self._take_keys(), *self._take_pending(compact)).result()
+
+
+store = SlotStore(SNAPSHOT_FILE, SLOTS_FILE, REVOKED_FILE, RECOVERY_KEYS_FILE, mode=STORAGE_MODE, journal_file=JOURNAL_FILE,
+                  db_file=SQLITE_FILE)
+
+
+# A failed handler runs again after 60s, doubling per attempt up to an hour
+SCHEDULER_RETRY_DELAY = 60
+SCHEDULER_RETRY_MAX_DELAY = 3600
+
+
+class DeadlineScheduler:
+    """Runs per-slot handlers when their deadlines pass.
+
+    deadlines(uid) returns {kind: unix_ts} for a slot's current state and
+    handlers maps each kind to a coroutine taking the uid. Deadlines sit in a
+    min-heap; the runner sleeps until the soonest one and is woken early only
+    when reschedule() brings a deadline forward. Entries superseded by a later
+    reschedule are skipped when they surface instead of being removed.
+
+    A handler that raises is retried with exponential backoff for as long as
+    deadlines(uid) still returns the same deadline for that kind.
+    """
+
+    def __init__(self, deadlines, handlers, clock=time.time):
+        self.deadlines = deadlines
+        self.handlers = handlers
+        self.clock = clock
+        self._heap = []
+        self._current = {}
+        self._retries = {}
+        self._seq = 0
+        self._wake = asyncio.Event()
+        self._task = None
+
+    @property
+    def running(self):
+        return self._task is not None and not self._task.done()
+
+    def start(self, uids=()):
+        for uid in uids:
+            self.reschedule(uid)
+        self._task = asyncio.create_task(self._run())
+
+    def reschedule(self, uid):
+        wanted = {kind: self._due(uid, kind, ts) for kind, ts in self.deadlines(uid).items()}
+        if wanted == self._current.get(uid, {}):
+            return
+        if wanted:
+            self._current[uid] = wanted
+        else:
+            self._current.pop(uid, None)
+        soonest = self._heap[0][0] if self._heap else None
+        for kind, ts in wanted.items():
+            self._seq += 1
+            heapq.heappush(self._heap, (ts, self._seq, kind, uid))
+        if self._heap and self._heap[0][0] != soonest:
+            self._wake.set()
+
+    def _due(self, uid, kind, ts):
+        """When to run kind for uid: ts itself, or the pending retry if ts already failed."""
+        retry = self._retries.get((uid, kind))
+        if retry is None:
+            return ts
+        if retry[0] != ts:
+            # The deadline moved (renewal, hold, ...); start over from it
+            del self._retries[(uid, kind)]
+            return ts
+        return retry[2]
+
+    def retry_in(self, uid, kind, seconds):
+        """Run kind for uid again in `seconds`, for a handler that found its work not yet due."""
+        deadline = self.deadlines(uid).get(kind)
+        if deadline is None:
+            return
+        self._retries[(uid, kind)] = (deadline, 0, self.clock() + seconds)
+        self.reschedule(uid)
+
+    def _retry_later(self, uid, kind):
+        deadline = self.deadlines(uid).get(kind)
+        if deadline is None:
+            self._retries.pop((uid, kind), None)
+            return None
+        previous = self._retries.get((uid, kind))
+        attempts = previous[1] if previous and previous[0] == deadline else 0
+        delay = min(SCHEDULER_RETRY_DELAY * 2 ** attempts, SCHEDULER_RETRY_MAX_DELAY)
+        self._retries[(uid, kind)] = (deadline, attempts + 1, self.clock() + delay)
+        self.reschedule(uid)
+        return delay
+
+    def next_deadline(self):
+        self._drop_stale()
+        return self._heap[0][0] if self._heap else None
+
+    def _drop_stale(self):
+        while self._heap:
+            ts, _, kind, uid = self._heap[0]
+            if self._current.get(uid, {}).get(kind) == ts:
+                return
+            heapq.heappop(self._heap)
+
+    async def _run(self):
+        while True:
+            self._wake.clear()
+            deadline = self.next_deadline()
+            delay = None if deadline is None else deadline - self.clock()
+            if delay is None or delay > 0:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            _, _, kind, uid = heapq.heappop(self._heap)
+            pending = self._current.get(uid, {})
+            pending.pop(kind, None)
+            if not pending:
+                self._current.pop(uid, None)
+            requested = self._retries.get((uid, kind))
+            try:
+                with metrics.timer(f"scheduler:{kind}"):
+                    await self.handlers[kind](uid)
+            except Exception as e:
+                delay = self._retry_later(uid, kind)
+                retry = f"; retrying in {delay}s" if delay else ""
+                print(f"[Scheduler Error] {kind} for {uid}: {e}{retry}")
+            else:
+                # Unless the handler asked to run again (retry_in)
+                if self._retries.get((uid, kind)) is requested:
+                    self._retries.pop((uid, kind), None)
+
+# --- User resolution ---
+USER_CACHE_SIZE = 2048
+USER_CACHE_TTL = 3600
+USER_MISSING_TTL = 6 * 3600
+USER_FETCH_CONCURRENCY = 4
+
+
+class UserResolver:
+    """Looks users up with as few HTTP requests as possible.
+
+    The gateway cache comes first (the guild member, then bot.get_user), then
+    a bounded TTL LRU of users fetched earlier, and only then fetch_user, at
+    most USER_FETCH_CONCURRENCY at a time and once per ID however many
+    callers ask. IDs Discord does not know are remembered for
+    USER_MISSING_TTL, so deleted accounts resolve to None without a request.
+    """
+
+    def __init__(self, size=USER_CACHE_SIZE):
+        self.size = size
+        self.gateway_hits = 0
+        self.cache_hits = 0
+        self.negative_hits = 0
+        self.fetches = 0
+        self._cache = collections.OrderedDict()
+        self._fetching = {}
+        self._semaphore = asyncio.Semaphore(USER_FETCH_CONCURRENCY)
+
+    @property
+    def hits(self):
+        return self.gateway_hits + self.cache_hits + self.negative_hits
+
+    @property
+    def misses(self):
+        return self.fetches
+
+    async def user(self, user_id, guild=None):
+        """The member (if guild is given and they are in it) or user, or None if unknown."""
+        user_id = int(user_id)
+        found = (guild.get_member(user_id) if guild else None) or bot.get_user(user_id)
+        if found:
+            self.gateway_hits += 1
+            return found
+        entry = self._cache.get(user_id)
+        if entry and entry[0] > time.monotonic():
+            self._cache.move_to_end(user_id)
+            if entry[1] is None:
+                self.negative_hits += 1
+            else:
+                self.cache_hits += 1
+            return entry[1]
+        if user_id not in self._fetching:
+            self._fetching[user_id] = asyncio.ensure_future(self._fetch(user_id))
+        # Shielded so one caller giving up does not cancel the lookup for the others
+        return await asyncio.shield(self._fetching[user_id])
+
+    async def _fetch(self, user_id):
+        try:
+            async with self._semaphore:
+                self.fetches += 1
+                try:
+                    user = await bot.fetch_user(user_id)
+                except discord.NotFound:
+                    user = None
+            ttl = USER_CACHE_TTL if user else USER_MISSING_TTL
+            self._cache[user_id] = (time.monotonic() + ttl, user)
+            self._cache.move_to_end(user_id)
+            while len(self._cache) > self.size:
+                self._cache.popitem(last=False)
+            return user
+        finally:
+            self._fetching.pop(user_id, None)
+
+
+users = UserResolver()
+metrics.register("slot_cache_hits_total", "counter", "Lookups answered from a cache.", "cache", lambda: {"users": users.hits})
+metrics.register("slot_cache_misses_total", "counter", "Lookups a cache could not answer.", "cache", lambda: {"users": users.misses})
+
 
 def timestamp_embed(title, description, color):
     embed = discord.Embed(title=title, description=description, color=color)
@@ -64,18 +1270,12 @@ class RecoveryModal(discord.ui.Modal, title="🔐 Tier Recovery • Slot Key"):
 
     async def on_submit(self, interaction: discord.Interaction):
         entered_key = self.recovery_key.value.strip()
-        slots = load_json(SLOTS_FILE)
-
-        matched_uid = None
-        for uid, slot in slots.items():
-            if slot.get("recovery_key") == entered_key:
-                matched_uid = uid
-                break
+        slots = store.slots
 
+        matched_uid = store.owner_of_recovery_key(entered_key)
         if not matched_uid:
             return await interaction.response.send_message(f"{CONFIG['EMOJIS']['cross']} Invalid or expired recovery key.", ephemeral=True)
 
-        old_user = await bot.fetch_user(int(matched_uid))
         new_user = interaction.user
 
         if str(new_user.id) in slots:
@@ -85,19 +1285,40 @@ class RecoveryModal(discord.ui.Modal, title="🔐 Tier Recovery • Slot Key"):
         if not channel:
             return await interaction.response.send_message(f"{CONFIG['EMOJIS']['warning']} Slot channel not found.", ephemeral=True)
 
-        await channel.set_permissions(old_user, overwrite=None)
-        await channel.set_permissions(new_user, read_messages=True, send_messages=True, mention_everyone=True,
-                                      embed_links=True, attach_files=True, use_external_emojis=True)
+        # Claim the slot and rotate its key before awaiting anything, so the old key
+        # stops working immediately and a second submit cannot claim it too
+        new_key = store.new_recovery_key()
+        slot = store.transfer(matched_uid, new_user.id)
+        store.update(new_user.id, recovery_key=new_key)
+        # The channel and role updates below can outlast the 3 second interaction deadline
+        await interaction.response.defer(ephemeral=True)
+
+        await apply_slot_profile(channel, live_profile(slot), new_user)
 
         try:
-            old_msg = await channel.fetch_message(slots[matched_uid].get("welcome_msg_id"))
+            old_msg = await channel.fetch_message(slot.get("welcome_msg_id"))
             await old_msg.delete()
         except:
             pass
 
-        embed = slot_info_embed(slots[matched_uid], new_user, channel)
-        view = CopyRecoveryKeyView(slots[matched_uid]["recovery_key"], new_user.id)
+        embed = slot_info_embed(slot, new_user, channel)
+        view = CopyRecoveryKeyView(new_user.id)
         new_welcome = await channel.send(embed=embed, view=view)
+        store.update(new_user.id, welcome_msg_id=new_welcome.id, welcome_hash=welcome_digest(embed))
+
+        # Move the slot roles from the previous owner to the new one
+        await sync_slot_roles(interaction.guild.get_member(int(matched_uid)), None)
+        await sync_slot_roles(new_user, store.get(new_user.id))
+
+        await interaction.followup.send(f"{CONFIG['EMOJIS']['tick_animated']} Slot successfully recovered!", ephemeral=True)
+        outbox.enqueue("dm", new_user.id, content=f"{CONFIG['EMOJIS']['tick_animated']} Your new recovery key: ||**`{RECOVERY_KEY_PLACEHOLDER}`**||\nPlease save this securely.",
+                       with_recovery_key=True)
+
+        post_admin_log(timestamp_embed(
+            "🔐 Slot Recovered",
+            f"{new_user.mention} recovered the slot previously owned by <@{matched_uid}>.",
+            discord.Color.orange()
+        ), priority=True)
 
 
 class PersistentRecoveryView(discord.ui.View):
@@ -109,77 +1330,6 @@ class PersistentRecoveryView(discord.ui.View):
         await interaction.response.send_modal(RecoveryModal())
 
 
-async def self_destruct_message(message, countdown_time=10):
-    """Add a self-destruct countdown to a message and delete it after countdown"""
-    for i in range(countdown_time, 0, -1):
-        try:
-            embed = discord.Embed(
-                description=f"This message will self destruct in **{i}** seconds",
-                color=discord.Color.red()
-            )
-            embed.set_footer(text="⚠️ Auto-delete countdown")
-            await message.edit(embed=embed)
-            await asyncio.sleep(1)
-        except:
-            return
-    
-    try:
-        await message.delete()
-    except:
-        pass
-
-        # Remove old roles from previous owner
-        guild = interaction.guild
-        if plan == "standard":
-            role_standard = guild.get_role(CONFIG["STANDARD_ROLE_ID"])
-            role_elite = guild.get_role(CONFIG["ELITE_ROLE_ID"])
-            if role_standard: await old_user.remove_roles(role_standard)
-            if role_elite: await old_user.remove_roles(role_elite)
-        elif plan == "elite":
-            role_elite = guild.get_role(CONFIG["ELITE_ROLE_ID"])
-            if role_elite: await old_user.remove_roles(role_elite)
-        
-
-        # Assign role
-        plan = slots[matched_uid]["plan"]
-        if plan == "standard":
-            role = interaction.guild.get_role(CONFIG["STANDARD_ROLE_ID"])
-        elif plan == "elite":
-            role = interaction.guild.get_role(CONFIG["ELITE_ROLE_ID"])
-        else:
-            role = None
-        if role:
-            try:
-                await new_user.add_roles(role)
-            except:
-                pass
-        access_role = interaction.guild.get_role(CONFIG["ACCESS_ROLE_ID"])
-        if access_role:
-            try:
-                await new_user.add_roles(access_role)
-            except:
-                pass
-
-        # Rotate new key
-        new_key = str(uuid.uuid4()).split("-")[0].upper()
-
-        slots[str(new_user.id)] = slots.pop(matched_uid)
-        slots[str(new_user.id)]["welcome_msg_id"] = new_welcome.id
-        slots[str(new_user.id)]["recovery_key"] = new_key
-        save_json(SLOTS_FILE, slots)
-
-        await interaction.response.send_message(f"{CONFIG['EMOJIS']['tick_animated']} Slot successfully recovered!", ephemeral=True)
-        await new_user.send(f"{CONFIG['EMOJIS']['tick_animated']} Your new recovery key: **||`{new_key}`||\nPlease save this securely.")
-
-        log = bot.get_channel(ADMIN_LOG_CHANNEL)
-        if log:
-            await log.send(embed=timestamp_embed(
-                "🔐 Slot Recovered",
-                f"{new_user.mention} recovered slot from `{entered_key}`.",
-                discord.Color.orange()
-            ))
-
-
 def ping_usage_embed(everyone_used, here_used, plan, custom_limits=None):
     limits = custom_limits if custom_limits else PING_LIMITS[plan]
     embed = discord.Embed(
@@ -192,11 +1342,6 @@ def ping_usage_embed(everyone_used, here_used, plan, custom_limits=None):
 def slot_info_embed(slot_data, user, channel):
     limits = slot_data.get("custom_limits", PING_LIMITS[slot_data['plan']])
     start_dt = datetime.datetime.fromtimestamp(slot_data['start_ts'])
-    end_dt = datetime.datetime.fromtimestamp(slot_data['end_ts'])
-    
-    # Calculate days until expiry
-    now = datetime.datetime.utcnow()
-    days_left = (end_dt - now).days
     
     embed = discord.Embed(
         title="**Slot created**",
@@ -213,7 +1358,8 @@ def slot_info_embed(slot_data, user, channel):
     
     embed.add_field(
         name="Expires:",
-        value=f"In **{days_left}** days",
+        # Rendered relative by the client, so the embed itself doesn't change day to day
+        value=f"<t:{slot_data['end_ts']}:R>",
         inline=True
     )
     
@@ -244,7 +1390,7 @@ def slot_info_embed(slot_data, user, channel):
     # Recovery key section
     embed.add_field(
         name="Users recovery key",
-        value=f"||**`{slot_data['recovery_key']}`**||",
+        value=f"||**`{store.recovery_key(user.id)}`**||",
         inline=False
     )
     
@@ -252,10 +1398,15 @@ def slot_info_embed(slot_data, user, channel):
     return embed
 
 
+def welcome_digest(embed, with_button=True):
+    """Fingerprint of a welcome message as posted, so resendinfo can skip unchanged ones."""
+    payload = json.dumps([embed.to_dict(), with_button], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+
 class CopyRecoveryKeyView(discord.ui.View):
-    def __init__(self, recovery_key, user_id):
+    def __init__(self, user_id):
         super().__init__(timeout=None)
-        self.recovery_key = recovery_key
         self.user_id = user_id
 
     @discord.ui.button(label="Copy Recovery Key", style=discord.ButtonStyle.gray, emoji="🔐", custom_id="copy_recovery_key")
@@ -265,9 +1416,15 @@ class CopyRecoveryKeyView(discord.ui.View):
                 f"{CONFIG['EMOJIS']['cross']} You can only copy your own recovery key.",
                 ephemeral=True
             )
-        
+        recovery_key = store.recovery_key(self.user_id)
+        if recovery_key is None:
+            return await interaction.response.send_message(
+                f"{CONFIG['EMOJIS']['cross']} You don't own an active slot.",
+                ephemeral=True
+            )
+
         try:
-            await interaction.user.send(f"🔐 **Your Recovery Key:** ||**`{self.recovery_key}`**||")
+            await interaction.user.send(f"🔐 **Your Recovery Key:** ||**`{recovery_key}`**||")
             await interaction.response.send_message(
                 f"{CONFIG['EMOJIS']['tick']} Recovery key sent to your DMs!",
                 ephemeral=True
@@ -289,13 +1446,1075 @@ def parse_duration(duration: int, unit: str) -> int:
     else:
         raise ValueError("Invalid duration unit. Use 'd', 'm', or 'min'.")
 
-async def dm_user(user: discord.User, title: str, message: str, color=discord.Color.blue()):
+class DebouncedJsonFile:
+    """Base for small side files (outbox, message ledger) kept in memory.
+
+    Subclasses call _save() after each change; the document returned by
+    _snapshot() is rewritten atomically on a writer thread at most every
+    `delay` seconds. flush() writes it now, for shutdown.
+    """
+
+    def __init__(self, file, delay=JOURNAL_FLUSH_DELAY):
+        self.file = file
+        self.delay = delay
+        self._save_handle = None
+        self._writer = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix=os.path.basename(file))
+
+    def _load(self):
+        return load_json(self.file) if os.path.exists(self.file) else {}
+
+    def _snapshot(self):
+        raise NotImplementedError
+
+    def _save(self):
+        if self._save_handle is not None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return self.flush()
+        self._save_handle = loop.call_later(self.delay, self._save_now)
+
+    def _save_now(self):
+        self._save_handle = None
+        future = self._writer.submit(_replace_text, self.file, self._snapshot())
+        future.add_done_callback(self._report_write_error)
+
+    def _report_write_error(self, future):
+        if future.exception():
+            print(f"[Save Error] Failed to write {self.file}: {future.exception()}")
+
+    def flush(self):
+        if self._save_handle is not None:
+            self._save_handle.cancel()
+            self._save_handle = None
+        self._writer.submit(_replace_text, self.file, self._snapshot()).result()
+
+
+# Background delivery of DMs, admin-log posts and slot channel notices
+OUTBOX_FILE = "data/outbox.json"
+OUTBOX_WORKERS = 4
+OUTBOX_MAX_ATTEMPTS = 8
+OUTBOX_MAX_BACKOFF = 300
+# Dedupe keys of delivered items are remembered so a rerun does not resend them
+OUTBOX_SENT_KEYS = 1000
+# Stands in for the recipient's recovery key in queued DMs; filled in at send time
+RECOVERY_KEY_PLACEHOLDER = "{recovery_key}"
+
+
+class Outbox(DebouncedJsonFile):
+    """Persistent queue of outgoing notifications.
+
+    Commands enqueue and carry on; worker tasks deliver in the background and
+    retry transient failures with exponential backoff. Pending items live in
+    OUTBOX_FILE (rewritten atomically off the event loop) so a restart resumes
+    them. An item enqueued with a key is dropped if that key is already
+    pending or was recently delivered. A batched item may also carry the keys
+    of the events it bundles; those count as delivered along with it.
+    Recovery keys are never queued: such DMs hold RECOVERY_KEY_PLACEHOLDER
+    and read the recipient's current key from the store when delivered.
+    """
+
+    def __init__(self, file, workers=OUTBOX_WORKERS):
+        super().__init__(file)
+        self.workers = workers
+        data = self._load()
+        self.pending = data.get("pending", {})
+        self.sent = collections.deque(data.get("sent", []), maxlen=OUTBOX_SENT_KEYS)
+        self.delivered = 0
+        self.dropped = 0
+        self._queue = None
+        self._tasks = []
+
+    def seen(self, key):
+        """True if ``key`` is pending, bundled in a pending batch or recently sent."""
+        if key in self.pending or key in self.sent:
+            return True
+        return any(key in item.get("keys", ()) for item in self.pending.values())
+
+    def enqueue(self, kind, target_id, content=None, embed=None, key=None, embeds=(), keys=(), with_recovery_key=False):
+        """Queue a "dm" to a user or a "channel" post; returns the item key."""
+        keyed = key is not None
+        if not keyed:
+            key = uuid.uuid4().hex
+        elif self.seen(key):
+            return key
+        embeds = ([embed] if embed else []) + list(embeds)
+        self.pending[key] = {
+            "keyed": keyed,
+            "kind": kind,
+            "target": target_id,
+            "content": content,
+            "embeds": [e.to_dict() for e in embeds],
+            "keys": list(keys),
+            "with_recovery_key": with_recovery_key,
+            "attempts": 0,
+        }
+        self._save()
+        if self._queue is not None:
+            self._queue.put_nowait(key)
+        return key
+
+    @property
+    def running(self):
+        return bool(self._tasks)
+
+    def start(self):
+        self._queue = asyncio.Queue()
+        for key in self.pending:
+            self._queue.put_nowait(key)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def _worker(self):
+        while True:
+            key = await self._queue.get()
+            item = self.pending.get(key)
+            if item is None:
+                continue
+            try:
+                with metrics.timer(f"outbox:{item['kind']}"):
+                    await self._deliver(item)
+            except (discord.Forbidden, discord.NotFound, LookupError) as e:
+                # DMs closed, user gone or channel deleted: retrying will not help
+                print(f"[Outbox] Dropping {item['kind']} to {item['target']}: {e}")
+                self.dropped += 1
+            except Exception as e:
+                item["attempts"] += 1
+                if item["attempts"] < OUTBOX_MAX_ATTEMPTS:
+                    self._save()
+                    delay = min(2 ** item["attempts"], OUTBOX_MAX_BACKOFF)
+                    asyncio.get_running_loop().call_later(delay, self._queue.put_nowait, key)
+                    continue
+                print(f"[Outbox] Giving up on {item['kind']} to {item['target']} after {item['attempts']} attempts: {e}")
+                self.dropped += 1
+            else:
+                self.delivered += 1
+            self.pending.pop(key, None)
+            if item["keyed"]:
+                self.sent.append(key)
+            self.sent.extend(item.get("keys", ()))
+            self._save()
+
+    async def _deliver(self, item):
+        if item["kind"] == "dm":
+            target = await users.user(item["target"])
+            if target is None:
+                raise LookupError(f"unknown user {item['target']}")
+            await dm_limiter.acquire()
+        else:
+            target = bot.get_channel(item["target"]) or await bot.fetch_channel(item["target"])
+        # Items persisted before batching carry a single "embed"
+        raw = item.get("embeds") or ([item["embed"]] if item.get("embed") else [])
+        content = item["content"]
+        if item.get("with_recovery_key"):
+            recovery_key = store.recovery_key(item["target"])
+            if recovery_key is None:
+                raise LookupError(f"no recovery key for {item['target']}")
+            content = content and content.replace(RECOVERY_KEY_PLACEHOLDER, recovery_key)
+            raw = [{**e, "description": e.get("description", "").replace(RECOVERY_KEY_PLACEHOLDER, recovery_key)}
+                   for e in raw]
+        embeds = [discord.Embed.from_dict(e) for e in raw]
+        return await target.send(content=content, embeds=embeds)
+
+    def _snapshot(self):
+        return json.dumps({"pending": self.pending, "sent": list(self.sent)}, separators=(",", ":"))
+
+
+outbox = Outbox(OUTBOX_FILE)
+
+
+# --- Admin log batching ---
+ADMIN_LOG_BATCH = 10  # Discord's limit on embeds per message
+ADMIN_LOG_FLUSH_INTERVAL = 2.0
+ADMIN_LOG_MAX_BUFFER = 250
+
+
+class AdminLogSink:
+    """Coalesces admin-log embeds into multi-embed posts.
+
+    Events are buffered and handed to the outbox up to ADMIN_LOG_BATCH per
+    message, with at most one batch in flight, so a burst of expiries or
+    revokes costs a few sends instead of one per event. Once the buffer holds
+    ADMIN_LOG_MAX_BUFFER events further ones are shed, and the next batch
+    reports how many were lost. Priority events skip the buffer entirely.
+    """
+
+    def __init__(self, channel_id):
+        self.channel_id = channel_id
+        self.buffer = collections.deque()
+        self.shed = 0
+        self.batches = 0
+        self._in_flight = None
+        self._handle = None
+
+    def post(self, embed, key=None, priority=False):
+        if priority:
+            outbox.enqueue("channel", self.channel_id, embed=embed, key=key)
+            return
+        if key is not None and (outbox.seen(key) or any(k == key for k, _ in self.buffer)):
+            return
+        if len(self.buffer) >= ADMIN_LOG_MAX_BUFFER:
+            self.shed += 1
+        else:
+            self.buffer.append((key, embed))
+        if len(self.buffer) >= ADMIN_LOG_BATCH:
+            self.flush()
+        else:
+            self._schedule()
+
+    def _schedule(self):
+        if self._handle is not None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return  # Nothing to time against; drain() picks it up on shutdown
+        self._handle = loop.call_later(ADMIN_LOG_FLUSH_INTERVAL, self._on_timer)
+
+    def _on_timer(self):
+        self._handle = None
+        self.flush()
+
+    def flush(self, force=False):
+        """Hand the next batch to the outbox unless one is still being delivered."""
+        if not force and self._in_flight in outbox.pending:
+            self._schedule()
+            return
+        room = ADMIN_LOG_BATCH - 1 if self.shed else ADMIN_LOG_BATCH
+        batch = [self.buffer.popleft() for _ in range(min(room, len(self.buffer)))]
+        embeds = [embed for _, embed in batch]
+        if self.shed:
+            embeds.append(timestamp_embed(
+                f"{CONFIG['EMOJIS']['warning']} Admin Log Overflow",
+                f"{self.shed} log events were dropped during a burst.",
+                discord.Color.orange()
+            ))
+            self.shed = 0
+        if not embeds:
+            return
+        keys = [key for key, _ in batch if key is not None]
+        self._in_flight = outbox.enqueue("channel", self.channel_id, embeds=embeds, keys=keys)
+        self.batches += 1
+        if self.buffer:
+            self._schedule()
+
+    def drain(self):
+        """Move everything buffered into the outbox, ignoring the in-flight limit."""
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        while self.buffer or self.shed:
+            self.flush(force=True)
+
+
+admin_log = AdminLogSink(ADMIN_LOG_CHANNEL)
+metrics.register("slot_queue_depth", "gauge", "Items waiting in background queues.", "queue",
+                 lambda: {"outbox": len(outbox.pending), "admin_log": len(admin_log.buffer)})
+
+
+def dm_user(user: discord.User, title: str, message: str, color=discord.Color.blue(), key=None, with_recovery_key=False):
+    embed = discord.Embed(title=title, description=message, color=color)
+    outbox.enqueue("dm", user.id, embed=embed, key=key, with_recovery_key=with_recovery_key)
+
+def post_admin_log(embed, key=None, priority=False):
+    admin_log.post(embed, key=key, priority=priority)
+
+def notify_channel(channel, embed, key=None):
+    outbox.enqueue("channel", channel.id, embed=embed, key=key)
+
+
+# Ids of messages posted in slot channels, so resets can delete without scanning history
+LEDGER_DB_FILE = "data/message_ledger.db"
+# Pre-sqlite ledger, imported into LEDGER_DB_FILE once
+LEDGER_FILE = "data/message_ledger.json"
+LEDGER_MAX_PER_CHANNEL = 1000
+# Ids missed by a crash are caught by reconcile(), so the ledger can be saved lazily
+LEDGER_SAVE_DELAY = 30
+# Discord refuses to bulk delete messages older than this
+BULK_DELETE_MAX_AGE = datetime.timedelta(days=14)
+
+LEDGER_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ledger (
+    channel_id INTEGER NOT NULL,
+    message_id INTEGER NOT NULL,
+    PRIMARY KEY (channel_id, message_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS ledger_complete (channel_id INTEGER PRIMARY KEY);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+
+class MessageLedger:
+    """Bounded per-channel list of message ids seen in slot channels.
+
+    A channel is "complete" while every message in it is known to be listed:
+    from when the bot created it or last purged it by history, until a message
+    is missed (the list overflows LEDGER_MAX_PER_CHANNEL, or reconcile() finds
+    a newer message than any recorded after a fresh gateway session).
+    Clearing an incomplete channel still needs a history scan.
+
+    The lists live in memory and in SQLite. Changes mark their channel dirty,
+    and every LEDGER_SAVE_DELAY seconds the rows of the dirty channels alone
+    are rewritten on a writer thread.
+    """
+
+    def __init__(self, db_file, json_file=None):
+        self.db = sqlite3.connect(db_file, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(LEDGER_SCHEMA)
+        self._writer = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="ledger-writer")
+        self._dirty = set()
+        self._save_handle = None
+        self.ids, self.complete = {}, set()
+        if json_file and os.path.exists(json_file) and not self.db.execute(
+                "SELECT value FROM meta WHERE key = 'migrated_from_json'").fetchone():
+            data = load_json(json_file)
+            self.ids = {int(channel_id): ids for channel_id, ids in data.get("ids", {}).items()}
+            self.complete = set(data.get("complete", []))
+            self._dirty.update(self.ids, self.complete)
+            self.flush()
+            with self.db:
+                self.db.execute("INSERT INTO meta VALUES ('migrated_from_json', ?)", (str(int(time.time())),))
+            return
+        for channel_id, message_id in self.db.execute("SELECT channel_id, message_id FROM ledger ORDER BY channel_id, message_id"):
+            self.ids.setdefault(channel_id, []).append(message_id)
+        self.complete = {channel_id for channel_id, in self.db.execute("SELECT channel_id FROM ledger_complete")}
+        metrics.storage("ledger", "read")
+
+    def record(self, channel_id, message_id):
+        ids = self.ids.setdefault(channel_id, [])
+        ids.append(message_id)
+        if len(ids) > LEDGER_MAX_PER_CHANNEL:
+            del ids[:len(ids) - LEDGER_MAX_PER_CHANNEL]
+            self.complete.discard(channel_id)
+        self._save(channel_id)
+
+    def forget(self, channel_id, message_id):
+        ids = self.ids.get(channel_id)
+        if ids and message_id in ids:
+            ids.remove(message_id)
+            self._save(channel_id)
+
+    def start_channel(self, channel_id):
+        """Track a channel the bot just created; it is empty, so complete."""
+        self.ids[channel_id] = []
+        self.complete.add(channel_id)
+        self._save(channel_id)
+
+    def reconcile(self, channels):
+        """After a new gateway session, drop completeness where a message was missed."""
+        for channel in channels:
+            ids = self.ids.get(channel.id)
+            if channel.id in self.complete and channel.last_message_id and (not ids or channel.last_message_id > max(ids)):
+                self.complete.discard(channel.id)
+                self._save(channel.id)
+
+    def count_after(self, channel_id, message_id):
+        """How many recorded messages were posted after message_id."""
+        return sum(1 for i in self.ids.get(channel_id, ()) if i > message_id)
+
+    def take(self, channel_id, keep=None):
+        """Hand over the ids to delete; returns (ids, complete)."""
+        ids = [i for i in self.ids.pop(channel_id, []) if i != keep]
+        self._save(channel_id)
+        return ids, channel_id in self.complete
+
+    def settle(self, channel_id, keep=None):
+        """Mark a channel as fully cleared apart from `keep` and anything posted since take()."""
+        self.ids[channel_id] = ([keep] if keep else []) + self.ids.get(channel_id, [])
+        self.complete.add(channel_id)
+        self._save(channel_id)
+
+    def _save(self, channel_id):
+        self._dirty.add(channel_id)
+        if self._save_handle is not None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return self.flush()
+        self._save_handle = loop.call_later(LEDGER_SAVE_DELAY, self._save_now)
+
+    def _take_dirty(self):
+        # Copy on the loop thread so the writer never sees a list mid-mutation
+        rows = {channel_id: (list(self.ids.get(channel_id, ())), channel_id in self.complete) for channel_id in self._dirty}
+        self._dirty.clear()
+        return rows
+
+    def _save_now(self):
+        self._save_handle = None
+        if not self._dirty:
+            return None
+        future = self._writer.submit(self._write, self._take_dirty())
+        future.add_done_callback(self._report_write_error)
+        return future
+
+    def flush(self):
+        if self._save_handle is not None:
+            self._save_handle.cancel()
+            self._save_handle = None
+        self._writer.submit(self._write, self._take_dirty()).result()
+
+    @staticmethod
+    def _report_write_error(future):
+        if future.exception():
+            print(f"[Ledger Error] Failed to write the message ledger: {future.exception()}")
+
+    def _write(self, rows):
+        with self.db:
+            for channel_id, (ids, complete) in rows.items():
+                self.db.execute("DELETE FROM ledger WHERE channel_id = ?", (channel_id,))
+                self.db.executemany("INSERT OR IGNORE INTO ledger VALUES (?, ?)", [(channel_id, i) for i in ids])
+                if complete:
+                    self.db.execute("INSERT OR IGNORE INTO ledger_complete VALUES (?)", (channel_id,))
+                else:
+                    self.db.execute("DELETE FROM ledger_complete WHERE channel_id = ?", (channel_id,))
+        metrics.storage("ledger", "write", 16 * sum(len(ids) for ids, _ in rows.values()))
+
+
+ledger = MessageLedger(LEDGER_DB_FILE, LEDGER_FILE)
+
+
+async def clear_slot_channel(channel, keep=None):
+    """Delete every message in a slot channel except `keep`.
+
+    Ids from the ledger are bulk deleted 100 at a time; only a channel whose
+    ledger may be incomplete falls back to paging through history.
+    """
+    ids, complete = ledger.take(channel.id, keep)
+    cutoff = discord.utils.utcnow() - BULK_DELETE_MAX_AGE
+    recent = [discord.Object(i) for i in ids if discord.utils.snowflake_time(i) > cutoff]
+    old = [i for i in ids if discord.utils.snowflake_time(i) <= cutoff]
     try:
-        embed = discord.Embed(title=title, description=message, color=color)
-        await user.send(embed=embed)
-    except discord.Forbidden:
-        # User DMs disabled or blocked bot
-        pass
+        for start in range(0, len(recent), 100):
+            await channel.delete_messages(recent[start:start + 100])
+        for message_id in old:
+            try:
+                await channel.get_partial_message(message_id).delete()
+            except discord.NotFound:
+                pass
+    except discord.HTTPException as e:
+        print(f"[Ledger] Bulk delete failed in {channel.id}, scanning history instead: {e}")
+        complete = False
+    if not complete:
+        await channel.purge(limit=1000, check=lambda m: m.id != keep)
+    ledger.settle(channel.id, keep)
+
+
+# Ping trackers: coalesce bursts of pings, and repost only once buried this deep
+STICKY_DEBOUNCE = 1.5
+STICKY_REPOST_AFTER = 10
+
+
+class StickyTrackers:
+    """Keeps each slot's ping tracker embed current.
+
+    update() coalesces calls per channel over STICKY_DEBOUNCE seconds. The
+    tracker is then edited in place through a partial message, without
+    fetching it, unless STICKY_REPOST_AFTER messages have been posted below it
+    since; only then is it deleted and sent again at the bottom.
+    """
+
+    def __init__(self):
+        self._pending = {}
+
+    def update(self, uid, channel):
+        if channel.id not in self._pending:
+            self._pending[channel.id] = asyncio.create_task(self._refresh_later(uid, channel))
+
+    async def _refresh_later(self, uid, channel):
+        await asyncio.sleep(STICKY_DEBOUNCE)
+        del self._pending[channel.id]
+        try:
+            await self.refresh(uid, channel)
+        except Exception as e:
+            print(f"[Sticky Error] Could not refresh tracker in {channel.id}: {e}")
+
+    async def refresh(self, uid, channel):
+        slot = store.get(uid)
+        if slot is None or slot["channel_id"] != channel.id:
+            return
+        embed = ping_usage_embed(slot["everyone_used"], slot["here_used"], slot["plan"], slot.get("custom_limits"))
+        sticky_msg_id = slot.get("sticky_msg_id")
+        if sticky_msg_id:
+            tracker = channel.get_partial_message(sticky_msg_id)
+            if ledger.count_after(channel.id, sticky_msg_id) < STICKY_REPOST_AFTER:
+                try:
+                    await tracker.edit(embed=embed)
+                    return
+                except discord.NotFound:
+                    pass
+            else:
+                try:
+                    await tracker.delete()
+                except discord.HTTPException:
+                    pass
+        msg = await channel.send(embed=embed)
+        store.update(uid, sticky_msg_id=msg.id)
+
+
+trackers = StickyTrackers()
+
+
+# Short-lived notices (e.g. "Ping Used") and when to retry a failed delete
+EPHEMERAL_FILE = "data/ephemeral.json"
+EPHEMERAL_RETRY_DELAY = 30
+
+
+class EphemeralMessages(DebouncedJsonFile):
+    """Messages that delete themselves.
+
+    send() posts once, with a Discord relative timestamp doing the countdown
+    client-side. Every pending deletion shares one DeadlineScheduler timer and
+    is persisted, so deletions due during a restart happen once it is back.
+    """
+
+    def __init__(self, file):
+        super().__init__(file)
+        self.pending = self._load().get("pending", {})
+        self.scheduler = DeadlineScheduler(self._deadlines, {"delete": self._delete})
+
+    @property
+    def running(self):
+        return self.scheduler.running
+
+    def start(self):
+        self.scheduler.start(list(self.pending))
+
+    async def send(self, channel, embed, lifetime=10):
+        delete_at = int(time.time()) + lifetime
+        embed.description = f"{embed.description or ''}\n-# This message will self destruct <t:{delete_at}:R>"
+        embed.set_footer(text="⚠️ Auto-delete countdown")
+        message = await channel.send(embed=embed)
+        self.schedule(channel.id, message.id, delete_at)
+        return message
+
+    def schedule(self, channel_id, message_id, delete_at):
+        key = f"{channel_id}:{message_id}"
+        self.pending[key] = delete_at
+        self._save()
+        self.scheduler.reschedule(key)
+
+    def _deadlines(self, key):
+        return {"delete": self.pending[key]} if key in self.pending else {}
+
+    async def _delete(self, key):
+        channel_id, message_id = map(int, key.split(":"))
+        try:
+            await bot.get_partial_messageable(channel_id).get_partial_message(message_id).delete()
+        except (discord.NotFound, discord.Forbidden):
+            pass
+        except discord.HTTPException as e:
+            print(f"[Ephemeral] Delete of {key} failed, retrying: {e}")
+            self.schedule(channel_id, message_id, int(time.time()) + EPHEMERAL_RETRY_DELAY)
+            return
+        self.pending.pop(key, None)
+        self._save()
+
+    def _snapshot(self):
+        return json.dumps({"pending": self.pending}, separators=(",", ":"))
+
+
+ephemeral = EphemeralMessages(EPHEMERAL_FILE)
+
+
+# Mass operations (ping resets, broadcasts, restores) run through FanOut
+FANOUT_CONCURRENCY = 8
+FANOUT_PROGRESS_INTERVAL = 2.0
+
+
+class FanOut:
+    """Runs a coroutine per item with bounded concurrency.
+
+    Items that share a key (normally a channel id, which is what Discord
+    buckets most routes on) run one at a time, so each channel stays under its
+    own rate limit while different channels proceed in parallel, at most
+    `concurrency` at once. on_progress(done, total) is awaited every
+    FANOUT_PROGRESS_INTERVAL seconds and once more at the end.
+    """
+
+    def __init__(self, concurrency=FANOUT_CONCURRENCY, on_progress=None):
+        self.concurrency = concurrency
+        self.on_progress = on_progress
+        self.done = 0
+        self.total = 0
+        self.elapsed = 0.0
+
+    async def run(self, items, worker, key=None):
+        """Returns worker results in item order; failures are returned as exceptions."""
+        items = list(items)
+        self.done, self.total = 0, len(items)
+        semaphore = asyncio.Semaphore(self.concurrency)
+        locks = collections.defaultdict(asyncio.Lock)
+
+        async def run_one(item):
+            async with locks[key(item) if key else id(item)], semaphore:
+                try:
+                    return await worker(item)
+                finally:
+                    self.done += 1
+
+        started = time.monotonic()
+        reporter = asyncio.create_task(self._report()) if self.on_progress else None
+        try:
+            results = await asyncio.gather(*(run_one(item) for item in items), return_exceptions=True)
+        finally:
+            self.elapsed = time.monotonic() - started
+            if reporter:
+                reporter.cancel()
+        if self.on_progress:
+            await self.on_progress(self.done, self.total)
+        return results
+
+    async def _report(self):
+        while True:
+            await asyncio.sleep(FANOUT_PROGRESS_INTERVAL)
+            try:
+                await self.on_progress(self.done, self.total)
+            except Exception as e:
+                print(f"[FanOut] Progress report failed: {e}")
+
+
+# --- DM broadcasts ---
+DM_RATE_PER_SECOND = 4
+DM_BURST = 4
+BROADCAST_CONCURRENCY = 8
+BROADCAST_LIST_MAX = 20
+
+
+class RateLimiter:
+    """Token bucket shared by every coroutine that acquires from it."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.waited = 0.0
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        # Waiters queue on the lock, so tokens are handed out in arrival order
+        async with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens < 1:
+                delay = (1 - self._tokens) / self.rate
+                self.waited += delay
+                await asyncio.sleep(delay)
+                self._tokens, self._updated = 1, time.monotonic()
+            self._tokens -= 1
+
+
+# Every DM the bot sends, broadcast or outbox, draws from this one bucket
+dm_limiter = RateLimiter(DM_RATE_PER_SECOND, DM_BURST)
+
+
+class Broadcast:
+    """DMs a set of users with bounded concurrency under the shared DM limiter.
+
+    Users come from the shared resolver, so cached ones cost no request. Each
+    recipient ends up in `outcomes` as "sent", "dms_closed", "not_found" or
+    "failed". With a `channel`, a status message there is edited with
+    progress and running counts while the broadcast runs.
+    """
+
+    LABELS = {"sent": "✅ Sent", "dms_closed": "🔒 DMs closed", "not_found": "❓ Not found", "failed": "❌ Failed"}
+
+    def __init__(self, title, channel=None, concurrency=BROADCAST_CONCURRENCY):
+        self.title = title
+        self.channel = channel
+        self.concurrency = concurrency
+        self.outcomes = {}
+        self._status = None
+
+    def counts(self):
+        counts = dict.fromkeys(self.LABELS, 0)
+        for outcome in self.outcomes.values():
+            counts[outcome] += 1
+        return counts
+
+    def summary(self):
+        return " • ".join(f"{label}: **{count}**" for label, count in zip(self.LABELS.values(), self.counts().values()))
+
+    def recipients(self, outcome):
+        """Mentions of the users with the given outcome, trimmed for an embed."""
+        uids = [uid for uid, result in self.outcomes.items() if result == outcome]
+        text = ", ".join(f"<@{uid}>" for uid in uids[:BROADCAST_LIST_MAX])
+        if len(uids) > BROADCAST_LIST_MAX:
+            text += f" and {len(uids) - BROADCAST_LIST_MAX} more"
+        return text
+
+    async def run(self, user_ids, build):
+        """Send build(uid) (a dict of send() kwargs) to each user; returns outcomes."""
+        user_ids = [str(uid) for uid in user_ids]
+        if self.channel:
+            self._status = await self.channel.send(embed=discord.Embed(
+                description=f"**📨 {self.title}:** sending to **{len(user_ids)}** users...",
+                color=discord.Color.blue()
+            ))
+        fanout = FanOut(self.concurrency, on_progress=self._progress if self._status else None)
+        results = await fanout.run(user_ids, self._deliver_to(build))
+        for uid, result in zip(user_ids, results):
+            if isinstance(result, Exception):
+                print(f"[Broadcast Error] {self.title} to {uid}: {result}")
+                self.outcomes[uid] = "failed"
+        return self.outcomes
+
+    def _deliver_to(self, build):
+        async def deliver(uid):
+            user = await users.user(uid)
+            if user is None:
+                self.outcomes[uid] = "not_found"
+                return
+            await dm_limiter.acquire()
+            try:
+                await user.send(**build(uid))
+            except discord.Forbidden:
+                self.outcomes[uid] = "dms_closed"
+            except discord.NotFound:
+                self.outcomes[uid] = "not_found"
+            else:
+                self.outcomes[uid] = "sent"
+        return deliver
+
+    async def _progress(self, done, total):
+        try:
+            await self._status.edit(embed=discord.Embed(
+                description=f"**📨 {self.title}:** {done}/{total} processed\n{self.summary()}",
+                color=discord.Color.blue() if done < total else discord.Color.green()
+            ))
+        except discord.HTTPException:
+            pass
+
+def broadcast_report(broadcast, headline):
+    embed = discord.Embed(description=f"{headline}\n{broadcast.summary()}", color=discord.Color.green())
+    for outcome in ("dms_closed", "not_found", "failed"):
+        recipients = broadcast.recipients(outcome)
+        if recipients:
+            embed.add_field(name=Broadcast.LABELS[outcome], value=recipients, inline=False)
+    return embed
+
+
+# --- Message search index ---
+SEARCH_DB_FILE = "data/search.db"
+SEARCH_RETENTION_PER_CHANNEL = 1000
+SEARCH_FLUSH_DELAY = 1.0
+SEARCH_CACHE_TTL = 30
+SEARCH_CACHE_SIZE = 128
+
+SEARCH_SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    message_id INTEGER PRIMARY KEY,
+    channel_id INTEGER NOT NULL,
+    content TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS messages_channel ON messages (channel_id, message_id);
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+    content, content='messages', content_rowid='message_id', tokenize='trigram'
+);
+CREATE TRIGGER IF NOT EXISTS messages_ai AFTER INSERT ON messages BEGIN
+    INSERT INTO messages_fts (rowid, content) VALUES (new.message_id, new.content);
+END;
+CREATE TRIGGER IF NOT EXISTS messages_ad AFTER DELETE ON messages BEGIN
+    INSERT INTO messages_fts (messages_fts, rowid, content) VALUES ('delete', old.message_id, old.content);
+END;
+CREATE TRIGGER IF NOT EXISTS messages_au AFTER UPDATE ON messages BEGIN
+    INSERT INTO messages_fts (messages_fts, rowid, content) VALUES ('delete', old.message_id, old.content);
+    INSERT INTO messages_fts (rowid, content) VALUES (new.message_id, new.content);
+END;
+"""
+
+
+class SearchIndex:
+    """Full-text index of recent slot channel messages, used by =find.
+
+    Content lives in SQLite behind an FTS5 trigram index, so any substring of
+    three or more characters is an index lookup; shorter keywords fall back to
+    a LIKE scan of the bounded table. Writes are buffered and applied on a
+    dedicated thread, and each channel keeps its newest
+    SEARCH_RETENTION_PER_CHANNEL messages. Results are cached for
+    SEARCH_CACHE_TTL seconds.
+    """
+
+    def __init__(self, db_file):
+        self.db = sqlite3.connect(db_file, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SEARCH_SCHEMA)
+        self._writer = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="search-writer")
+        self._ops = []
+        self._flush_handle = None
+        self._cache = collections.OrderedDict()
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def add(self, message):
+        if message.content:
+            self._queue(("put", message.id, message.channel.id, message.content))
+
+    def edit(self, message_id, content):
+        self._queue(("edit", message_id, content))
+
+    def forget(self, message_ids):
+        self._queue(("delete", list(message_ids)))
+
+    def _queue(self, op):
+        self._ops.append(op)
+        if self._flush_handle is not None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return self.flush()
+        self._flush_handle = loop.call_later(SEARCH_FLUSH_DELAY, self._flush_now)
+
+    def _flush_now(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if not self._ops:
+            return None
+        ops, self._ops = self._ops, []
+        future = self._writer.submit(self._write, ops)
+        future.add_done_callback(self._report_write_error)
+        return future
+
+    def flush(self):
+        future = self._flush_now()
+        if future:
+            future.result()
+
+    @staticmethod
+    def _report_write_error(future):
+        if future.exception():
+            print(f"[Search Error] Failed to update the index: {future.exception()}")
+
+    def _write(self, ops):
+        touched = set()
+        with self.db:
+            for op in ops:
+                if op[0] == "put":
+                    self.db.execute(
+                        "INSERT INTO messages VALUES (?, ?, ?) "
+                        "ON CONFLICT (message_id) DO UPDATE SET content = excluded.content", op[1:])
+                    touched.add(op[2])
+                elif op[0] == "edit":
+                    self.db.execute("UPDATE messages SET content = ? WHERE message_id = ?", (op[2], op[1]))
+                else:
+                    self.db.executemany("DELETE FROM messages WHERE message_id = ?", [(i,) for i in op[1]])
+            for channel_id in touched:
+                self.db.execute(
+                    "DELETE FROM messages WHERE channel_id = ? AND message_id <= ("
+                    "SELECT message_id FROM messages WHERE channel_id = ? "
+                    "ORDER BY message_id DESC LIMIT 1 OFFSET ?)",
+                    (channel_id, channel_id, SEARCH_RETENTION_PER_CHANNEL))
+        metrics.storage("search", "write", sum(len(op[-1]) for op in ops if op[0] != "delete"))
+
+    async def _read(self, fn):
+        # Queue pending writes first: the writer runs in order, so the read sees them
+        self._flush_now()
+        metrics.storage("search", "read")
+        return await asyncio.wrap_future(self._writer.submit(fn))
+
+    async def search(self, keyword):
+        """[(channel_id, matching messages)] for keyword, most matches first."""
+        keyword = keyword.lower()
+        cached = self._cache.get(keyword)
+        if cached and cached[0] > time.monotonic():
+            self._cache.move_to_end(keyword)
+            self.cache_hits += 1
+            return cached[1]
+        self.cache_misses += 1
+        results = await self._read(lambda: self._search(keyword))
+        self._cache[keyword] = (time.monotonic() + SEARCH_CACHE_TTL, results)
+        self._cache.move_to_end(keyword)
+        while len(self._cache) > SEARCH_CACHE_SIZE:
+            self._cache.popitem(last=False)
+        return results
+
+    def _search(self, keyword):
+        if len(keyword) >= 3:
+            sql = ("SELECT m.channel_id, COUNT(*) FROM messages_fts "
+                   "JOIN messages m ON m.message_id = messages_fts.rowid "
+                   "WHERE messages_fts MATCH ? GROUP BY m.channel_id ORDER BY COUNT(*) DESC")
+            params = ('"' + keyword.replace('"', '""') + '"',)
+        else:
+            # Trigrams cannot match fewer than three characters
+            sql = ("SELECT channel_id, COUNT(*) FROM messages WHERE content LIKE ? ESCAPE '\\' "
+                   "GROUP BY channel_id ORDER BY COUNT(*) DESC")
+            escaped = keyword.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            params = (f"%{escaped}%",)
+        return self.db.execute(sql, params).fetchall()
+
+    async def catch_up(self, channels):
+        """Index messages posted while the bot was offline, or never seen at all.
+
+        Only channels whose last message is newer than anything indexed cost a
+        history request.
+        """
+        newest = dict(await self._read(lambda: self.db.execute(
+            "SELECT channel_id, MAX(message_id) FROM messages GROUP BY channel_id").fetchall()))
+        stale = [c for c in channels if c.last_message_id and c.last_message_id > newest.get(c.id, 0)]
+
+        async def index_channel(channel):
+            after = discord.Object(newest[channel.id]) if channel.id in newest else None
+            async for message in channel.history(limit=SEARCH_RETENTION_PER_CHANNEL, after=after, oldest_first=False):
+                self.add(message)
+
+        results = await FanOut().run(stale, index_channel, key=lambda c: c.id)
+        for channel, result in zip(stale, results):
+            if isinstance(result, Exception):
+                print(f"[Search Error] Could not index channel {channel.id}: {result}")
+
+
+search_index = SearchIndex(SEARCH_DB_FILE)
+metrics.register("slot_cache_hits_total", "counter", "Lookups answered from a cache.", "cache", lambda: {"search": search_index.cache_hits})
+metrics.register("slot_cache_misses_total", "counter", "Lookups a cache could not answer.", "cache", lambda: {"search": search_index.cache_misses})
+
+
+# --- Slot permission profiles ---
+# Every state a slot channel can be in maps to one complete overwrite set, so
+# a transition is a single channel.edit() instead of one PUT per target.
+# Targets are "default", "me", "owner", "admin" or a role ID from config.
+
+_OWNER_FULL = discord.PermissionOverwrite(
+    read_messages=True, send_messages=True, mention_everyone=True,
+    embed_links=True, attach_files=True, use_external_emojis=True
+)
+_OWNER_READ_ONLY = discord.PermissionOverwrite(read_messages=True, send_messages=False)
+_BOT_ACCESS = discord.PermissionOverwrite(read_messages=True, send_messages=True)
+_HIDDEN = discord.PermissionOverwrite(read_messages=False)
+_VIEW_ONLY = discord.PermissionOverwrite(read_messages=True, send_messages=False)
+_VIEW = discord.PermissionOverwrite(read_messages=True)
+
+PERMISSION_PROFILES = {
+    "active": {
+        "default": _HIDDEN,
+        "owner": _OWNER_FULL,
+        "me": _BOT_ACCESS,
+        CONFIG["EVERYONE_ROLE_ID"]: _HIDDEN,
+        CONFIG["MEMBER_ROLE_ID"]: _VIEW_ONLY,
+    },
+    "held": {
+        "default": _HIDDEN,
+        "owner": _OWNER_READ_ONLY,
+        "me": _BOT_ACCESS,
+        CONFIG["EVERYONE_ROLE_ID"]: _HIDDEN,
+        CONFIG["MEMBER_ROLE_ID"]: _VIEW_ONLY,
+    },
+    "expired": {
+        "default": _HIDDEN,
+        "owner": _OWNER_READ_ONLY,
+        "me": _BOT_ACCESS,
+        CONFIG["EVERYONE_ROLE_ID"]: _HIDDEN,
+        CONFIG["MEMBER_ROLE_ID"]: _VIEW_ONLY,
+    },
+    "revoked": {
+        "default": _HIDDEN,
+        "me": _BOT_ACCESS,
+        CONFIG["EVERYONE_ROLE_ID"]: _HIDDEN,
+        CONFIG["MEMBER_ROLE_ID"]: _HIDDEN,
+        "admin": _VIEW,
+        CONFIG["STAFF_ROLE_ID"]: _VIEW,
+    },
+}
+
+_admin_roles = {}
+
+def admin_role(guild):
+    """First role granting administrator, looked up once per guild."""
+    if guild.id not in _admin_roles:
+        _admin_roles[guild.id] = discord.utils.get(guild.roles, permissions=discord.Permissions(administrator=True))
+    return _admin_roles[guild.id]
+
+def slot_overwrites(guild, state, owner=None):
+    """Resolve a permission profile into an overwrites mapping for ``guild``."""
+    overwrites = {}
+    for target, overwrite in PERMISSION_PROFILES[state].items():
+        if target == "default":
+            target = guild.default_role
+        elif target == "me":
+            target = guild.me
+        elif target == "owner":
+            target = owner
+        elif target == "admin":
+            target = admin_role(guild)
+        else:
+            target = guild.get_role(target)
+        if target is not None:
+            overwrites[target] = overwrite
+    return overwrites
+
+def live_profile(slot):
+    """Profile for a slot that is still owned: held slots stay read-only."""
+    return "held" if slot.get("held") else "active"
+
+async def apply_slot_profile(channel, state, owner=None, **changes):
+    """Replace the channel's overwrites with ``state`` in one API call.
+
+    Extra keyword arguments (``category``, ``name``) ride along in the same edit.
+    """
+    await channel.edit(overwrites=slot_overwrites(channel.guild, state, owner), **changes)
+
+@bot.event
+async def on_guild_role_create(role):
+    _admin_roles.pop(role.guild.id, None)
+
+@bot.event
+async def on_guild_role_update(before, after):
+    if before.permissions.administrator != after.permissions.administrator:
+        _admin_roles.pop(after.guild.id, None)
+
+@bot.event
+async def on_guild_role_delete(role):
+    _admin_roles.pop(role.guild.id, None)
+
+
+# --- Slot roles ---
+PLAN_ROLES = {"standard": CONFIG["STANDARD_ROLE_ID"], "elite": CONFIG["ELITE_ROLE_ID"]}
+
+
+def desired_roles(member, slot):
+    """member's roles with the slot-managed ones set to match `slot`.
+
+    An active slot (slot is not None) means its plan role, the access role
+    and, while held, the on-hold role. Without one the plan and on-hold roles
+    go; the access role is left as it is, as revoking always has.
+    """
+    managed = set(PLAN_ROLES.values()) | {CONFIG["ON_HOLD_ROLE_ID"]}
+    wanted = set()
+    if slot is not None:
+        managed.add(CONFIG["ACCESS_ROLE_ID"])
+        wanted = {PLAN_ROLES.get(slot.get("plan")), CONFIG["ACCESS_ROLE_ID"]}
+        if slot.get("held"):
+            wanted.add(CONFIG["ON_HOLD_ROLE_ID"])
+    wanted -= {None, 0}
+
+    roles = [role for role in member.roles if not role.is_default() and (role.id not in managed or role.id in wanted)]
+    have = {role.id for role in roles}
+    roles += [role for role in map(member.guild.get_role, wanted - have) if role]
+    return roles
+
+
+async def sync_slot_roles(member, slot):
+    """Give member the roles for `slot` in one edit; no request if they already match.
+
+    Returns True if the member was edited.
+    """
+    if member is None:
+        return False
+    roles = desired_roles(member, slot)
+    if {role.id for role in roles} == {role.id for role in member.roles if not role.is_default()}:
+        return False
+    try:
+        await member.edit(roles=roles)
+    except discord.HTTPException as e:
+        print(f"[Role Sync Error] Could not update roles for {member}: {e}")
+        return False
+    return True
 
 
 @bot.event
@@ -306,10 +2525,29 @@ async def on_ready():
 
     # Add persistent views
     bot.add_view(PersistentRecoveryView())
-
-    check_expired_slots.start()
-    daily_ping_reset.start()
-    check_expiry_warnings.start()
+    # Welcome messages are edited in place rather than resent, so their buttons must survive restarts
+    for uid, slot in store.slots.items():
+        if slot.get("welcome_msg_id") and slot.get("recovery_key_hash"):
+            bot.add_view(CopyRecoveryKeyView(int(uid)), message_id=slot["welcome_msg_id"])
+
+    if not outbox.running:
+        outbox.start()
+    if not scheduler.running:
+        scheduler.start(list(store.slots))
+    if not ephemeral.running:
+        ephemeral.start()
+
+    # Messages may have arrived while disconnected; only fresh sessions reach on_ready
+    slot_channels = [bot.get_channel(slot["channel_id"]) for slot in store.slots.values()]
+    slot_channels = [channel for channel in slot_channels if channel]
+    ledger.reconcile(slot_channels)
+    asyncio.create_task(search_index.catch_up(slot_channels))
+    if not daily_ping_reset.is_running():
+        daily_ping_reset.start()
+    if METRICS_FILE and not export_metrics.is_running():
+        export_metrics.start()
+    if not watchdog.running:
+        watchdog.start()
     
 
     
@@ -325,26 +2563,12 @@ async def create(ctx, user: discord.Member, duration: int, unit: str, plan: str,
     except ValueError as e:
         return await ctx.send(embed=discord.Embed(description=str(e), color=discord.Color.red()))
 
-    slots = load_json(SLOTS_FILE)
-    revoked = load_json(REVOKED_FILE)
-
     # Prevent duplicate slots per user
-    if str(user.id) in slots:
+    if store.get(user.id):
         return await ctx.send(embed=discord.Embed(description=f"{CONFIG['EMOJIS']['cancel/cross']} User already has an active slot.", color=discord.Color.red()))
 
-    # Create channel overwrites
     guild = ctx.guild
-    overwrites = {
-        guild.default_role: discord.PermissionOverwrite(read_messages=False),  # Hide for everyone by default
-        user: discord.PermissionOverwrite(
-            read_messages=True, send_messages=True, mention_everyone=True,
-            embed_links=True, attach_files=True, use_external_emojis=True
-        ),
-        guild.me: discord.PermissionOverwrite(read_messages=True, send_messages=True),
-        guild.get_role(CONFIG["EVERYONE_ROLE_ID"]): discord.PermissionOverwrite(read_messages=False),  # HiddenRole can't view
-        guild.get_role(CONFIG["MEMBER_ROLE_ID"]): discord.PermissionOverwrite(read_messages=True, send_messages=False),  # VisibleRole can view only
-    }
-
+    overwrites = slot_overwrites(guild, "active", user)
 
     category = guild.get_channel(CATEGORIES[plan])
     if not category:
@@ -354,30 +2578,13 @@ async def create(ctx, user: discord.Member, duration: int, unit: str, plan: str,
     channel_name = f"ᯓ・{slot_name}".lower().replace(" ", "-")
 
     channel = await guild.create_text_channel(channel_name, overwrites=overwrites, category=category)
-        # Assign roles based on plan
-    try:
-        if plan == "standard":
-            role_standard = guild.get_role(CONFIG["STANDARD_ROLE_ID"])
-            if role_standard:
-                await user.add_roles(role_standard)
-        elif plan == "elite":
-            role_elite = guild.get_role(CONFIG["ELITE_ROLE_ID"])
-            if role_elite:
-                await user.add_roles(role_elite)
-        access_role = guild.get_role(CONFIG["ACCESS_ROLE_ID"])
-        if access_role:
-            await user.add_roles(access_role)
-    except Exception as e:
-        print(f"[Role Assignment Error] Could not assign role(s) to {user}: {e}")
-
-
-
-    now_ts = int(datetime.datetime.utcnow().timestamp())
+    ledger.start_channel(channel.id)
+    now_ts = int(time.time())
     end_ts = now_ts + dur_seconds
 
     # Save slot data
-    slots[str(user.id)] = {
-        "recovery_key": str(uuid.uuid4()).split("-")[0].upper(),
+    slot = store.put(user.id, {
+        "recovery_key": store.new_recovery_key(),
         "channel_id": channel.id,
         "start_ts": now_ts,
         "end_ts": end_ts,
@@ -387,34 +2594,32 @@ async def create(ctx, user: discord.Member, duration: int, unit: str, plan: str,
         "held": False,
         "welcome_msg_id": None,
         "sticky_msg_id": None
-    }
-    save_json(SLOTS_FILE, slots)
-    await dm_user(
+    })
+    await sync_slot_roles(user, slot)
+    dm_user(
         user,
         "🔐 Your Recovery Key",
-        f"||**`{slots[str(user.id)]['recovery_key']}`**||\nKeep this key safe! It's your only way to recover your slot.",
-        color=discord.Color.green()
+        f"||**`{RECOVERY_KEY_PLACEHOLDER}`**||\nKeep this key safe! It's your only way to recover your slot.",
+        color=discord.Color.green(),
+        with_recovery_key=True
     )
 
 
     # Send welcome embed with timestamps and Copy Recovery Key button
-    embed = slot_info_embed(slots[str(user.id)], user, channel)
-    view = CopyRecoveryKeyView(slots[str(user.id)]["recovery_key"], user.id)
+    embed = slot_info_embed(slot, user, channel)
+    view = CopyRecoveryKeyView(user.id)
     welcome_msg = await channel.send(embed=embed, view=view)
-    slots[str(user.id)]["welcome_msg_id"] = welcome_msg.id
-    save_json(SLOTS_FILE, slots)
+    store.update(user.id, welcome_msg_id=welcome_msg.id, welcome_hash=welcome_digest(embed))
 
     # Send confirmation to ctx
     await ctx.send(embed=discord.Embed(description=f"{CONFIG['EMOJIS']['tick']} Slot created for {user.mention} in {channel.mention}", color=discord.Color.green()))
 
     # Log creation in admin channel
-    log_chan = bot.get_channel(ADMIN_LOG_CHANNEL)
-    if log_chan:
-        await log_chan.send(embed=timestamp_embed(
-            f"{CONFIG['EMOJIS']['correct/tick']} Slot Created",
-            f"Slot `{channel.name}` created for {user.mention} by {ctx.author.mention}\nPlan: {plan.title()}\nExpires: <t:{end_ts}:F>",
-            discord.Color.green()
-        ))
+    post_admin_log(timestamp_embed(
+        f"{CONFIG['EMOJIS']['correct/tick']} Slot Created",
+        f"Slot `{channel.name}` created for {user.mention} by {ctx.author.mention}\nPlan: {plan.title()}\nExpires: <t:{end_ts}:F>",
+        discord.Color.green()
+    ))
 
 @bot.command()
 async def nuke(ctx, user: discord.Member = None):
@@ -423,7 +2628,7 @@ async def nuke(ctx, user: discord.Member = None):
         user = ctx.author
     
     uid = str(user.id)
-    slots = load_json(SLOTS_FILE)
+    slots = store.slots
 
     # Check if user has permission or owns the slot
     if not ctx.author.guild_permissions.administrator and str(ctx.author.id) != uid:
@@ -448,24 +2653,21 @@ async def nuke(ctx, user: discord.Member = None):
 
     try:
         # Purge all messages
-        await channel.purge(limit=1000)
+        await clear_slot_channel(channel)
 
         # Reset ping usage
-        slot["everyone_used"] = 0
-        slot["here_used"] = 0
+        store.update(uid, everyone_used=0, here_used=0)
         
         # Send new welcome message
         embed = slot_info_embed(slot, user, channel)
-        view = CopyRecoveryKeyView(slot["recovery_key"], user.id)
+        view = CopyRecoveryKeyView(user.id)
         welcome_msg = await channel.send(embed=embed, view=view)
-        slot["welcome_msg_id"] = welcome_msg.id
+        store.update(uid, welcome_msg_id=welcome_msg.id, welcome_hash=welcome_digest(embed))
         
         # Send new ping tracker
         ping_embed = ping_usage_embed(0, 0, slot["plan"], slot.get("custom_limits"))
         ping_msg = await channel.send(embed=ping_embed)
-        slot["sticky_msg_id"] = ping_msg.id
-        
-        save_json(SLOTS_FILE, slots)
+        store.update(uid, sticky_msg_id=ping_msg.id)
 
         if ctx.channel != channel:
             await ctx.send(embed=discord.Embed(
@@ -473,7 +2675,7 @@ async def nuke(ctx, user: discord.Member = None):
                 color=discord.Color.green()
             ))
 
-        await channel.send(embed=discord.Embed(
+        notify_channel(channel, discord.Embed(
             description=f"{CONFIG['EMOJIS']['warning']} This slot was nuked and reset by {ctx.author.mention}.",
             color=discord.Color.blurple()
         ))
@@ -501,94 +2703,52 @@ async def sendrecoverypanel(ctx):
 @bot.command()
 @commands.has_permissions(administrator=True)
 async def revoke(ctx, user: discord.Member, *, reason: str = "No reason provided"):
-    slots = load_json(SLOTS_FILE)
-    revoked = load_json(REVOKED_FILE)
+    slots = store.slots
 
     uid = str(user.id)
     if uid not in slots:
         return await ctx.send(embed=discord.Embed(description=f"{CONFIG['EMOJIS']['cancel/cross']} No active slot found for {user.mention}.", color=discord.Color.red()))
 
     slot = slots[uid]
-        # Remove roles based on plan
-    try:
-        if slot["plan"] == "standard":
-            role1 = ctx.guild.get_role(CONFIG["STANDARD_ROLE_ID"])
-            role2 = ctx.guild.get_role(CONFIG["ELITE_ROLE_ID"])
-            if role1: await user.remove_roles(role1)
-            if role2: await user.remove_roles(role2)
-        elif slot["plan"] == "elite":
-            role = ctx.guild.get_role(CONFIG["ELITE_ROLE_ID"])
-            if role: await user.remove_roles(role)
-    except Exception as e:
-        print(f"[Role Removal Error] Could not remove roles from {user}: {e}")
+    await sync_slot_roles(user, None)
 
     channel = bot.get_channel(slot['channel_id'])
     if not channel:
         return await ctx.send(embed=discord.Embed(description=f"{CONFIG['EMOJIS']['cancel/cross']} Slot channel not found.", color=discord.Color.red()))
 
-    # Set permissions: hide from everyone, read-only for user
-    # Reset permissions
-    await channel.set_permissions(ctx.guild.default_role, overwrite=None)
-    await channel.set_permissions(user, overwrite=None)
-    await channel.set_permissions(ctx.guild.me, read_messages=True, send_messages=True)
-
-    # Deny access to specific roles
-    role_hidden = ctx.guild.get_role(CONFIG["EVERYONE_ROLE_ID"])
-    role_visible = ctx.guild.get_role(CONFIG["MEMBER_ROLE_ID"])
-    if role_hidden:
-        await channel.set_permissions(role_hidden, read_messages=False)
-    if role_visible:
-        await channel.set_permissions(role_visible, read_messages=False)
-
-    # Allow only staff role and admins
-    admin_role = discord.utils.get(ctx.guild.roles, permissions=discord.Permissions(administrator=True))
-    staff_role = ctx.guild.get_role(CONFIG["STAFF_ROLE_ID"])
-    if admin_role:
-        await channel.set_permissions(admin_role, read_messages=True)
-    if staff_role:
-        await channel.set_permissions(staff_role, read_messages=True)
-
-    # Move channel to revoked category
+    # Lock the channel down to staff and move it to the revoked category in one edit
     revoked_category = ctx.guild.get_channel(CONFIG["REVOKED_SLOT_CATEGORY_ID"])
-    if revoked_category:
-        await channel.edit(category=revoked_category) #here
+    changes = {"category": revoked_category} if revoked_category else {}
+    await apply_slot_profile(channel, "revoked", **changes)
 
 
 
     # Send revoke message in slot channel
-    await channel.send(embed=timestamp_embed(
+    notify_channel(channel, timestamp_embed(
         f"{CONFIG['EMOJIS']['cancel/cross']} Slot Revoked",
         f"Your slot has been revoked by staff.\n\nReason: {reason}",
         discord.Color.red()
     ))
 
     # DM user about revocation
-    await dm_user(user, f"{CONFIG['EMOJIS']['cancel/cross']} Slot Revoked", f"Your slot has been revoked.\nReason: {reason}", discord.Color.red())
+    dm_user(user, f"{CONFIG['EMOJIS']['cancel/cross']} Slot Revoked", f"Your slot has been revoked.\nReason: {reason}", discord.Color.red())
 
     # Move slot data to revoked file
-    revoked[uid] = slot
-    save_json(REVOKED_FILE, revoked)
-
-    # Remove from active slots
-    slots.pop(uid)
-    save_json(SLOTS_FILE, slots)
+    store.revoke(uid)
 
     # Log in admin channel with who revoked
-    log_chan = bot.get_channel(ADMIN_LOG_CHANNEL)
-    if log_chan:
-        await log_chan.send(embed=timestamp_embed(
-            f"{CONFIG['EMOJIS']['error']} Slot Revoked (Manual)",
-            f"Slot for {user.mention} revoked by {ctx.author.mention}\nReason: {reason}",
-            discord.Color.red()
-        ))
+    post_admin_log(timestamp_embed(
+        f"{CONFIG['EMOJIS']['error']} Slot Revoked (Manual)",
+        f"Slot for {user.mention} revoked by {ctx.author.mention}\nReason: {reason}",
+        discord.Color.red()
+    ))
 
     await ctx.send(embed=discord.Embed(description=f"{CONFIG['EMOJIS']['tick']} Slot revoked for {user.mention}.", color=discord.Color.green()))
 
 @bot.command()
 @commands.has_permissions(administrator=True)
 async def restore(ctx, user: discord.Member):
-    revoked = load_json(REVOKED_FILE)
-    slots = load_json(SLOTS_FILE)
+    revoked = store.revoked
     uid = str(user.id)
 
     if uid not in revoked:
@@ -599,73 +2759,32 @@ async def restore(ctx, user: discord.Member):
     if not channel:
         return await ctx.send(embed=discord.Embed(description=f"{CONFIG['EMOJIS']['cancel/cross']} Slot channel not found.", color=discord.Color.red()))
 
-    slot['everyone_used'] = 0
-    slot['here_used'] = 0
-
-    # Restore permissions: allow user to send & mention, default_role can read but not send
-    # Reset permissions to default per-plan structure
-    # Reset permissions to default per-plan structure
-    await channel.set_permissions(ctx.guild.default_role, read_messages=False)
-
-    await channel.set_permissions(user, read_messages=True, send_messages=True, mention_everyone=True,
-        embed_links=True, attach_files=True, use_external_emojis=True)
-
-    await channel.set_permissions(ctx.guild.me, read_messages=True, send_messages=True)
-
-    # Update special roles' visibility
-    role_hidden = ctx.guild.get_role(CONFIG["EVERYONE_ROLE_ID"])
-    role_visible = ctx.guild.get_role(CONFIG["MEMBER_ROLE_ID"])
-    if role_hidden:
-        await channel.set_permissions(role_hidden, read_messages=False)
-    if role_visible:
-        await channel.set_permissions(role_visible, read_messages=True, send_messages=False)
-
-
-    # Restore correct category
-    target_category_id = CATEGORIES.get(slot["plan"])
-    category = ctx.guild.get_channel(target_category_id)
-    if category:
-        await channel.edit(category=category)
-
-    # Reassign correct user role
-    try:
-        if slot["plan"] == "standard":
-            role_standard = ctx.guild.get_role(CONFIG["STANDARD_ROLE_ID"])
-            if role_standard and role_standard not in user.roles:
-                await user.add_roles(role_standard)
-        elif slot["plan"] == "elite":
-            role_elite = ctx.guild.get_role(CONFIG["ELITE_ROLE_ID"])
-            if role_elite and role_elite not in user.roles:
-                await user.add_roles(role_elite)
-    except Exception as e:
-        print(f"[Restore Role Error] Couldn't reassign role to {user}: {e}")
-
+    # Reset permissions to the active profile and restore the plan category together
+    category = ctx.guild.get_channel(CATEGORIES.get(slot["plan"]))
+    changes = {"category": category} if category else {}
+    await apply_slot_profile(channel, live_profile(slot), user, **changes)
 
     # Move back to active slots
-    slots[uid] = slot
-    save_json(SLOTS_FILE, slots)
+    store.restore(uid)
+    store.update(uid, everyone_used=0, here_used=0)
+    await sync_slot_roles(user, store.get(uid))
 
-    revoked.pop(uid)
-    save_json(REVOKED_FILE, revoked)
-
-    await channel.send(embed=timestamp_embed(f"{CONFIG['EMOJIS']['tick']} Slot Restored", f"Slot for {user.mention} has been restored and is now active.", discord.Color.green()))
-    await dm_user(user, f"{CONFIG['EMOJIS']['tick']} Slot Restored", "Your slot has been restored and reactivated.", discord.Color.green())
+    notify_channel(channel, timestamp_embed(f"{CONFIG['EMOJIS']['tick']} Slot Restored", f"Slot for {user.mention} has been restored and is now active.", discord.Color.green()))
+    dm_user(user, f"{CONFIG['EMOJIS']['tick']} Slot Restored", "Your slot has been restored and reactivated.", discord.Color.green())
 
     # Log restore in admin channel
-    log_chan = bot.get_channel(ADMIN_LOG_CHANNEL)
-    if log_chan:
-        await log_chan.send(embed=timestamp_embed(
-            f"{CONFIG['EMOJIS']['refresh']} Slot Restored",
-            f"Slot for {user.mention} restored by {ctx.author.mention}",
-            discord.Color.green()
-        ))
+    post_admin_log(timestamp_embed(
+        f"{CONFIG['EMOJIS']['refresh']} Slot Restored",
+        f"Slot for {user.mention} restored by {ctx.author.mention}",
+        discord.Color.green()
+    ))
 
     await ctx.send(embed=discord.Embed(description=f"{CONFIG['EMOJIS']['tick']} Slot restored for {user.mention}.", color=discord.Color.green()))
 
 @bot.command()
 @commands.has_permissions(administrator=True)
 async def hold(ctx, user: discord.Member, *, reason: str):
-    slots = load_json(SLOTS_FILE)
+    slots = store.slots
     uid = str(user.id)
 
     if uid not in slots:
@@ -679,77 +2798,71 @@ async def hold(ctx, user: discord.Member, *, reason: str):
     if not channel:
         return await ctx.send(embed=discord.Embed(description=f"{CONFIG['EMOJIS']['cancel/cross']} Slot channel not found.", color=discord.Color.red()))
 
-    # Remove send perms for user
-    await channel.set_permissions(user, send_messages=False)
+    # Owner keeps read access but can no longer post
+    await apply_slot_profile(channel, "held", user)
 
-    # Add on-hold role if configured
-    if CONFIG["ON_HOLD_ROLE_ID"] != 0:
-        hold_role = ctx.guild.get_role(CONFIG["ON_HOLD_ROLE_ID"])
-        if hold_role:
-            try:
-                await user.add_roles(hold_role)
-            except:
-                pass
+    # Record the hold; adds the on-hold role if configured
+    store.update(uid, held=True)
+    await sync_slot_roles(user, store.get(uid))
 
-    slot["held"] = True
-    save_json(SLOTS_FILE, slots)
-
-    await channel.send(embed=timestamp_embed(f"{CONFIG['EMOJIS']['error']} Slot Held", f"Slot is held.\nReason: {reason}", discord.Color.red()))
-    await dm_user(user, f"{CONFIG['EMOJIS']['error']} Slot Held", f"Your slot has been put on hold.\nReason: {reason}", discord.Color.red())
+    notify_channel(channel, timestamp_embed(f"{CONFIG['EMOJIS']['error']} Slot Held", f"Slot is held.\nReason: {reason}", discord.Color.red()))
+    dm_user(user, f"{CONFIG['EMOJIS']['error']} Slot Held", f"Your slot has been put on hold.\nReason: {reason}", discord.Color.red())
 
     # Log hold in admin channel
-    log_chan = bot.get_channel(ADMIN_LOG_CHANNEL)
-    if log_chan:
-        await log_chan.send(embed=timestamp_embed(
-            f"{CONFIG['EMOJIS']['error']} Slot Held",
-            f"Slot for {user.mention} held by {ctx.author.mention}\nReason: {reason}",
-            discord.Color.orange()
-        ))
+    post_admin_log(timestamp_embed(
+        f"{CONFIG['EMOJIS']['error']} Slot Held",
+        f"Slot for {user.mention} held by {ctx.author.mention}\nReason: {reason}",
+        discord.Color.orange()
+    ))
 
     await ctx.send(embed=discord.Embed(description=f"{CONFIG['EMOJIS']['tick']} Slot held for {user.mention}.", color=discord.Color.green()))
 
 @bot.command()
 @commands.has_permissions(administrator=True)
 async def genslotkey(ctx):
-    slots = load_json(SLOTS_FILE)
-    success_count = 0
-    failed_users = []
+    slots = store.slots
 
-    for uid in slots:
-        try:
-            slot_data = slots[uid]  # Always fetch fresh reference
-
-            # Generate key if missing
-            if "recovery_key" not in slot_data or not slot_data["recovery_key"]:
-                slot_data["recovery_key"] = str(uuid.uuid4()).split("-")[0].upper()
+    # Generate keys where missing before anything is sent
+    for uid in list(slots):
+        if not slots[uid].get("recovery_key_hash"):
+            store.update(uid, recovery_key=store.new_recovery_key())
 
-            user = await bot.fetch_user(int(uid))
-            await dm_user(
-                user,
-                "🔐 Your Recovery Key",
-                f"||**`{slot_data['recovery_key']}`**||\nKeep this key safe! It's your only way to recover your slot.",
-                color=discord.Color.green()
-            )
-            success_count += 1
+    def key_message(uid):
+        return {"embed": discord.Embed(
+            title="🔐 Your Recovery Key",
+            description=f"||**`{store.recovery_key(uid)}`**||\nKeep this key safe! It's your only way to recover your slot.",
+            color=discord.Color.green()
+        )}
 
-        except Exception as e:
-            failed_users.append(uid)
+    broadcast = Broadcast("Recovery keys", ctx.channel)
+    await broadcast.run(list(slots), key_message)
+    await ctx.send(embed=broadcast_report(broadcast, f"{CONFIG['EMOJIS']['tick']} Recovery keys sent."))
 
-    save_json(SLOTS_FILE, slots)  # Save new keys!
 
-    await ctx.send(embed=discord.Embed(
-        description=f"{CONFIG['EMOJIS']['tick']} Sent recovery keys to **{success_count}** users.\n"
-                    f"{CONFIG['EMOJIS']['cross']} Failed to send to `{len(failed_users)}` users (DMs off or blocked).",
-        color=discord.Color.green()
+@bot.command()
+@commands.has_permissions(administrator=True)
+async def announce(ctx, *, message: str):
+    embed = timestamp_embed("📢 Announcement", message, discord.Color.blue())
+    embed.set_footer(text=f"Sent by {ctx.author} • {ctx.guild.name}")
+
+    broadcast = Broadcast("Announcement", ctx.channel)
+    await broadcast.run(list(store.slots), lambda uid: {"embed": embed})
+    await ctx.send(embed=broadcast_report(broadcast, f"{CONFIG['EMOJIS']['tick']} Announcement delivered to slot owners."))
+
+    post_admin_log(timestamp_embed(
+        "📢 Announcement Sent",
+        f"{ctx.author.mention} announced to all slot owners:\n{message}\n\n{broadcast.summary()}",
+        discord.Color.blue()
     ))
 
 
 
 
+
 @bot.command()
 @commands.has_permissions(administrator=True)
 async def unhold(ctx, user: discord.Member):
-    slots = load_json(SLOTS_FILE)
+    slots = store.slots
     uid = str(user.id)
 
     if uid not in slots:
@@ -763,38 +2876,28 @@ async def unhold(ctx, user: discord.Member):
     if not channel:
         return await ctx.send(embed=discord.Embed(description=f"{CONFIG['EMOJIS']['cancel/cross']} Slot channel not found.", color=discord.Color.red()))
 
-    # Restore send perms for user
-    await channel.set_permissions(user, send_messages=True)
+    # Restore full owner permissions
+    await apply_slot_profile(channel, "active", user)
 
-    # Remove on-hold role if configured
-    if CONFIG["ON_HOLD_ROLE_ID"] != 0:
-        hold_role = ctx.guild.get_role(CONFIG["ON_HOLD_ROLE_ID"])
-        if hold_role:
-            try:
-                await user.remove_roles(hold_role)
-            except:
-                pass
-
-    slot["held"] = False
-    save_json(SLOTS_FILE, slots)
+    # Lift the hold; removes the on-hold role if configured
+    store.update(uid, held=False)
+    await sync_slot_roles(user, store.get(uid))
 
-    await channel.send(embed=timestamp_embed(f"{CONFIG['EMOJIS']['tick']} Slot Unheld", "Slot hold removed. You may continue using your slot.", discord.Color.green()))
-    await dm_user(user, f"{CONFIG['EMOJIS']['tick']} Slot Unheld", "Your slot hold has been lifted. You may now continue using it.", discord.Color.green())
+    notify_channel(channel, timestamp_embed(f"{CONFIG['EMOJIS']['tick']} Slot Unheld", "Slot hold removed. You may continue using your slot.", discord.Color.green()))
+    dm_user(user, f"{CONFIG['EMOJIS']['tick']} Slot Unheld", "Your slot hold has been lifted. You may now continue using it.", discord.Color.green())
 
     # Log unhold in admin channel
-    log_chan = bot.get_channel(ADMIN_LOG_CHANNEL)
-    if log_chan:
-        await log_chan.send(embed=timestamp_embed(
-            f"{CONFIG['EMOJIS']['arrow']} Slot Unheld",
-            f"Slot for {user.mention} unheld by {ctx.author.mention}",
-            discord.Color.green()
-        ))
+    post_admin_log(timestamp_embed(
+        f"{CONFIG['EMOJIS']['arrow']} Slot Unheld",
+        f"Slot for {user.mention} unheld by {ctx.author.mention}",
+        discord.Color.green()
+    ))
 
     await ctx.send(embed=discord.Embed(description=f"{CONFIG['EMOJIS']['tick']} Slot unheld for {user.mention}.", color=discord.Color.green()))
 
 @bot.command()
 async def pings(ctx):
-    slots = load_json(SLOTS_FILE)
+    slots = store.slots
     uid = str(ctx.author.id)
 
     if uid not in slots:
@@ -808,7 +2911,7 @@ async def pings(ctx):
 async def slotinfo(ctx, user: discord.Member = None):
     if user is None:
         user = ctx.author
-    slots = load_json(SLOTS_FILE)
+    slots = store.slots
     uid = str(user.id)
 
     if uid not in slots:
@@ -818,127 +2921,151 @@ async def slotinfo(ctx, user: discord.Member = None):
     embed = slot_info_embed(slot, user, channel)
     await ctx.send(embed=embed)
 
-@tasks.loop(seconds=60)
-async def check_expired_slots():
-    slots = load_json(SLOTS_FILE)
-    revoked = load_json(REVOKED_FILE)
-    now_ts = int(datetime.datetime.utcnow().timestamp())
-    to_revoke = []
+# Expiry warnings go out this long before end_ts
+EXPIRY_WARNING_WINDOW = 24 * 3600
+
+def slot_deadlines(uid):
+    """Scheduler deadlines for a slot: expiry unless held, one warning unless sent."""
+    slot = store.get(uid)
+    if slot is None:
+        return {}
+    deadlines = {}
+    if not slot.get("held", False):
+        deadlines["expire"] = slot["end_ts"] + 1
+    if not slot.get("warned", False):
+        deadlines["warn"] = slot["end_ts"] - EXPIRY_WARNING_WINDOW
+    return deadlines
+
+
+async def expire_slot(uid):
+    slot = store.get(uid)
+    now_ts = int(time.time())
+    if slot is None or slot.get("held", False):
+        return
+    if now_ts <= slot["end_ts"]:
+        # Woken early: the runner already dropped this deadline, so queue it again
+        scheduler.retry_in(uid, "expire", slot["end_ts"] + 1 - now_ts)
+        return
 
-    for uid, slot in slots.items():
-        if not slot.get("held", False) and now_ts > slot["end_ts"]:
-            to_revoke.append(uid)
+    channel = bot.get_channel(slot["channel_id"])
+    user = await users.user(uid, channel.guild if channel else None)
+
+    if channel and user:
+        await apply_slot_profile(channel, "expired", user)
+        key = f"expired:{uid}:{slot['end_ts']}"
+        notify_channel(channel, timestamp_embed(
+            f"{CONFIG['EMOJIS']['cancel/cross']} Slot Expired",
+            "Your slot has expired. Contact staff for renewal.",
+            discord.Color.dark_gray()
+        ), key=f"{key}:channel")
 
-    for uid in to_revoke:
-        slot = slots[uid]
-        channel = bot.get_channel(slot["channel_id"])
-        user = bot.get_user(int(uid))
-
-        if channel and user:
-            await channel.set_permissions(channel.guild.default_role, read_messages=False)
-            await channel.set_permissions(user, read_messages=True, send_messages=False)
-            await channel.send(embed=timestamp_embed(
-                f"{CONFIG['EMOJIS']['cancel/cross']} Slot Expired",
-                "Your slot has expired. Contact staff for renewal.",
-                discord.Color.dark_gray()
-            ))
+        dm_user(user,
+            f"{CONFIG['EMOJIS']['cancel/cross']} Slot Expired",
+            "Your slot on **Slotify** has expired. Contact staff to renew.",
+            discord.Color.dark_gray(),
+            key=f"{key}:dm"
+        )
 
-            await dm_user(user,
-                f"{CONFIG['EMOJIS']['cancel/cross']} Slot Expired",
-                "Your slot on **Slotify** has expired. Contact staff to renew.",
-                discord.Color.dark_gray()
-            )
+        post_admin_log(timestamp_embed(
+            f"{CONFIG['EMOJIS']['cancel/cross']} Slot Expired",
+            f"Slot for {user.mention} auto-expired.",
+            discord.Color.dark_gray()
+        ), key=f"{key}:log")
 
-            log_chan = bot.get_channel(ADMIN_LOG_CHANNEL)
-            if log_chan:
-                await log_chan.send(embed=timestamp_embed(
-                    f"{CONFIG['EMOJIS']['cancel/cross']} Slot Expired",
-                    f"Slot for {user.mention} auto-expired.",
-                    discord.Color.dark_gray()
-                ))
-
-        revoked[uid] = slot
-        slots.pop(uid)
-
-    save_json(SLOTS_FILE, slots)
-    save_json(REVOKED_FILE, revoked)
-
-
-@tasks.loop(minutes=60)
-async def check_expiry_warnings():
-    slots = load_json(SLOTS_FILE)
-    now_ts = int(datetime.datetime.utcnow().timestamp())
-    warning_threshold = 24 * 3600  # 24 hours in seconds
-    warned_users = []
-
-    for uid, slot in slots.items():
-        end_ts = slot.get("end_ts", 0)
-        if end_ts - now_ts <= warning_threshold and end_ts - now_ts > 0:
-            # Skip already warned slots
-            if slot.get("warned", False):
-                continue
+    store.revoke(uid)
 
-            user = await bot.fetch_user(int(uid))
-            channel = bot.get_channel(slot['channel_id'])
-            if not channel or not user:
-                continue
 
-            # Send warning in slot channel
-            await channel.send(embed=timestamp_embed(
-                f"{CONFIG['EMOJIS']['warning']} Slot Expiry Warning",
-                f"{user.mention}, your slot will expire in less than 24 hours.\nPlease contact the staff to renew.",
-                discord.Color.orange()
-            ))
+async def warn_expiring_slot(uid):
+    slot = store.get(uid)
+    now_ts = int(time.time())
+    if slot is None or slot.get("warned", False) or slot["end_ts"] <= now_ts:
+        return
 
-            # Send DM warning
-            await dm_user(
-                user,
-                f"{CONFIG['EMOJIS']['warning']} Slot Expiry Warning",
-                "Your slot will expire in less than 24 hours. Contact staff if you'd like to renew.",
-                discord.Color.orange()
-            )
+    channel = bot.get_channel(slot['channel_id'])
+    # Deleted accounts resolve to None (and stay cached as unknown) instead of raising
+    user = await users.user(uid, channel.guild if channel else None)
+    if not channel or not user:
+        return
 
-            # Log in admin channel
-            log_channel = bot.get_channel(ADMIN_LOG_CHANNEL)
-            if log_channel:
-                await log_channel.send(embed=timestamp_embed(
-                    f"{CONFIG['EMOJIS']['warning']} Expiry Warning Sent",
-                    f"Sent expiry warning to {user.mention} (`{user.id}`) — {channel.mention}",
-                    discord.Color.orange()
-                ))
+    key = f"warned:{uid}:{slot['end_ts']}"
 
-            slot["warned"] = True
-            warned_users.append(uid)
+    # Send warning in slot channel
+    notify_channel(channel, timestamp_embed(
+        f"{CONFIG['EMOJIS']['warning']} Slot Expiry Warning",
+        f"{user.mention}, your slot will expire in less than 24 hours.\nPlease contact the staff to renew.",
+        discord.Color.orange()
+    ), key=f"{key}:channel")
 
-    if warned_users:
-        save_json(SLOTS_FILE, slots)
+    # Send DM warning
+    dm_user(
+        user,
+        f"{CONFIG['EMOJIS']['warning']} Slot Expiry Warning",
+        "Your slot will expire in less than 24 hours. Contact staff if you'd like to renew.",
+        discord.Color.orange(),
+        key=f"{key}:dm"
+    )
 
+    # Log in admin channel
+    post_admin_log(timestamp_embed(
+        f"{CONFIG['EMOJIS']['warning']} Expiry Warning Sent",
+        f"Sent expiry warning to {user.mention} (`{user.id}`) — {channel.mention}",
+        discord.Color.orange()
+    ), key=f"{key}:log")
 
-@tasks.loop(time=datetime.time(hour=0, minute=0, tzinfo=pytz.timezone('Europe/Amsterdam')))
-async def daily_ping_reset():
-    slots = load_json(SLOTS_FILE)
-    for uid, slot in slots.items():
-        slot["everyone_used"] = 0
-        slot["here_used"] = 0
+    store.update(uid, warned=True)
+
+
+# Expiries and warnings fire at their deadlines instead of polling every slot
+scheduler = DeadlineScheduler(slot_deadlines, {"expire": expire_slot, "warn": warn_expiring_slot})
+store.subscribe(scheduler.reschedule)
+
+
+async def reset_ping_counters(on_progress=None):
+    """Reset every slot's ping counters, purge its channel and post a fresh tracker.
+
+    Channels are processed in parallel through FanOut and the new counters and
+    tracker ids are written to the store in one batch at the end.
+    Returns (updated_count, elapsed_seconds).
+    """
+    slots = list(store.slots.items())
+
+    async def reset_channel(item):
+        uid, slot = item
         channel = bot.get_channel(slot["channel_id"])
         if not channel:
-            continue
+            return None
 
         try:
-            def preserve(msg):
-                return msg.id == slot.get("welcome_msg_id")
-            await channel.purge(limit=1000, check=lambda m: not preserve(m))
-        except Exception:
-            pass
+            await clear_slot_channel(channel, keep=slot.get("welcome_msg_id"))
+        except Exception as e:
+            print(f"[Ping Reset] Could not clear {channel.id}: {e}")
 
-        try:
-            embed = ping_usage_embed(0, 0, slot["plan"], slot.get("custom_limits"))
-            msg = await channel.send(embed=embed)
-            slot["sticky_msg_id"] = msg.id
-        except Exception:
-            pass
+        embed = ping_usage_embed(0, 0, slot["plan"], slot.get("custom_limits"))
+        msg = await channel.send(embed=embed)
+        return msg.id
+
+    fanout = FanOut(on_progress=on_progress)
+    results = await fanout.run(slots, reset_channel, key=lambda item: item[1]["channel_id"])
 
-    save_json(SLOTS_FILE, slots)
+    updates = {}
+    for (uid, _), sticky_msg_id in zip(slots, results):
+        updates[uid] = {"everyone_used": 0, "here_used": 0}
+        if isinstance(sticky_msg_id, int):
+            updates[uid]["sticky_msg_id"] = sticky_msg_id
+    store.update_many(updates)
+
+    updated_count = sum(1 for r in results if isinstance(r, int))
+    return updated_count, fanout.elapsed
+
+
+@tasks.loop(time=datetime.time(hour=0, minute=0, tzinfo=pytz.timezone('Europe/Amsterdam')))
+@timed("task:daily_ping_reset")
+async def daily_ping_reset():
+    async def report(done, total):
+        print(f"[Ping Reset] {done}/{total} slot channels reset")
+
+    updated_count, elapsed = await reset_ping_counters(on_progress=report)
+    print(f"[Ping Reset] Reset {updated_count} slot channels in {elapsed:.1f}s")
 
     alert_chan = bot.get_channel(PING_RESET_ALERT_CHANNEL)
     if alert_chan:
@@ -965,138 +3092,96 @@ async def daily_ping_reset():
 
 @bot.event
 async def on_message(message):
+    uid = store.owner_of_channel(message.channel.id)
+    if uid is not None:
+        # Remember everything posted in slot channels so resets can delete by id
+        ledger.record(message.channel.id, message.id)
+        search_index.add(message)
+
     if message.author.bot:
         return
 
     # Auto-react to messages in suggestion channel
-    if CONFIG["SUGGESTION_CHANNEL_ID"] != 0 and message.channel.id == CONFIG["SUGGESTION_CHANNEL_ID"]:
+    if SUGGESTION_CHANNEL_ID and message.channel.id == SUGGESTION_CHANNEL_ID:
         try:
             await message.add_reaction("👍")
             await message.add_reaction("👎")
         except:
             pass
 
-    slots = load_json(SLOTS_FILE)
-    uid = str(message.author.id)
+    # Only the owner posting in their own slot channel gets past this check
+    if uid is not None and uid == str(message.author.id):
+        slot = store.get(uid)
+        # Check if slot is held: block sending messages
+        if slot.get("held", False):
+            try:
+                await message.delete()
+            except:
+                pass
+            return
 
-    if uid in slots:
-        slot = slots[uid]
-        if message.channel.id == slot["channel_id"]:
-            if message.author.id != int(uid):
-                # Non-owner message - ignore
-                return
+        # Check ping abuse, only when the message can actually contain a mention
+        content = message.content
+        if not (message.mention_everyone or "@" in content):
+            return await bot.process_commands(message)
+        used_ping = False
+        limits = slot.get("custom_limits", PING_LIMITS[slot["plan"]])
 
-            # Check if slot is held: block sending messages
-            if slot.get("held", False):
-                try:
-                    await message.delete()
-                except:
-                    pass
-                return
+        # Only count exact mentions (case-insensitive)
+        if "@everyone" in content:
+            store.update(uid, everyone_used=slot["everyone_used"] + 1)
+            used_ping = True
+        if "@here" in content:
+            store.update(uid, here_used=slot["here_used"] + 1)
+            used_ping = True
 
-            # Check ping abuse:
-            content_lower = message.content.lower()
-            used_ping = False
-            limits = slot.get("custom_limits", PING_LIMITS[slot["plan"]])
-
-            # Only count exact mentions (case-insensitive)
-            if "@everyone" in message.content:
-                slot["everyone_used"] += 1
-                used_ping = True
-            if "@here" in message.content:
-                slot["here_used"] += 1
-                used_ping = True
-
-            # Revoke slot if over limit
-            if slot["everyone_used"] > limits["everyone"] or slot["here_used"] > limits["here"]:
-                channel = message.channel
-                user = message.author
-
-                # Revoke permissions
-                await channel.set_permissions(channel.guild.default_role, overwrite=None)
-                await channel.set_permissions(user, overwrite=None)
-                await channel.set_permissions(channel.guild.me, read_messages=True, send_messages=True)
-
-                # Deny HiddenRole and VisibleRole
-                role_hidden = channel.guild.get_role(CONFIG["EVERYONE_ROLE_ID"])
-                role_visible = channel.guild.get_role(CONFIG["MEMBER_ROLE_ID"])
-                if role_hidden:
-                    await channel.set_permissions(role_hidden, read_messages=False)
-                if role_visible:
-                    await channel.set_permissions(role_visible, read_messages=False)
-
-                # Allow only staff and admins
-                admin_role = discord.utils.get(channel.guild.roles, permissions=discord.Permissions(administrator=True))
-                staff_role = channel.guild.get_role(CONFIG["STAFF_ROLE_ID"])
-                if admin_role:
-                    await channel.set_permissions(admin_role, read_messages=True)
-                if staff_role:
-                    await channel.set_permissions(staff_role, read_messages=True)
-
-                # Move to revoked category
-                revoked_category = channel.guild.get_channel(CONFIG["REVOKED_SLOT_CATEGORY_ID"])
-                if revoked_category:
-                    await channel.edit(category=revoked_category) #here
-
-
-
-                # Move slot to revoked
-                revoked = load_json(REVOKED_FILE)
-                revoked[uid] = slot
-                save_json(REVOKED_FILE, revoked)
-
-                slots.pop(uid)
-                save_json(SLOTS_FILE, slots)
-
-                await channel.send(embed=timestamp_embed(
-                    f"{CONFIG['EMOJIS']['cancel/cross']} Slot Revoked",
-                    "Your slot was auto-revoked for ping abuse.",
-                    discord.Color.red()
-                ))
-                await dm_user(user, f"{CONFIG['EMOJIS']['cancel/cross']} Slot Revoked", "Your slot was revoked due to ping abuse.", discord.Color.red())
-
-                log_chan = bot.get_channel(ADMIN_LOG_CHANNEL)
-                if log_chan:
-                    await log_chan.send(embed=timestamp_embed(
-                        f"{CONFIG['EMOJIS']['warning']} Auto Revoke",
-                        f"Slot for {user.mention} auto-revoked for ping abuse.",
-                        discord.Color.red()
-                    ))
-                return
+        # Revoke slot if over limit
+        if slot["everyone_used"] > limits["everyone"] or slot["here_used"] > limits["here"]:
+            channel = message.channel
+            user = message.author
 
-            if used_ping:
-                # Delete old sticky ping usage message if exists
-                try:
-                    channel = message.channel
-                    if "sticky_msg_id" in slot:
-                        old_msg = await channel.fetch_message(slot["sticky_msg_id"])
-                        await old_msg.delete()
-                except:
-                    pass
+            # Lock down to staff and move to the revoked category in one edit
+            revoked_category = channel.guild.get_channel(CONFIG["REVOKED_SLOT_CATEGORY_ID"])
+            changes = {"category": revoked_category} if revoked_category else {}
+            await apply_slot_profile(channel, "revoked", **changes)
+
+
+
+            # Move slot to revoked
+            store.revoke(uid)
+
+            notify_channel(channel, timestamp_embed(
+                f"{CONFIG['EMOJIS']['cancel/cross']} Slot Revoked",
+                "Your slot was auto-revoked for ping abuse.",
+                discord.Color.red()
+            ))
+            dm_user(user, f"{CONFIG['EMOJIS']['cancel/cross']} Slot Revoked", "Your slot was revoked due to ping abuse.", discord.Color.red())
+
+            post_admin_log(timestamp_embed(
+                f"{CONFIG['EMOJIS']['warning']} Auto Revoke",
+                f"Slot for {user.mention} auto-revoked for ping abuse.",
+                discord.Color.red()
+            ), priority=True)
+            return
 
-                # Send ping usage embed
-                embed = ping_usage_embed(slot["everyone_used"], slot["here_used"], slot["plan"], slot.get("custom_limits"))
-                msg = await message.channel.send(embed=embed)
-                slot["sticky_msg_id"] = msg.id
-                save_json(SLOTS_FILE, slots)
-                
-                # Send self-destruct notification
-                self_destruct_embed = discord.Embed(
-                    title="Ping Used",
-                    description=f"Ping used by {message.author.mention}",
-                    color=discord.Color.orange()
-                )
-                self_destruct_msg = await message.channel.send(embed=self_destruct_embed)
-                
-                # Start countdown in background
-                asyncio.create_task(self_destruct_message(self_destruct_msg, 10))
+        if used_ping:
+            # Refresh the ping tracker (debounced, edited in place)
+            trackers.update(uid, message.channel)
+
+            # Send self-destruct notification
+            self_destruct_embed = discord.Embed(
+                title="Ping Used",
+                description=f"Ping used by {message.author.mention}",
+                color=discord.Color.orange()
+            )
+            await ephemeral.send(message.channel, self_destruct_embed, 10)
 
     await bot.process_commands(message)
 
 @bot.command()
 @commands.has_permissions(administrator=True)
 async def transfer(ctx, old_user: discord.Member, new_user: discord.Member):
-    slots = load_json(SLOTS_FILE)
+    slots = store.slots
     uid_old = str(old_user.id)
     uid_new = str(new_user.id)
 
@@ -1113,13 +3198,10 @@ async def transfer(ctx, old_user: discord.Member, new_user: discord.Member):
         return await ctx.send(embed=discord.Embed(description=f"{CONFIG['EMOJIS']['cancel/cross']} Slot channel not found.", color=discord.Color.red()))
 
     # Update channel permissions
-    await channel.set_permissions(old_user, overwrite=None)
-    await channel.set_permissions(new_user, read_messages=True, send_messages=True, mention_everyone=True,
-                                  embed_links=True, attach_files=True, use_external_emojis=True)
+    await apply_slot_profile(channel, live_profile(slot), new_user)
 
     # Update slot JSON
-    slots[uid_new] = slot
-    del slots[uid_old]
+    store.transfer(uid_old, uid_new)
 
     # Update welcome message with new embed
     try:
@@ -1130,33 +3212,30 @@ async def transfer(ctx, old_user: discord.Member, new_user: discord.Member):
     except:
         pass
 
-    new_welcome = await channel.send(embed=slot_info_embed(slot, new_user, channel))
-    slot["welcome_msg_id"] = new_welcome.id
-
-    save_json(SLOTS_FILE, slots)
+    welcome_embed = slot_info_embed(slot, new_user, channel)
+    new_welcome = await channel.send(embed=welcome_embed)
+    store.update(uid_new, welcome_msg_id=new_welcome.id, welcome_hash=welcome_digest(welcome_embed, with_button=False))
 
     # DM Users
-    await dm_user(old_user, f"{CONFIG['EMOJIS']['refresh']} Slot Transferred", f"Your slot has been transferred to {new_user.mention}.", discord.Color.orange())
-    await dm_user(new_user, f"{CONFIG['EMOJIS']['refresh']} Slot Received", f"A slot has been transferred to you by the staff team.\nYou may now start using it.", discord.Color.green())
+    dm_user(old_user, f"{CONFIG['EMOJIS']['refresh']} Slot Transferred", f"Your slot has been transferred to {new_user.mention}.", discord.Color.orange())
+    dm_user(new_user, f"{CONFIG['EMOJIS']['refresh']} Slot Received", f"A slot has been transferred to you by the staff team.\nYou may now start using it.", discord.Color.green())
 
     # Channel confirmation
-    await channel.send(embed=timestamp_embed(f"{CONFIG['EMOJIS']['refresh']} Slot Transferred", f"Ownership has been transferred to {new_user.mention}.", discord.Color.blurple()))
+    notify_channel(channel, timestamp_embed(f"{CONFIG['EMOJIS']['refresh']} Slot Transferred", f"Ownership has been transferred to {new_user.mention}.", discord.Color.blurple()))
 
     # Admin log
-    log_chan = bot.get_channel(ADMIN_LOG_CHANNEL)
-    if log_chan:
-        await log_chan.send(embed=timestamp_embed(
-            f"{CONFIG['EMOJIS']['refresh']} Slot Transferred",
-            f"Slot from {old_user.mention} transferred to {new_user.mention} by {ctx.author.mention}.",
-            discord.Color.blurple()
-        ))
+    post_admin_log(timestamp_embed(
+        f"{CONFIG['EMOJIS']['refresh']} Slot Transferred",
+        f"Slot from {old_user.mention} transferred to {new_user.mention} by {ctx.author.mention}.",
+        discord.Color.blurple()
+    ))
 
     await ctx.send(embed=discord.Embed(description=f"{CONFIG['EMOJIS']['tick']} Slot transferred from {old_user.mention} to {new_user.mention}.", color=discord.Color.green()))
     
 @bot.command()
 @commands.has_permissions(administrator=True)
 async def rename(ctx, user: discord.Member, *, new_name: str):
-    slots = load_json(SLOTS_FILE)
+    slots = store.slots
     uid = str(user.id)
 
     if uid not in slots:
@@ -1171,8 +3250,8 @@ async def rename(ctx, user: discord.Member, *, new_name: str):
     new_name = new_name.lower().replace(" ", "-")
     await channel.edit(name=new_name)
 
-    await channel.send(embed=timestamp_embed(f"{CONFIG['EMOJIS']['rename/pencil']} Slot Renamed", f"Slot has been renamed to `{new_name}` by staff.", discord.Color.orange()))
-    await dm_user(user, f"{CONFIG['EMOJIS']['rename/pencil']} Slot Renamed", f"Your slot has been renamed to `{new_name}` by the staff.", discord.Color.orange())
+    notify_channel(channel, timestamp_embed(f"{CONFIG['EMOJIS']['rename/pencil']} Slot Renamed", f"Slot has been renamed to `{new_name}` by staff.", discord.Color.orange()))
+    dm_user(user, f"{CONFIG['EMOJIS']['rename/pencil']} Slot Renamed", f"Your slot has been renamed to `{new_name}` by the staff.", discord.Color.orange())
 
     await ctx.send(embed=discord.Embed(description=f"{CONFIG['EMOJIS']['tick']} Renamed slot for {user.mention} to `{new_name}`.", color=discord.Color.green()))
     
@@ -1183,7 +3262,7 @@ async def move(ctx, user: discord.Member, new_plan: str):
     if new_plan not in CATEGORIES:
         return await ctx.send(embed=discord.Embed(description=f"{CONFIG['EMOJIS']['cancel/cross']} Invalid plan. Choose from: prime, blaze, trail", color=discord.Color.red()))
 
-    slots = load_json(SLOTS_FILE)
+    slots = store.slots
     uid = str(user.id)
 
     if uid not in slots:
@@ -1197,24 +3276,24 @@ async def move(ctx, user: discord.Member, new_plan: str):
         return await ctx.send(embed=discord.Embed(description=f"{CONFIG['EMOJIS']['cancel/cross']} Channel or new category not found.", color=discord.Color.red()))
 
     await channel.edit(category=new_category)
-    slot["plan"] = new_plan
-    save_json(SLOTS_FILE, slots)
+    store.update(uid, plan=new_plan)
+    await sync_slot_roles(user, store.get(uid))
 
-    await channel.send(embed=timestamp_embed(f"{CONFIG['EMOJIS']['refresh']} Slot Moved", f"Your slot has been moved to `{new_plan.title()}` plan.", discord.Color.blurple()))
-    await dm_user(user, f"{CONFIG['EMOJIS']['refresh']} Slot Moved", f"Your slot has been moved to `{new_plan.title()}` plan by staff.", discord.Color.blurple())
+    notify_channel(channel, timestamp_embed(f"{CONFIG['EMOJIS']['refresh']} Slot Moved", f"Your slot has been moved to `{new_plan.title()}` plan.", discord.Color.blurple()))
+    dm_user(user, f"{CONFIG['EMOJIS']['refresh']} Slot Moved", f"Your slot has been moved to `{new_plan.title()}` plan by staff.", discord.Color.blurple())
 
     await ctx.send(embed=discord.Embed(description=f"{CONFIG['EMOJIS']['tick']} Moved slot of {user.mention} to `{new_plan.title()}`.", color=discord.Color.green()))
     
 @bot.command()
 async def timeleft(ctx):
-    slots = load_json(SLOTS_FILE)
+    slots = store.slots
     uid = str(ctx.author.id)
 
     if uid not in slots:
         return await ctx.send(embed=discord.Embed(description=f"{CONFIG['EMOJIS']['cancel/cross']} You don't own an active slot.", color=discord.Color.red()))
 
     slot = slots[uid]
-    now = int(datetime.datetime.utcnow().timestamp())
+    now = int(time.time())
     end = slot["end_ts"]
     seconds_left = end - now
 
@@ -1233,17 +3312,14 @@ async def timeleft(ctx):
 @bot.command()
 @commands.has_permissions(administrator=True)
 async def slotstats(ctx):
-    slots = load_json(SLOTS_FILE)
-    revoked = load_json(REVOKED_FILE)
+    slots = store.slots
+    revoked = store.revoked
 
     total_active = len(slots)
     total_revoked = len(revoked)
 
-    plan_counts = {"elite": 0, "standard": 0, "trial": 0}
-    for slot in slots.values():
-        plan = slot.get("plan")
-        if plan in plan_counts:
-            plan_counts[plan] += 1
+    counts = await store.plan_counts()
+    plan_counts = {plan: counts.get(plan, 0) for plan in ("elite", "standard", "trial")}
 
     embed = discord.Embed(
         title="📊 Slot Statistics",
@@ -1257,48 +3333,160 @@ async def slotstats(ctx):
 
     embed.set_footer(text=".gg/vexusfr | Slot Overview")
     await ctx.send(embed=embed)
-    
+
+
+def _fmt_bytes(n):
+    for unit in ("B", "KB", "MB"):
+        if n < 1024:
+            return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1024
+    return f"{n:.1f} GB"
+
+def _fmt_ms(seconds):
+    return f"{seconds * 1000:.0f}ms" if seconds >= 0.01 else f"{seconds * 1000:.1f}ms"
+
+def _hit_rate(hits, misses):
+    total = hits + misses
+    return f"`{hits / total:.0%}` ({hits}/{total})" if total else "`n/a`"
+
 @bot.command()
 @commands.has_permissions(administrator=True)
-async def resendinfo(ctx):
-    slots = load_json(SLOTS_FILE)
-    updated = 0
+async def perf(ctx):
+    # Heaviest handlers by total time spent in them
+    handlers = sorted(metrics.handlers.items(), key=lambda item: item[1].sum, reverse=True)[:10]
+    handler_lines = [
+        f"`{name}` {hist.count}× • p50 {_fmt_ms(hist.quantile(0.5))} • p99 {_fmt_ms(hist.quantile(0.99))} • max {_fmt_ms(hist.max)}"
+        + (f" • {metrics.handler_errors[name]} failed" if metrics.handler_errors[name] else "")
+        for name, hist in handlers
+    ]
+
+    errors = collections.Counter()
+    for (route, _), n in metrics.request_errors.items():
+        errors[route] += n
+    route_lines = [
+        f"`{route}` {n}× • {_fmt_ms(metrics.request_seconds[route] / n)} avg" + (f" • {errors[route]} failed" if errors[route] else "")
+        for route, n in metrics.requests.most_common(8)
+    ]
+
+    with metrics._storage_lock:
+        ops, nbytes = dict(metrics.storage_ops), dict(metrics.storage_bytes)
+    storage_lines = [
+        f"**{backend}** — reads `{ops.get((backend, 'read'), 0)}` ({_fmt_bytes(nbytes.get((backend, 'read'), 0))})"
+        f" • writes `{ops.get((backend, 'write'), 0)}` ({_fmt_bytes(nbytes.get((backend, 'write'), 0))})"
+        for backend in sorted({backend for backend, _ in ops})
+    ]
+
+    embed = discord.Embed(
+        title="📈 Performance",
+        description=f"Counting since <t:{int(metrics.started)}:R> • **{sum(metrics.requests.values())}** Discord API calls",
+        color=discord.Color.blurple()
+    )
+    embed.add_field(name="Slowest Handlers (total time)", value="\n".join(handler_lines)[:1024] or "Nothing yet.", inline=False)
+    embed.add_field(name="Discord API Routes", value="\n".join(route_lines)[:1024] or "Nothing yet.", inline=False)
+    embed.add_field(name="Storage", value="\n".join(storage_lines) or "Nothing yet.", inline=False)
+    embed.add_field(
+        name="Caches & Queues",
+        value=(
+            f"Users: {_hit_rate(users.hits, users.misses)}\n"
+            f"Search: {_hit_rate(search_index.cache_hits, search_index.cache_misses)}\n"
+            f"Outbox: `{len(outbox.pending)}` pending • Admin log: `{len(admin_log.buffer)}` buffered"
+        ),
+        inline=False
+    )
+    stall_lines = [f"`{handler}` {_fmt_ms(lag)} in `{where}` <t:{ts}:R>" for ts, handler, where, lag in list(watchdog.recent)[-3:]]
+    embed.add_field(
+        name="Event Loop",
+        value=(
+            f"Lag p50 {_fmt_ms(watchdog.lag.quantile(0.5))} • p99 {_fmt_ms(watchdog.lag.quantile(0.99))} • max {_fmt_ms(watchdog.lag.max)}\n"
+            f"Stalls over {_fmt_ms(LOOP_STALL_THRESHOLD)}: `{sum(watchdog.stalls.values())}`"
+            + "".join(f"\n{line}" for line in stall_lines)
+        )[:1024],
+        inline=False
+    )
+    embed.set_footer(text=".gg/vexusfr | Performance")
+    await ctx.send(embed=embed)
+
+@bot.command(name="ratelimits")
+@commands.has_permissions(administrator=True)
+async def ratelimits_report(ctx):
+    # Flows and routes ranked by time lost to rate limits, 429s breaking ties
+    def worst(waits, hits, calls=None):
+        names = sorted(set(waits) | set(hits), key=lambda name: (waits[name], hits[name]), reverse=True)[:8]
+        return [
+            f"`{name}` — **{waits[name]:.1f}s** waiting • {hits[name]}× 429" + (f" • {calls[name]} calls" if calls else "")
+            for name in names
+        ]
+
+    tight = sorted(ratelimits.buckets.items(), key=lambda item: (-ratelimits.exhausted[item[0]], item[1][2]))[:8]
+    bucket_lines = [
+        f"`{route}` — limit {limit} • {remaining} left • low {lowest} • used up {ratelimits.exhausted[route]}×"
+        for route, (limit, remaining, lowest) in tight
+    ]
+
+    embed = discord.Embed(
+        title="⏳ Rate Limit Report",
+        description=(
+            f"**{sum(ratelimits.flow_429s.values())}** 429s ({ratelimits.global_429s} global) • "
+            f"**{sum(ratelimits.flow_wait.values()):.1f}s** held up since <t:{int(metrics.started)}:R>"
+        ),
+        color=discord.Color.orange()
+    )
+    embed.add_field(name="Worst Flows", value="\n".join(worst(ratelimits.flow_wait, ratelimits.flow_429s, ratelimits.flow_calls))[:1024] or "Nothing rate limited yet.", inline=False)
+    embed.add_field(name="Worst Routes", value="\n".join(worst(ratelimits.route_wait, ratelimits.route_429s))[:1024] or "Nothing rate limited yet.", inline=False)
+    embed.add_field(name="Tightest Buckets", value="\n".join(bucket_lines)[:1024] or "No rate limit headers seen yet.", inline=False)
+    embed.set_footer(text=".gg/vexusfr | Rate Limits")
+    await ctx.send(embed=embed)
 
-    for uid, slot in slots.items():
-        user = bot.get_user(int(uid))
-        channel = bot.get_channel(slot.get("channel_id"))
+@bot.command()
+@commands.has_permissions(administrator=True)
+async def resendinfo(ctx):
+    async def refresh(uid):
+        slot = store.get(uid)
+        channel = bot.get_channel(slot.get("channel_id")) if slot else None
+        user = await users.user(uid, channel.guild) if channel else None
 
         if not user or not channel:
-            continue
+            return "skipped"
 
-        # Delete old welcome message
-        old_welcome_id = slot.get("welcome_msg_id")
-        if old_welcome_id:
+        embed = slot_info_embed(slot, user, channel)
+        digest = welcome_digest(embed)
+        if slot.get("welcome_msg_id") and slot.get("welcome_hash") == digest:
+            return "unchanged"
+
+        # Edit the existing welcome in place so the channel does not scroll
+        view = CopyRecoveryKeyView(user.id)
+        if slot.get("welcome_msg_id"):
             try:
-                old_msg = await channel.fetch_message(old_welcome_id)
-                await old_msg.delete()
-            except:
-                pass
+                await channel.get_partial_message(slot["welcome_msg_id"]).edit(embed=embed, view=view)
+                store.update(uid, welcome_hash=digest)
+                return "edited"
+            except discord.NotFound:
+                pass  # Welcome message is gone; post a new one
 
-        # Send new welcome embed
-        embed = slot_info_embed(slot, user, channel)
-        view = CopyRecoveryKeyView(slot["recovery_key"], user.id)
         new_msg = await channel.send(embed=embed, view=view)
-        slot["welcome_msg_id"] = new_msg.id
-        updated += 1
+        if store.get(uid):
+            store.update(uid, welcome_msg_id=new_msg.id, welcome_hash=digest)
+        return "sent"
 
-    save_json(SLOTS_FILE, slots)
+    uids = list(store.slots)
+    results = await FanOut().run(uids, refresh)
+    for uid, result in zip(uids, results):
+        if isinstance(result, Exception):
+            print(f"[Resend Error] Slot {uid}: {result}")
 
+    edited, sent = results.count("edited"), results.count("sent")
     await ctx.send(embed=discord.Embed(
         title=f"{CONFIG['EMOJIS']['refresh']} Slot Info Refreshed",
-        description=f"Re-sent welcome/info embeds for **{updated}** active slots.",
+        description=f"Updated welcome/info embeds for **{edited + sent}** active slots "
+                    f"(**{edited}** edited, **{sent}** re-sent).\n"
+                    f"**{results.count('unchanged')}** were already up to date.",
         color=discord.Color.blurple()
     ))
     
 @bot.command()
 @commands.has_permissions(administrator=True)
 async def clean(ctx, user: discord.Member):
-    slots = load_json(SLOTS_FILE)
+    slots = store.slots
     uid = str(user.id)
 
     if uid not in slots:
@@ -1315,17 +3503,14 @@ async def clean(ctx, user: discord.Member):
         ))
 
     # Channel doesn't exist, clean from file
-    slots.pop(uid)
-    save_json(SLOTS_FILE, slots)
+    store.remove(uid)
 
     # Log in admin channel
-    log_chan = bot.get_channel(ADMIN_LOG_CHANNEL)
-    if log_chan:
-        await log_chan.send(embed=timestamp_embed(
-            "🧹 Slot Record Cleaned",
-            f"Slot data for {user.mention} was cleaned because their channel no longer exists.",
-            discord.Color.dark_gray()
-        ))
+    post_admin_log(timestamp_embed(
+        "🧹 Slot Record Cleaned",
+        f"Slot data for {user.mention} was cleaned because their channel no longer exists.",
+        discord.Color.dark_gray()
+    ))
 
     await ctx.send(embed=discord.Embed(
         description=f"{CONFIG['EMOJIS']['tick']} Slot data for {user.mention} has been cleaned from records.",
@@ -1335,32 +3520,18 @@ async def clean(ctx, user: discord.Member):
 @bot.command()
 @commands.has_permissions(administrator=True)
 async def pingsreset(ctx):
-    slots = load_json(SLOTS_FILE)
-    updated_count = 0
-
-    for uid, slot in slots.items():
-        slot["everyone_used"] = 0
-        slot["here_used"] = 0
-        channel = bot.get_channel(slot["channel_id"])
-        if not channel:
-            continue
-
-        try:
-            def preserve(msg):
-                return msg.id == slot.get("welcome_msg_id")
-            await channel.purge(limit=1000, check=lambda m: not preserve(m))
-        except Exception:
-            pass
+    progress_msg = await ctx.send(embed=discord.Embed(
+        description=f"{CONFIG['EMOJIS']['refresh']} Resetting ping counters...",
+        color=discord.Color.blurple()
+    ))
 
-        try:
-            embed = ping_usage_embed(0, 0, slot["plan"], slot.get("custom_limits"))
-            msg = await channel.send(embed=embed)
-            slot["sticky_msg_id"] = msg.id
-            updated_count += 1
-        except Exception:
-            pass
+    async def report(done, total):
+        await progress_msg.edit(embed=discord.Embed(
+            description=f"{CONFIG['EMOJIS']['refresh']} Resetting ping counters... **{done}/{total}** slot channels done.",
+            color=discord.Color.blurple()
+        ))
 
-    save_json(SLOTS_FILE, slots)
+    updated_count, elapsed = await reset_ping_counters(on_progress=report)
 
     alert_chan = bot.get_channel(PING_RESET_ALERT_CHANNEL)
     if alert_chan:
@@ -1374,8 +3545,8 @@ async def pingsreset(ctx):
             discord.Color.blurple()
         ))
 
-    await ctx.send(embed=discord.Embed(
-        description=f"{CONFIG['EMOJIS']['tick']} Manual ping reset completed for **{updated_count}** slots.",
+    await progress_msg.edit(embed=discord.Embed(
+        description=f"{CONFIG['EMOJIS']['tick']} Manual ping reset completed for **{updated_count}** slots in **{elapsed:.1f}s**.",
         color=discord.Color.green()
     ))
     
@@ -1383,7 +3554,7 @@ async def pingsreset(ctx):
 @commands.has_permissions(administrator=True)
 async def addp(ctx, user: discord.Member, *, pings: str):
     """Add extra pings to a user. Usage: =addp @user 1x here 1x everyone"""
-    slots = load_json(SLOTS_FILE)
+    slots = store.slots
     uid = str(user.id)
     
     if uid not in slots:
@@ -1425,12 +3596,10 @@ async def addp(ctx, user: discord.Member, *, pings: str):
     limits["everyone"] += everyone_add
     
     # Store the updated limits in the slot
-    if "custom_limits" not in slot:
-        slot["custom_limits"] = PING_LIMITS[slot["plan"]].copy()
-    slot["custom_limits"]["here"] += here_add
-    slot["custom_limits"]["everyone"] += everyone_add
-    
-    save_json(SLOTS_FILE, slots)
+    custom_limits = dict(slot.get("custom_limits", PING_LIMITS[slot["plan"]]))
+    custom_limits["here"] += here_add
+    custom_limits["everyone"] += everyone_add
+    store.update(uid, custom_limits=custom_limits)
     
     await ctx.send(embed=discord.Embed(
         title=f"{CONFIG['EMOJIS']['tick']} Pings Added",
@@ -1490,7 +3659,10 @@ async def help(ctx):
             "> - **`=resendinfo`** — Resend all welcome embeds.\n"
             "> - **`=sendrecoverypanel`** — Send recovery panel embed.\n"
             "> - **`=genslotkey`** — Generate & DM recovery keys.\n"
+            "> - **`=announce <message>`** — DM an announcement to all slot owners.\n"
             "> - **`=slotstats`** — Show active/revoked slot counts.\n"
+            "> - **`=perf`** — Show handler timings, API calls and storage counters.\n"
+            "> - **`=ratelimits`** — Show which commands and jobs hit rate limits.\n"
             "> - **`=pingsreset`** — Manually reset pings.\n"
             "> - **`=addp <user> <pings>`** — Add extra pings to user.\n"
             "> - **`=purge`** — Purge all messages in current channel.\n"
@@ -1503,46 +3675,109 @@ async def help(ctx):
 
 
 
+FIND_SCAN_CONCURRENCY = 8
+FIND_HISTORY_LIMIT = 100
+FIND_RESULT_CAP = CONFIG.get("FIND_RESULT_CAP", 25)
+
+
+async def scan_slot_history(channels, keyword, on_progress=None):
+    """Search recent history of each channel in parallel for keyword.
+
+    Each channel stops at its first match and the whole scan winds down once
+    FIND_RESULT_CAP channels have matched. Scanned messages are fed to the
+    search index on the way. on_progress(scanned, total, matches) is awaited
+    periodically. Returns [(channel, first matching message)].
+    """
+    matches = []
+
+    async def scan(channel):
+        if len(matches) >= FIND_RESULT_CAP:
+            return
+        async for message in channel.history(limit=FIND_HISTORY_LIMIT):
+            search_index.add(message)
+            if keyword in message.content.lower():
+                matches.append((channel, message))
+                return
+            if len(matches) >= FIND_RESULT_CAP:
+                return
+
+    async def report(done, total):
+        await on_progress(done, total, matches)
+
+    fanout = FanOut(FIND_SCAN_CONCURRENCY, on_progress=report if on_progress else None)
+    results = await fanout.run(channels, scan, key=lambda channel: channel.id)
+    for channel, result in zip(channels, results):
+        if isinstance(result, Exception):
+            print(f"[Find Error] Channel {channel.id}: {result}")
+    return matches[:FIND_RESULT_CAP]
+
+
+def _match_lines(lines):
+    """Join result lines, trimmed to fit in one embed field."""
+    shown = len(lines)
+    while len("\n".join(lines[:shown])) > 1000:
+        shown -= 1
+    value = "\n".join(lines[:shown])
+    if shown < len(lines):
+        value += f"\n…and {len(lines) - shown} more"
+    return value
+
+
 @bot.command()
 async def find(ctx, *, keyword: str):
-    # Send temporary "searching..." message
-    searching_msg = await ctx.send(embed=discord.Embed(
-        description=f"**🔎 Searching for `{keyword}` in slots...**",
-        color=discord.Color.green()
-    ))
-
-    slots = load_json(SLOTS_FILE)
+    # "=find --deep <keyword>" scans live history for content the index never saw
+    deep = keyword.startswith("--deep ")
+    if deep:
+        keyword = keyword[len("--deep "):].strip()
     keyword = keyword.lower()
     guild = ctx.guild
-    matched_channels = []
-    limit_per_channel = 100
+    searching_msg = None
 
-    for uid, slot in slots.items():
-        channel = guild.get_channel(slot.get("channel_id"))
-        if not channel:
-            continue
+    if deep:
+        channels = [guild.get_channel(slot.get("channel_id")) for slot in list(store.slots.values())]
+        channels = [channel for channel in channels if channel]
 
-        try:
-            async for message in channel.history(limit=limit_per_channel):
-                if keyword in message.content.lower():
-                    matched_channels.append(channel)
-                    break
-        except Exception as e:
-            print(f"[Find Error] Channel {channel.id}: {e}")
-            continue
+        searching_msg = await ctx.send(embed=discord.Embed(
+            description=f"**🔎 Searching for `{keyword}` in slots...**",
+            color=discord.Color.green()
+        ))
+
+        async def show_progress(scanned, total, found):
+            progress = discord.Embed(
+                description=f"**🔎 Searching for `{keyword}` in slots...**\nScanned **{scanned}/{total}** • **{len(found)}** found",
+                color=discord.Color.green()
+            )
+            if found:
+                progress.add_field(name="Found So Far:", value=_match_lines([f"• {ch.mention}" for ch, _ in found]), inline=False)
+            try:
+                await searching_msg.edit(embed=progress)
+            except discord.HTTPException:
+                pass
+
+        found = await scan_slot_history(channels, keyword, on_progress=show_progress)
+        lines = [f"• {ch.mention} — [first match]({message.jump_url})" for ch, message in found]
+    else:
+        # Answered from the local index; only channels that are still active slots count
+        lines = []
+        for channel_id, count in await search_index.search(keyword):
+            channel = guild.get_channel(channel_id)
+            if channel and store.owner_of_channel(channel_id) is not None:
+                lines.append(f"• {channel.mention} — {count} message{'s' if count != 1 else ''}")
 
     embed = discord.Embed(
         title="📂 Search Results",
         description=f"**Keyword:** `{keyword}`",
-        color=discord.Color.green() if matched_channels else discord.Color.red()
+        color=discord.Color.green() if lines else discord.Color.red()
     )
 
-    if matched_channels:
+    if lines:
         embed.add_field(
             name="Mentioned In Slots:",
-            value="\n".join(f"• {ch.mention}" for ch in matched_channels),
+            value=_match_lines(lines),
             inline=False
         )
+        if deep and len(lines) >= FIND_RESULT_CAP:
+            embed.description += f"\nStopped after the first {FIND_RESULT_CAP} matching slots."
     else:
         embed.description += "\nNo slot channels contained this keyword."
 
@@ -1550,38 +3785,73 @@ async def find(ctx, *, keyword: str):
     embed.set_image(url=CONFIG["FIND_COMMAND_EMBED_IMAGE"])
     embed.set_footer(text=f"Requested by {ctx.author}", icon_url=ctx.author.avatar.url if ctx.author.avatar else None)
 
-    # Send final result as reply
-    result_msg = await ctx.reply(embed=embed, mention_author=False)
+    # Send final result as reply; it removes itself after 90 seconds
+    await ctx.reply(embed=embed, mention_author=False, delete_after=90)
 
     # Delete the "searching..." message
-    await searching_msg.delete()
-
-    # Wait 90 seconds then delete result
-    await asyncio.sleep(90)
-    try:
-        await result_msg.delete()
-    except discord.NotFound:
-        pass  # In case it was manually deleted already
+    if searching_msg:
+        await searching_msg.delete()
 
     
 
+# --- Server restore ---
+RESTORE_JOB_FILE = "data/restore_job.json"
+RESTORE_CONCURRENCY = 4
+
+
+class RestoreJob(DebouncedJsonFile):
+    """Checkpoint of a =restoreserver run.
+
+    Per slot it records the channel restored into as soon as that channel
+    exists, and whether the slot finished. A rerun after a crash or stall
+    reuses those channels instead of creating duplicates and skips finished
+    slots. The checkpoint is cleared once a run completes without failures.
+    """
+
+    def __init__(self, file):
+        # delay=0 coalesces the writes of one loop iteration but never defers a checkpoint
+        super().__init__(file, delay=0)
+        self.slots = self._load().get("slots", {})
+        self.running = False
+
+    def channel_id(self, uid):
+        return self.slots.get(uid, {}).get("channel_id")
+
+    def is_done(self, uid):
+        return self.slots.get(uid, {}).get("done", False)
+
+    def record(self, uid, **fields):
+        self.slots.setdefault(uid, {}).update(fields)
+        self._save()
+
+    def clear(self):
+        self.slots = {}
+        self._save()
+
+    def _snapshot(self):
+        return json.dumps({"slots": self.slots}, separators=(",", ":"))
+
+
+restore_job = RestoreJob(RESTORE_JOB_FILE)
+
+
+def _save_restored_slot(uid, slot, is_revoked):
+    if is_revoked:
+        store.put_revoked(uid, slot)
+    else:
+        store.put(uid, slot)
+
+
 @bot.command()
 @commands.has_permissions(administrator=True)
 async def restoreserver(ctx):
+    if restore_job.running:
+        return await ctx.send(embed=discord.Embed(description=f"{CONFIG['EMOJIS']['warning']} A server restore is already running.", color=discord.Color.orange()))
+
     guild = ctx.guild
-    restored_active = 0
-    restored_revoked = 0
-    failed = 0
 
-    try:
-        slots_data = load_json(SLOTS_FILE)
-        revoked_data = load_json(REVOKED_FILE)
-    except Exception as e:
-        await ctx.send(embed=discord.Embed(
-            description=f"❌ Failed to load backup files.\n```{e}```",
-            color=discord.Color.red()
-        ))
-        return
+    slots_data = store.slots
+    revoked_data = store.revoked
 
     # Combine all slots for processing, prioritizing active slots if there's overlap
     all_slots = {**revoked_data, **slots_data}
@@ -1591,139 +3861,132 @@ async def restoreserver(ctx):
         await ctx.send(embed=discord.Embed(description="❌ Admin log channel not found.", color=discord.Color.red()))
         return
 
-    await ctx.send(embed=discord.Embed(
+    # Slots finished by an interrupted run: make sure the store kept their new channels
+    resumed = 0
+    for uid, entry in restore_job.slots.items():
+        if entry.get("done") and uid in all_slots:
+            resumed += 1
+            slot = all_slots[uid]
+            restored = {field: entry[field] for field in ("channel_id", "welcome_msg_id") if field in entry}
+            if any(slot.get(field) != value for field, value in restored.items()):
+                _save_restored_slot(uid, {**slot, **restored}, uid not in slots_data)
+
+    progress_msg = await ctx.send(embed=discord.Embed(
         title="🛠️ Starting Server Restore",
-        description="Processing active and revoked slots... This may take a while.",
+        description="Processing active and revoked slots... This may take a while."
+                    + (f"\nResuming the previous run: **{resumed}** slots already restored." if resumed else ""),
         color=discord.Color.blue()
     ))
 
-    for uid, slot in all_slots.items():
-        try:
-            user = await bot.fetch_user(int(uid))
-            is_revoked = uid in revoked_data
+    async def restore_slot(uid):
+        if restore_job.is_done(uid):
+            return "skipped"
+        slot = dict(all_slots[uid])
+        user = await users.user(uid, guild)
+        is_revoked = uid not in slots_data
 
-            # Determine target category
-            if is_revoked:
-                target_category_id = CONFIG["REVOKED_SLOT_CATEGORY_ID"]
-            else:
-                target_category_id = CATEGORIES.get(slot["plan"])
+        # Determine target category
+        if is_revoked:
+            target_category_id = CONFIG["REVOKED_SLOT_CATEGORY_ID"]
+        else:
+            target_category_id = CATEGORIES.get(slot["plan"])
 
-            category = guild.get_channel(target_category_id)
-            if not category:
-                print(f"[Restore Error] Category {target_category_id} not found for {uid}.")
-                failed += 1
-                continue
+        category = guild.get_channel(target_category_id)
+        if not category:
+            print(f"[Restore Error] Category {target_category_id} not found for {uid}.")
+            return "failed"
 
-            # Channel name based on user's current name, or a placeholder if user not found
-            emoji = "💜" if slot["plan"] == "elite" else "💚"
-            channel_name = f"{emoji}┃{(user.name if user else uid)}".lower().replace(" ", "-")
-
-            # Overwrites for the channel
-            overwrites = {
-                guild.default_role: discord.PermissionOverwrite(read_messages=False),  # Hide for everyone by default
-                guild.me: discord.PermissionOverwrite(read_messages=True, send_messages=True),
-            }
-
-            # Apply specific permissions based on slot status (active/revoked)
-            if is_revoked:
-                # Revoked slot: hide from user, visible only to staff/admins
-                if user:
-                    overwrites[user] = discord.PermissionOverwrite(read_messages=False, send_messages=False)
-                
-                staff_role = guild.get_role(CONFIG["STAFF_ROLE_ID"])
-                admin_role = discord.utils.get(guild.roles, permissions=discord.Permissions(administrator=True))
-                if staff_role: overwrites[staff_role] = discord.PermissionOverwrite(read_messages=True)
-                if admin_role: overwrites[admin_role] = discord.PermissionOverwrite(read_messages=True)
-
-            else: # Active slot
-                # User-specific permissions
-                if user:
-                    overwrites[user] = discord.PermissionOverwrite(
-                        read_messages=True, send_messages=True, mention_everyone=True,
-                        embed_links=True, attach_files=True, use_external_emojis=True
-                    )
-
-                # Default roles permissions
-                hidden_role = guild.get_role(CONFIG["EVERYONE_ROLE_ID"])
-                visible_role = guild.get_role(CONFIG["MEMBER_ROLE_ID"])
-                if hidden_role: overwrites[hidden_role] = discord.PermissionOverwrite(read_messages=False)
-                if visible_role: overwrites[visible_role] = discord.PermissionOverwrite(read_messages=True, send_messages=False)
-
-            # Check if channel already exists and update, or create new
-            channel = guild.get_channel(slot.get("channel_id"))
-            if channel:
-                await channel.edit(name=channel_name, category=category, overwrites=overwrites)
-            else:
-                channel = await guild.create_text_channel(channel_name, overwrites=overwrites, category=category)
-                slot["channel_id"] = channel.id # Update slot data with new channel ID
-
-            # Handle active slot specific behaviors
-            if not is_revoked:
-                # Re-send welcome embed
-                if user:
-                    try:
-                        # Delete old welcome message if it exists
-                        if slot.get("welcome_msg_id"):
-                            old_welcome_msg = await channel.fetch_message(slot["welcome_msg_id"])
-                            await old_welcome_msg.delete()
-                    except discord.NotFound:
-                        pass # Message already deleted
-                    except Exception as e:
-                        print(f"[Restore Error] Failed to delete old welcome message for {uid}: {e}")
-
-                    welcome_embed = slot_info_embed(slot, user, channel)
-                    welcome_msg = await channel.send(embed=welcome_embed)
-                    slot["welcome_msg_id"] = welcome_msg.id
-
-                # Assign role if member is in guild
-                member = guild.get_member(user.id) if user else None
-                if member:
-                    role_to_assign = None
-                    if slot["plan"] == "elite":
-                        role_to_assign = guild.get_role(CONFIG["ELITE_ROLE_ID"])
-                    elif slot["plan"] == "standard":
-                        role_to_assign = guild.get_role(CONFIG["STANDARD_ROLE_ID"])
-
-                    if role_to_assign and role_to_assign not in member.roles:
-                        await member.add_roles(role_to_assign)
-                    access_role = guild.get_role(CONFIG["ACCESS_ROLE_ID"])
-                    if access_role and access_role not in member.roles:
-                        await member.add_roles(access_role)
-                # If user not in server, send DM about auto-recovery when they join
-                elif user and not member:
-                    # This part is for future detection when user joins
-                    # For now, just ensure channel is hidden and permissions are set correctly
-                    pass # The on_member_join event listener would handle this
-
-                restored_active += 1
-            else:
-                restored_revoked += 1
+        # Channel name based on user's current name, or a placeholder if user not found
+        emoji = "💜" if slot["plan"] == "elite" else "💚"
+        channel_name = f"{emoji}┃{(user.name if user else uid)}".lower().replace(" ", "-")
 
-            # Update the slot data in the correct JSON file
-            if is_revoked:
-                revoked_data[uid] = slot
-            else:
-                slots_data[uid] = slot
+        overwrites = slot_overwrites(guild, "revoked" if is_revoked else live_profile(slot), user)
 
-        except Exception as e:
-            print(f"[Restore Error] Processing {uid}: {e}")
+        # Reuse the channel from an interrupted run or the backup, or create a new one
+        channel = guild.get_channel(restore_job.channel_id(uid) or slot.get("channel_id"))
+        if channel:
+            await channel.edit(name=channel_name, category=category, overwrites=overwrites)
+        else:
+            channel = await guild.create_text_channel(channel_name, overwrites=overwrites, category=category)
+            ledger.start_channel(channel.id)
+        slot["channel_id"] = channel.id
+        restore_job.record(uid, channel_id=channel.id)
+
+        # Handle active slot specific behaviors
+        if not is_revoked:
+            # Re-send welcome embed
+            if user:
+                try:
+                    # Delete old welcome message if it exists
+                    if slot.get("welcome_msg_id"):
+                        await channel.get_partial_message(slot["welcome_msg_id"]).delete()
+                except discord.NotFound:
+                    pass # Message already deleted
+                except Exception as e:
+                    print(f"[Restore Error] Failed to delete old welcome message for {uid}: {e}")
+
+                welcome_embed = slot_info_embed(slot, user, channel)
+                welcome_msg = await channel.send(embed=welcome_embed)
+                slot["welcome_msg_id"] = welcome_msg.id
+                slot["welcome_hash"] = welcome_digest(welcome_embed, with_button=False)
+                restore_job.record(uid, welcome_msg_id=welcome_msg.id)
+
+        # Sync roles if the member is in the guild; others get theirs from on_member_join
+        await sync_slot_roles(guild.get_member(user.id) if user else None, None if is_revoked else slot)
+
+        # Update the slot data in the correct store
+        _save_restored_slot(uid, slot, is_revoked)
+        restore_job.record(uid, done=True)
+        return "revoked" if is_revoked else "active"
+
+    started = time.monotonic()
+
+    async def show_progress(done, total):
+        elapsed = time.monotonic() - started
+        eta = f"~{int(elapsed / done * (total - done))}s" if done else "estimating..."
+        try:
+            await progress_msg.edit(embed=discord.Embed(
+                title="🛠️ Server Restore In Progress",
+                description=f"Processed **{done}/{total}** slots\nElapsed: **{int(elapsed)}s** • ETA: **{eta}**",
+                color=discord.Color.blue()
+            ))
+        except discord.HTTPException:
+            pass
+
+    uids = list(all_slots)
+    restore_job.running = True
+    try:
+        results = await FanOut(RESTORE_CONCURRENCY, on_progress=show_progress).run(uids, restore_slot)
+    finally:
+        restore_job.running = False
+
+    restored_active = results.count("active")
+    restored_revoked = results.count("revoked")
+    failed = results.count("failed")
+    for uid, result in zip(uids, results):
+        if isinstance(result, Exception):
+            print(f"[Restore Error] Processing {uid}: {result}")
             failed += 1
 
-    # Save updated slot files
-    save_json(SLOTS_FILE, slots_data)
-    save_json(REVOKED_FILE, revoked_data)
+    if failed:
+        footer = "\n\nRun `=restoreserver` again to retry; restored slots will be skipped."
+    else:
+        footer = "\n\nAll channels and roles have been restored based on backup data."
+        restore_job.clear()
 
     confirmation_embed = discord.Embed(
         title="🛠️ Server Restore Completed",
-        description=f"✅ Active Slots Restored: **{restored_active}**\n✅ Revoked Slots Processed: **{restored_revoked}**\n❌ Failed Entries: **{failed}**\n\nAll channels and roles have been restored based on backup data.",
-        color=discord.Color.green()
+        description=f"✅ Active Slots Restored: **{restored_active}**\n✅ Revoked Slots Processed: **{restored_revoked}**\n"
+                    + (f"⏭️ Already Restored: **{resumed}**\n" if resumed else "")
+                    + f"❌ Failed Entries: **{failed}**\n⏱️ Took **{int(time.monotonic() - started)}s**" + footer,
+        color=discord.Color.green() if not failed else discord.Color.orange()
     )
     await ctx.send(embed=confirmation_embed)
-    await admin_log_channel.send(embed=confirmation_embed)
+    post_admin_log(confirmation_embed)
 
 @bot.event
 async def on_member_join(member):
-    slots = load_json(SLOTS_FILE)
+    slots = store.slots
     uid = str(member.id)
 
     if uid in slots:
@@ -1732,21 +3995,10 @@ async def on_member_join(member):
         channel = bot.get_channel(slot["channel_id"])
         if channel and not channel.permissions_for(member).read_messages:
             # User has joined, now grant permissions and role
-            await channel.set_permissions(member, read_messages=True, send_messages=True, mention_everyone=True,
-                                          embed_links=True, attach_files=True, use_external_emojis=True)
+            await apply_slot_profile(channel, live_profile(slot), member)
 
             # Assign role
-            role_to_assign = None
-            if slot["plan"] == "elite":
-                role_to_assign = member.guild.get_role(CONFIG["ELITE_ROLE_ID"])
-            elif slot["plan"] == "standard":
-                role_to_assign = member.guild.get_role(CONFIG["STANDARD_ROLE_ID"])
-
-            if role_to_assign and role_to_assign not in member.roles:
-                await member.add_roles(role_to_assign)
-            access_role = member.guild.get_role(CONFIG["ACCESS_ROLE_ID"])
-            if access_role and access_role not in member.roles:
-                await member.add_roles(access_role)
+            await sync_slot_roles(member, slot)
             # Re-send welcome embed
             try:
                 if slot.get("welcome_msg_id"):
@@ -1759,22 +4011,38 @@ async def on_member_join(member):
 
             welcome_embed = slot_info_embed(slot, member, channel)
             welcome_msg = await channel.send(embed=welcome_embed)
-            slot["welcome_msg_id"] = welcome_msg.id
-            save_json(SLOTS_FILE, slots)
+            if uid in slots:
+                store.update(uid, welcome_msg_id=welcome_msg.id, welcome_hash=welcome_digest(welcome_embed, with_button=False))
 
             # DM user about auto-recovery
-            await dm_user(member,
-                          f"{CONFIG["EMOJIS"]["tick_animated"]} Slot Automatically Recovered!",
+            dm_user(member,
+                          f"{CONFIG['EMOJIS']['tick_animated']} Slot Automatically Recovered!",
                           f"Welcome back! Your slot in {channel.mention} has been automatically recovered and your permissions restored.",
                           discord.Color.green())
 
-            log_chan = bot.get_channel(ADMIN_LOG_CHANNEL)
-            if log_chan:
-                await log_chan.send(embed=timestamp_embed(
-                    f"{CONFIG["EMOJIS"]["tick_animated"]} Slot Auto-Recovered",
-                    f"Slot for {member.mention} auto-recovered upon joining the server.",
-                    discord.Color.green()
-                ))
+            post_admin_log(timestamp_embed(
+                f"{CONFIG['EMOJIS']['tick_animated']} Slot Auto-Recovered",
+                f"Slot for {member.mention} auto-recovered upon joining the server.",
+                discord.Color.green()
+            ))
+
+@bot.event
+async def on_raw_message_delete(payload):
+    ledger.forget(payload.channel_id, payload.message_id)
+    search_index.forget([payload.message_id])
+
+@bot.event
+async def on_raw_bulk_message_delete(payload):
+    for message_id in payload.message_ids:
+        ledger.forget(payload.channel_id, message_id)
+    search_index.forget(payload.message_ids)
+
+@bot.event
+async def on_raw_message_edit(payload):
+    content = payload.data.get("content")
+    if content is not None and store.owner_of_channel(payload.channel_id) is not None:
+        search_index.edit(payload.message_id, content)
+
 
 # --- Error handling for commands ---
 @create.error
@@ -1792,6 +4060,17 @@ async def admin_command_error(ctx, error):
 
         
 # --- Run the bot ---
-bot.run(CONFIG["YOUR_BOT_TOKEN"])
+if __name__ == "__main__":
+    try:
+        bot.run(CONFIG["YOUR_BOT_TOKEN"])
+    finally:
+        # Persist any mutations and notifications still waiting on their write timers
+        store.flush()
+        admin_log.drain()
+        outbox.flush()
+        search_index.flush()
+        restore_job.flush()
+        ledger.flush()
+        ephemeral.flush()
 
 